@@ -0,0 +1,249 @@
+"""Latency and throughput benchmarks for the task API.
+
+    python -m benchmarks.bench_api --scale small --transport wsgi
+    python -m benchmarks.bench_api --scale medium --transport socket --save-baseline
+    python -m benchmarks.bench_api --scale medium --transport socket --compare
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.report import (
+    compare_reports, environment, format_table, load_report, peak_rss_bytes, save_report, summarize
+)
+from benchmarks.seed import SCALES, seed_database
+from benchmarks.transport import LocalServer, SocketTransport, WsgiTransport
+
+BASELINE_DIR = Path(__file__).parent / 'baselines'
+
+
+class BenchmarkContext:
+    """State shared by the scenarios of one run: the transport, seeded data and tokens"""
+
+    def __init__(self, transport, dataset, tokens, seed):
+        self.transport = transport
+        self.dataset = dataset
+        self.tokens = tokens
+        self.rng = random.Random(seed)
+        self.created = []
+        self.registered = 0
+        self.latencies = []
+        self.errors = 0
+
+    def random_user(self):
+        return self.rng.choice(self.dataset['users'])
+
+    def send(self, method, path, body=None, user_id=None):
+        headers = {'Authorization': self.tokens[user_id]} if user_id is not None else {}
+        started = time.perf_counter()
+        try:
+            status, payload, _ = self.transport.request(method, path, body, headers)
+        except OSError:
+            status, payload = None, b''
+        self.latencies.append(time.perf_counter() - started)
+        if status is None or status >= 400:
+            self.errors += 1
+        return status, payload
+
+
+def register(ctx):
+    ctx.registered += 1
+    ctx.send('POST', '/api/register', {
+        'username': f'newuser_{os.getpid()}_{ctx.registered}_{ctx.rng.randrange(10 ** 6)}',
+        'password': 'benchmark-password'
+    })
+
+
+def login(ctx):
+    _, username = ctx.random_user()
+    ctx.send('POST', '/api/login', {'username': username, 'password': ctx.dataset['password']})
+
+
+def list_page(ctx):
+    user_id, _ = ctx.random_user()
+    ctx.send('GET', '/api/tasks?limit=50', user_id=user_id)
+
+
+def search(ctx):
+    user_id, _ = ctx.random_user()
+    ctx.send('GET', f"/api/tasks?search={ctx.rng.choice(ctx.dataset['search_terms'])}", user_id=user_id)
+
+
+def create(ctx):
+    user_id, _ = ctx.random_user()
+    status, payload = ctx.send('POST', '/api/tasks', {
+        'title': f'Benchmark task {len(ctx.created)}',
+        'description': 'Created by the benchmark suite',
+        'due_date': '2030-01-01T09:00:00'
+    }, user_id=user_id)
+    if status == 201:
+        ctx.created.append((user_id, json.loads(payload)['task']['id']))
+
+
+def update(ctx):
+    user_id, _ = ctx.random_user()
+    task_id = ctx.rng.choice(ctx.dataset['tasks'][user_id])
+    ctx.send('PUT', f'/api/tasks/{task_id}', {'is_completed': ctx.rng.random() < 0.5}, user_id=user_id)
+
+
+def delete(ctx):
+    # Deletes the tasks made by the create scenario so the dataset keeps its size
+    if not ctx.created:
+        return
+    user_id, task_id = ctx.created.pop()
+    ctx.send('DELETE', f'/api/tasks/{task_id}', user_id=user_id)
+
+
+# Password hashing makes the auth scenarios orders of magnitude slower, they run fewer iterations
+SCENARIOS = {
+    'register': (register, 'auth'),
+    'login': (login, 'auth'),
+    'list': (list_page, 'default'),
+    'search': (search, 'default'),
+    'create': (create, 'default'),
+    'update': (update, 'default'),
+    'delete': (delete, 'default'),
+}
+
+
+def issue_tokens(app, users):
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        return {user_id: f'Bearer {create_access_token(identity=str(user_id))}' for user_id, _ in users}
+
+
+def run_scenarios(app, transport, dataset, iterations, auth_iterations, warmup, seed, repeat=1, scenarios=None):
+    """Run each scenario in order and return its summary, keyed by scenario name.
+
+    Each scenario is measured ``repeat`` times and the run with the lowest
+    median is kept, which filters out noise from other processes on the host.
+    The process's peak RSS is sampled after each scenario; it only grows, so
+    a scenario that raised it shows up as a step from the one before.
+    """
+    tokens = issue_tokens(app, dataset['users'])
+    ctx = BenchmarkContext(transport, dataset, tokens, seed)
+    results = {}
+    for name in scenarios or SCENARIOS:
+        scenario, kind = SCENARIOS[name]
+        count = auth_iterations if kind == 'auth' else iterations
+        for _ in range(min(warmup, count)):
+            scenario(ctx)
+
+        for _ in range(repeat):
+            ctx.latencies, ctx.errors = [], 0
+            started = time.perf_counter()
+            for _ in range(count):
+                scenario(ctx)
+            result = summarize(ctx.latencies, ctx.errors, time.perf_counter() - started)
+            if name not in results or result['p50_ms'] < results[name]['p50_ms']:
+                results[name] = result
+        results[name]['peak_rss_bytes'] = peak_rss_bytes()
+    return results
+
+
+def run_benchmark(app, scale, transport_name, iterations=500, auth_iterations=20, warmup=10, seed=1234,
+                  repeat=1, scenarios=None):
+    """Seed the app's database at ``scale`` and benchmark it over ``transport_name``"""
+    seed_started = time.perf_counter()
+    dataset = seed_database(app, scale, seed)
+    seed_seconds = time.perf_counter() - seed_started
+
+    if transport_name == 'wsgi':
+        transport = WsgiTransport(app)
+        results = run_scenarios(app, transport, dataset, iterations, auth_iterations, warmup, seed, repeat, scenarios)
+    elif transport_name == 'socket':
+        with LocalServer(app) as server:
+            transport = SocketTransport(server.host, server.port)
+            try:
+                results = run_scenarios(
+                    app, transport, dataset, iterations, auth_iterations, warmup, seed, repeat, scenarios
+                )
+            finally:
+                transport.close()
+    else:
+        raise ValueError(f"Unknown transport: {transport_name}")
+
+    return {
+        'scale': scale,
+        'transport': transport_name,
+        'iterations': iterations,
+        'auth_iterations': auth_iterations,
+        'repeat': repeat,
+        'seed_seconds': round(seed_seconds, 2),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'environment': environment(),
+        'scenarios': results,
+    }
+
+
+def prepare_environment(database_url, config_name):
+    """Point the config at the benchmark database before ``src.config`` is imported"""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['FLASK_ENV'] = config_name
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-jwt-secret-key-of-32-bytes')
+    # Every request comes from one client, the limiter would only measure itself rejecting them
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--transport', choices=['wsgi', 'socket'], default='wsgi')
+    parser.add_argument('--config', default='production', help='config name from src.config')
+    parser.add_argument('--database-url', help='defaults to a fresh SQLite file in a temporary directory')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--auth-iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--repeat', type=int, default=3, help='measure each scenario this many times, keep the best')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='run only these scenarios')
+    parser.add_argument('--output', help='write the JSON report to this path')
+    parser.add_argument('--save-baseline', action='store_true', help='write the report as the baseline')
+    parser.add_argument('--compare', nargs='?', const='', metavar='BASELINE',
+                        help='compare with a report, by default the stored baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative change before a scenario counts as a regression')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_environment(args.database_url or f"sqlite:///{Path(workdir) / 'benchmark.db'}", args.config)
+        # src.config reads the environment when it is first imported
+        from src.app import create_app
+
+        app = create_app(args.config)
+        report = run_benchmark(app, args.scale, args.transport, args.iterations, args.auth_iterations,
+                               args.warmup, args.seed, args.repeat, args.scenario)
+        report['config'] = args.config
+
+    baseline_path = BASELINE_DIR / f'{args.scale}-{args.transport}.json'
+    baseline = None
+    if args.compare is not None:
+        baseline = load_report(args.compare or baseline_path)
+
+    print(f"{args.scale} dataset over {args.transport}, seeded in {report['seed_seconds']}s")
+    print(format_table(report, baseline))
+
+    if args.output:
+        save_report(report, args.output)
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        save_report(report, baseline_path)
+        print(f"Baseline written to {baseline_path}")
+
+    if baseline is not None:
+        regressions = compare_reports(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Open-loop load generator replaying realistic traffic mixes against a local server.
+
+    python -m benchmarks.loadgen --mix polling --rates 50,100,200 --workers 1,2,4
+    python -m benchmarks.loadgen --mix write-heavy --rates 20,40,80 --duration 20 --output load.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.bench_api import issue_tokens, prepare_environment
+from benchmarks.report import environment, save_report, summarize
+from benchmarks.seed import SCALES, seed_database
+from benchmarks.transport import SocketTransport
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+class VirtualUser:
+    """A seeded account and the client-side state it carries between requests"""
+
+    def __init__(self, user_id, username, token, task_ids):
+        self.user_id = user_id
+        self.username = username
+        self.headers = {'Authorization': token}
+        self.task_ids = task_ids
+        self.etag = None
+        self.watermark = None
+
+
+def poll(user, client, rng, dataset):
+    headers = dict(user.headers)
+    if user.etag:
+        headers['If-None-Match'] = user.etag
+    status, _, response_headers = client.request('GET', '/api/tasks?limit=50', headers=headers)
+    user.etag = response_headers.get('ETag') or user.etag
+    return status
+
+
+def list_page(user, client, rng, dataset):
+    return client.request('GET', '/api/tasks?limit=50', headers=user.headers)[0]
+
+
+def search(user, client, rng, dataset):
+    term = rng.choice(dataset['search_terms'])
+    return client.request('GET', f'/api/tasks?search={term}', headers=user.headers)[0]
+
+
+def login(user, client, rng, dataset):
+    body = {'username': user.username, 'password': dataset['password']}
+    return client.request('POST', '/api/login', body)[0]
+
+
+def create(user, client, rng, dataset):
+    body = {'title': f'Load task {rng.randrange(10 ** 6)}', 'due_date': '2030-01-01T09:00:00'}
+    return client.request('POST', '/api/tasks', body, headers=user.headers)[0]
+
+
+def update(user, client, rng, dataset):
+    task_id = rng.choice(user.task_ids)
+    body = {'is_completed': rng.random() < 0.5}
+    return client.request('PUT', f'/api/tasks/{task_id}', body, headers=user.headers)[0]
+
+
+def batch(user, client, rng, dataset):
+    operations = [{'op': 'create', 'data': {'title': f'Synced task {rng.randrange(10 ** 6)}'}} for _ in range(20)]
+    operations += [
+        {'op': 'update', 'id': task_id, 'data': {'is_completed': True}}
+        for task_id in rng.sample(user.task_ids, min(5, len(user.task_ids)))
+    ]
+    return client.request('POST', '/api/tasks/batch', {'operations': operations}, headers=user.headers)[0]
+
+
+def changes(user, client, rng, dataset):
+    path = '/api/tasks/changes?limit=200'
+    if user.watermark:
+        path += f'&since={user.watermark}'
+    status, payload, _ = client.request('GET', path, headers=user.headers)
+    if status == 200:
+        user.watermark = json.loads(payload)['watermark']
+    elif status == 410:
+        user.watermark = None
+    return status
+
+
+OPERATIONS = {
+    'poll': poll,
+    'list': list_page,
+    'search': search,
+    'login': login,
+    'create': create,
+    'update': update,
+    'batch': batch,
+    'changes': changes,
+}
+
+# Operation weights of each traffic mix
+MIXES = {
+    'polling': {'poll': 85, 'list': 5, 'create': 5, 'update': 5},
+    'login-storm': {'login': 90, 'list': 10},
+    'bulk-sync': {'batch': 30, 'changes': 60, 'list': 10},
+    'search': {'search': 75, 'list': 15, 'create': 10},
+    'write-heavy': {'create': 40, 'update': 40, 'list': 20},
+}
+
+
+def run_step(host, port, users, dataset, mix, rate, duration, concurrency, seed):
+    """Offer ``rate`` requests per second for ``duration`` seconds and summarize each operation.
+
+    Arrivals follow a Poisson process that does not wait for responses, and
+    latency is measured from the scheduled arrival. A saturated server
+    therefore shows up as queueing delay instead of a politely lower rate.
+    """
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    local = threading.local()
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+
+    def execute(name, user, scheduled, op_seed):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = SocketTransport(host, port)
+        try:
+            status = OPERATIONS[name](user, client, random.Random(op_seed), dataset)
+        except (OSError, ValueError):
+            status = 'failed'
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies[name].append(elapsed)
+            statuses[name][str(status)] += 1
+
+    started = time.perf_counter()
+    arrival = started
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as pool:
+        while True:
+            arrival += rng.expovariate(rate)
+            if arrival - started >= duration:
+                break
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = rng.choices(names, weights)[0]
+            pool.submit(execute, name, rng.choice(users), arrival, rng.random())
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in names:
+        errors = sum(
+            count for status, count in statuses[name].items() if status == 'failed' or int(status) >= 400
+        )
+        endpoints[name] = dict(summarize(latencies[name], errors, elapsed), statuses=dict(statuses[name]))
+    everything = [latency for name in names for latency in latencies[name]]
+    total = summarize(everything, sum(result['errors'] for result in endpoints.values()), elapsed)
+    total['offered_rps'] = rate
+    total['error_rate'] = round(total['errors'] / total['requests'], 4) if total['requests'] else 0.0
+    total['endpoints'] = endpoints
+    return total
+
+
+def wait_until_healthy(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'{url}/health', timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout}s")
+
+
+class GunicornServer:
+    """Starts ``run.py --production`` with the given worker count and stops it afterwards"""
+
+    def __init__(self, port, workers, threads, log_path):
+        self.port = port
+        self.env = dict(
+            os.environ, HOST='127.0.0.1', PORT=str(port), WEB_CONCURRENCY=str(workers), SERVER_THREADS=str(threads)
+        )
+        self.log_path = log_path
+
+    def __enter__(self):
+        self.log = open(self.log_path, 'ab')
+        self.process = subprocess.Popen(
+            [sys.executable, str(PROJECT_ROOT / 'run.py'), '--production'],
+            cwd=PROJECT_ROOT, env=self.env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+        try:
+            wait_until_healthy(f'http://127.0.0.1:{self.port}')
+        except RuntimeError as exept:
+            self.__exit__(None, None, None)
+            with open(self.log_path, 'rb') as log:
+                output = log.read()[-4000:].decode('utf-8', 'replace')
+            raise RuntimeError(f"{exept}, server output:\n{output}") from None
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def format_curve(run):
+    lines = [
+        f"workers={run['workers']} threads={run['threads']}",
+        f"{'offered':>8} {'achieved':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}",
+    ]
+    for step in run['steps']:
+        lines.append(
+            f"{step['offered_rps']:>8} {step['rps']:>9.1f} {step['p50_ms']:>9.2f} {step['p95_ms']:>9.2f} "
+            f"{step['p99_ms']:>9.2f} {step['error_rate'] * 100:>6.1f}%"
+        )
+        for name, result in step['endpoints'].items():
+            statuses = ' '.join(f'{status}x{count}' for status, count in sorted(result['statuses'].items()))
+            lines.append(f"{'':>8} {name:>9} p95 {result['p95_ms']:>8.2f}ms  {statuses}")
+    return '\n'.join(lines)
+
+
+def parse_numbers(raw, cast=int):
+    return [cast(value) for value in raw.split(',') if value.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', choices=sorted(MIXES), default='polling')
+    parser.add_argument('--rates', default='25,50,100,200', help='offered requests per second, one step each')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per rate step')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of unrecorded load before the first step')
+    parser.add_argument('--users', type=int, help='virtual users, by default every seeded user')
+    parser.add_argument('--concurrency', type=int, default=64, help='most requests in flight at once')
+    parser.add_argument('--workers', default='1', help='gunicorn worker counts to compare, e.g. 1,2,4')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--database-url', help='defaults to a fresh SQLite file in a temporary directory')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='write the JSON report to this path')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        template = Path(workdir) / 'template.db'
+        database = Path(workdir) / 'load.db'
+        is_sqlite_file = not args.database_url
+        prepare_environment(args.database_url or f'sqlite:///{template}', 'production')
+        # src.config reads the environment when it is first imported
+        from src.app import create_app
+        from src.database import db
+
+        app = create_app('production')
+        dataset = seed_database(app, args.scale, args.seed)
+        tokens = issue_tokens(app, dataset['users'])
+        with app.app_context():
+            db.engine.dispose()
+        users = [
+            VirtualUser(user_id, username, tokens[user_id], dataset['tasks'][user_id])
+            for user_id, username in dataset['users'][:args.users]
+        ]
+
+        report = {'mix': args.mix, 'scale': args.scale, 'environment': environment(), 'runs': []}
+        for workers in parse_numbers(args.workers):
+            if is_sqlite_file:
+                # Every worker count starts from the same seeded data
+                shutil.copyfile(template, database)
+                os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+            port = free_port()
+            run = {'workers': workers, 'threads': args.threads, 'steps': []}
+            rates = parse_numbers(args.rates)
+            with GunicornServer(port, workers, args.threads, Path(workdir) / 'server.log'):
+                # Unrecorded, lets every worker open its connections and warm its caches
+                run_step('127.0.0.1', port, users, dataset, MIXES[args.mix], min(rates), args.warmup,
+                         args.concurrency, args.seed)
+                for rate in rates:
+                    run['steps'].append(run_step(
+                        '127.0.0.1', port, users, dataset, MIXES[args.mix], rate, args.duration,
+                        args.concurrency, args.seed + rate
+                    ))
+            report['runs'].append(run)
+            print(format_curve(run))
+            print()
+
+    if args.output:
+        save_report(report, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
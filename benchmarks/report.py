@@ -0,0 +1,114 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, None where getrusage is unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def summarize(latencies, errors, elapsed):
+    """Latency percentiles in milliseconds and throughput of one scenario"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        'requests': count,
+        'errors': errors,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'mean_ms': round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        'rps': round(count / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Where the numbers were measured, stored next to them in every report"""
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def save_report(report, path):
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+        output.write('\n')
+
+
+def load_report(path):
+    with open(path) as source:
+        return json.load(source)
+
+
+def compare_reports(current, baseline, tolerance):
+    """List the scenarios whose median latency grew past ``tolerance`` or that started failing.
+
+    Tail percentiles and req/s (the inverse of the mean for one sequential
+    client) are reported but not compared: a single scheduler hiccup or
+    fsync moves them more than most code changes do.
+    """
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        if before['p50_ms'] and result['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {before['p50_ms']}ms -> {result['p50_ms']}ms")
+        if result['errors'] > before['errors']:
+            regressions.append(f"{name}: {before['errors']} errors -> {result['errors']} errors")
+    return regressions
+
+
+def format_table(report, baseline=None):
+    """Render a report as aligned text, with the change against ``baseline`` when given"""
+    lines = [f"{'scenario':<10} {'reqs':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}"
+             f" {'RSS MiB':>8}"]
+    for name, result in report['scenarios'].items():
+        rss = result.get('peak_rss_bytes')
+        line = (
+            f"{name:<10} {result['requests']:>6} {result['errors']:>6} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['rps']:>9.1f}"
+            f" {rss / 1024 / 1024 if rss else 0:>8.1f}"
+        )
+        before = baseline and baseline['scenarios'].get(name)
+        if before and before['p50_ms']:
+            line += f"  p50 {(result['p50_ms'] / before['p50_ms'] - 1) * 100:+.0f}%"
+        lines.append(line)
+    if report.get('peak_rss_bytes'):
+        lines.append(f"peak RSS: {report['peak_rss_bytes'] / 1024 / 1024:.1f} MiB")
+    return '\n'.join(lines)
@@ -0,0 +1,81 @@
+import random
+from datetime import datetime, timedelta
+
+from faker import Faker
+from sqlalchemy import insert, select
+
+# users, tasks per user
+SCALES = {
+    'small': (10, 100),
+    'medium': (100, 1000),
+    'large': (500, 2000),
+}
+
+PASSWORD = 'benchmark-password'
+
+
+def seed_database(app, scale, seed=1234, batch_size=5000):
+    """Fill the app's database with Faker users and tasks at one of ``SCALES``.
+
+    Every user shares ``PASSWORD`` so it is hashed once. Returns the seeded
+    ``users`` as ``(id, username)`` pairs, the ``tasks`` ids of each user and
+    ``search_terms`` that match seeded tasks, along with their ``password``.
+    """
+    # Imported here so the benchmark can set up the environment before src.config loads
+    from src.database import db
+    from src.models import User, Task
+    from src.stats import rebuild_task_stats
+
+    users, tasks_per_user = SCALES[scale]
+    fake = Faker()
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+
+    # A pool of generated text keeps seeding large scales fast while staying deterministic
+    titles = [fake.sentence(nb_words=5).rstrip('.') for _ in range(2000)]
+    descriptions = [fake.paragraph(nb_sentences=2) for _ in range(2000)]
+    search_terms = sorted({word.lower() for title in titles[:200] for word in title.split() if len(word) > 4})
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.create_all()
+        template = User(username='benchmark-template')
+        template.set_password(PASSWORD)
+
+        db.session.execute(insert(User), [
+            {'username': f'bench_{index}_{fake.user_name()}'[:80], 'password_hash': template.password_hash}
+            for index in range(users)
+        ])
+        seeded = db.session.execute(
+            select(User.id, User.username).where(User.username.like('bench\\_%', escape='\\'))
+        ).all()
+        user_ids = [user_id for user_id, _ in seeded]
+
+        rows = []
+        for user_id in user_ids:
+            for _ in range(tasks_per_user):
+                due_in = rng.randint(-30, 60)
+                rows.append({
+                    'title': rng.choice(titles),
+                    'description': rng.choice(descriptions),
+                    'due_date': now + timedelta(days=due_in) if rng.random() < 0.7 else None,
+                    'is_completed': rng.random() < 0.3,
+                    'user_id': user_id,
+                })
+                if len(rows) >= batch_size:
+                    db.session.execute(insert(Task), rows)
+                    rows = []
+        if rows:
+            db.session.execute(insert(Task), rows)
+
+        rebuild_task_stats(db.session)
+        db.session.commit()
+
+        task_ids = {user_id: [] for user_id in user_ids}
+        for user_id, task_id in db.session.execute(
+            select(Task.user_id, Task.id).where(Task.user_id.in_(user_ids))
+        ):
+            task_ids[user_id].append(task_id)
+
+    return {'users': [tuple(row) for row in seeded], 'tasks': task_ids, 'search_terms': search_terms,
+            'password': PASSWORD}
@@ -0,0 +1,71 @@
+import http.client
+import json
+import threading
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class WsgiTransport:
+    """Calls the app in-process through the Flask test client, with no socket or HTTP parsing"""
+
+    name = 'wsgi'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers or {})
+        return response.status_code, response.get_data(), response.headers
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # An access log line per request would be measured along with the app
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class LocalServer:
+    """Runs the app on a threaded Werkzeug server bound to a free local port"""
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.server = make_server(host, port, app, threaded=True, request_handler=QuietRequestHandler)
+        self.host, self.port = host, self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, name='bench-server', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self._thread.join()
+
+
+class SocketTransport:
+    """Sends real HTTP requests over one keep-alive connection to ``host:port``"""
+
+    name = 'socket'
+
+    def __init__(self, host, port, timeout=30):
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read(), response.headers
+        except (http.client.HTTPException, OSError):
+            # Reconnect on the next request instead of reusing a broken connection
+            self.connection.close()
+            raise
+
+    def close(self):
+        self.connection.close()
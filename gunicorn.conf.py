@@ -0,0 +1,19 @@
+from src.config import ProductionConfig
+from src.server import gunicorn_options
+
+# Usage: gunicorn -c gunicorn.conf.py wsgi:app
+_options = gunicorn_options({
+    key: getattr(ProductionConfig, key) for key in dir(ProductionConfig) if key.isupper()
+})
+
+bind = _options['bind']
+workers = _options['workers']
+threads = _options['threads']
+worker_class = _options['worker_class']
+max_requests = _options['max_requests']
+max_requests_jitter = _options['max_requests_jitter']
+timeout = _options['timeout']
+graceful_timeout = _options['graceful_timeout']
+keepalive = _options['keepalive']
+preload_app = _options['preload_app']
+post_fork = _options['post_fork']
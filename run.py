@@ -9,6 +9,18 @@ sys.path.insert(0, str(current_dir))
 from src.app import create_app, initialize_extensions
 
 if __name__ == '__main__':
+    if '--async' in sys.argv:
+        from src.server import serve_async
+
+        serve_async(os.environ.get('FLASK_ENV') or 'production')
+        sys.exit(0)
+
+    if os.environ.get('FLASK_ENV') == 'production' or '--production' in sys.argv:
+        from src.server import serve
+
+        serve('production')
+        sys.exit(0)
+
     app = create_app()
 
     initialize_extensions(app)
@@ -11,13 +11,27 @@ from flask_restful import Api
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 from src.routes import (
     register, login,
     get_tasks, get_task,
     create_task, update_task,
-    delete_task, register_routes
+    delete_task, get_task_stats, batch_tasks, get_task_changes,
+    stream_task_events, register_routes
 )
-from src.database import db
+from src.database import db, build_engine_options, install_engine_hooks
+from src.commands import register_commands
+from src.identity import init_identity_cache
+from src.hashing import init_password_hasher
+from src.json_provider import FastJSONProvider
+from src.events import init_event_bus
+from src.compression import init_compression
+from src.ratelimit import init_rate_limiter
+from src.instrumentation import init_instrumentation
+from src.replicas import init_read_replicas
+from src.sharding import init_sharding, create_shard_schemas
+from src.group_commit import init_group_commit
+from src.response_cache import init_response_cache
 from src.models import User, Task
 from src.auth import authenticate_user, create_user, create_auth_token
 
@@ -26,6 +40,7 @@ load_dotenv()
 def create_app(config_name='development'):
     """Create and configure the Flask application"""
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
 
     try:
         from .config import DevelopmentConfig, TestingConfig, ProductionConfig
@@ -45,14 +60,33 @@ def create_app(config_name='development'):
 
     CORS(app)
 
+    hops = app.config['TRUSTED_PROXIES']
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
     api = Api(app)
 
-    jwt = JWTManager(app)
+    JWTManager(app)
 
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
     db.init_app(app)
+    install_engine_hooks(app)
+    init_instrumentation(app)
+    init_read_replicas(app)
+    init_sharding(app)
+    init_group_commit(app)
+
+    init_identity_cache(app)
+    init_password_hasher(app)
+    init_event_bus(app)
+    init_compression(app)
+    init_response_cache(app)
+    init_rate_limiter(app)
 
     register_routes(app, api)
 
+    register_commands(app)
+
     @app.errorhandler(404)
     def notfound(error):
         """Handle 404 errors"""
@@ -102,6 +136,10 @@ def create_app(config_name='development'):
                 'tasks':{
                     'list_tasks': '/api/tasks (GET)',
                     'create_task': '/api/tasks (POST)',
+                    'task_stats': '/api/tasks/stats (GET)',
+                    'batch_tasks': '/api/tasks/batch (POST)',
+                    'task_changes': '/api/tasks/changes?since=<watermark> (GET)',
+                    'task_events': '/api/tasks/events (GET, text/event-stream)',
                     'get_task': '/api/tasks/<id> (GET)',
                     'update_task': '/api/tasks/<id> (PUT)',
                     'delete_task': '/api/tasks/<id> (DELETE)'
@@ -119,6 +157,10 @@ def register_routes(app, api):
 
     app.add_url_rule('/api/tasks', 'get_tasks', get_tasks, methods=['GET'])
     app.add_url_rule('/api/tasks', 'create_task', create_task, methods=['POST'])
+    app.add_url_rule('/api/tasks/stats', 'get_task_stats', get_task_stats, methods=['GET'])
+    app.add_url_rule('/api/tasks/batch', 'batch_tasks', batch_tasks, methods=['POST'])
+    app.add_url_rule('/api/tasks/changes', 'get_task_changes', get_task_changes, methods=['GET'])
+    app.add_url_rule('/api/tasks/events', 'stream_task_events', stream_task_events, methods=['GET'])
     app.add_url_rule('/api/tasks/<int:id>', 'get_task', get_task, methods=['GET'])
     app.add_url_rule('/api/tasks/<int:id>', 'update_task', update_task, methods=['PUT'])
     app.add_url_rule('/api/tasks/<int:id>', 'delete_task', delete_task, methods=['DELETE'])
@@ -128,11 +170,13 @@ def register_routes(app, api):
 def initialize_extensions(app):
     """Initialize database and other extensions"""
     from src.database import db
-    db.init_app(app)
+    if 'sqlalchemy' not in app.extensions:
+        db.init_app(app)
 
     with app.app_context():
         db.create_all()
-        print("Database initialized successfully!")
+    create_shard_schemas(app)
+    print("Database initialized successfully!")
 
     return app
 
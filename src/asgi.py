@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import re
+from urllib.parse import parse_qsl
+
+import jwt
+from flask import Config
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_date, parse_etags
+
+from src.config import config as config_classes
+from src.database import db, async_database_url, build_async_engine_options, install_sqlite_pragmas
+from src.events import EventBus, create_backend
+from src.identity import IdentityCache
+from src.json_provider import encode_json
+from src.models import User, UserTaskState
+from src.conditional import (
+    task_etag, task_list_etag, check_not_modified, check_precondition_failed, validator_headers
+)
+from src.tasks import (
+    parse_task_fields, list_tasks, list_depends_on_time, find_task,
+    create_task_record, update_task_record, delete_task_record
+)
+
+TASK_PATH = re.compile(r'^/api/tasks/(\d+)$')
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the task handlers need"""
+
+    def __init__(self, scope, receive):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {
+            name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']
+        }
+        self.args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+        self._receive = receive
+
+    async def body(self):
+        chunks = []
+        while True:
+            message = await self._receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def get_json(self):
+        """Decode the body as JSON, None when it is empty or malformed"""
+        try:
+            return json.loads(await self.body() or b'null')
+        except ValueError:
+            return None
+
+    def not_modified(self, etag, last_modified=None):
+        return check_not_modified(
+            parse_etags(self.headers.get('if-none-match')),
+            parse_date(self.headers.get('if-modified-since')),
+            etag, last_modified
+        )
+
+    def precondition_failed(self, etag):
+        if_match = self.headers.get('if-match')
+        return check_precondition_failed(parse_etags(if_match) if if_match else None, etag)
+
+
+class AsyncTaskApp:
+    """ASGI application serving the task endpoints on an asyncio event loop.
+
+    Handlers run the same queries as the Flask views through
+    ``AsyncSession.run_sync``, so a request waiting on the database or on a
+    slow client holds no thread.
+    """
+
+    def __init__(self, config):
+        if config.get('DATABASE_SHARD_URLS'):
+            # Writes here would land on the primary while the Flask app reads the user's shard
+            raise ValueError("The async task API does not route by shard, unset DATABASE_SHARD_URLS to use it")
+        self.config = config
+        self.engine = create_async_engine(
+            async_database_url(config['SQLALCHEMY_DATABASE_URI']), **build_async_engine_options(config)
+        )
+        if self.engine.dialect.name == 'sqlite':
+            install_sqlite_pragmas(self.engine.sync_engine, config)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.identity_cache = IdentityCache(config['IDENTITY_CACHE_SIZE'], config['IDENTITY_CACHE_TTL'])
+        self.events = EventBus(create_backend(config))
+        self.routes = {
+            ('/api/tasks', 'GET'): (self.get_tasks, 'get tasks'),
+            ('/api/tasks', 'POST'): (self.create_task, 'create task'),
+            ('/api/tasks/<id>', 'GET'): (self.get_task, 'get task'),
+            ('/api/tasks/<id>', 'PUT'): (self.update_task, 'update task'),
+            ('/api/tasks/<id>', 'DELETE'): (self.delete_task, 'delete task'),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.handle(AsyncRequest(scope, receive), send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                async with self.engine.begin() as connection:
+                    await connection.run_sync(db.metadata.create_all)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, request, send):
+        if request.path == '/health':
+            status, body, headers = 200, {'status': 'healthy', 'service': 'Task Manager API'}, []
+        else:
+            status, body, headers = await self.dispatch(request)
+        await self.respond(send, status, body, headers)
+
+    async def dispatch(self, request):
+        params = {}
+        path = request.path.rstrip('/') or '/'
+        match = TASK_PATH.match(path)
+        if match:
+            path, params['task_id'] = '/api/tasks/<id>', int(match.group(1))
+
+        methods = [method for route, method in self.routes if route == path]
+        if not methods:
+            return 404, {"error": "Not found"}, []
+        if request.method not in methods:
+            return 405, {"error": "Method not allowed"}, [('Allow', ', '.join(methods))]
+
+        handler, action = self.routes[(path, request.method)]
+        try:
+            user_id = await self.current_user_id(request)
+            if user_id is None:
+                return 401, {"error": "Missing or invalid access token"}, []
+            return await handler(request, user_id, **params)
+        except Exception as exept:
+            return 500, {"error": f"Failed to {action}: {str(exept)}"}, []
+
+    async def respond(self, send, status, body=None, headers=()):
+        headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        payload = b''
+        if body is not None:
+            payload = encode_json(body) + b"\n"
+            headers.append((b'content-type', b'application/json'))
+        headers.append((b'content-length', str(len(payload)).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def current_user_id(self, request):
+        """Resolve the user id from the bearer token, as ``get_current_user_id`` does"""
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        if scheme != 'Bearer' or not token:
+            return None
+        try:
+            claims = jwt.decode(token, self.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+            if claims.get('type') != 'access':
+                return None
+            user_id = int(claims['sub'])
+        except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+            return None
+
+        if self.config['TRUST_TOKEN_IDENTITY'] or user_id in self.identity_cache:
+            return user_id
+
+        async with self.sessions() as session:
+            if await session.scalar(select(User.id).filter_by(id=user_id)) is None:
+                return None
+        self.identity_cache.add(user_id)
+        return user_id
+
+    async def publish(self, user_id, event_type, seq, task):
+        # Backends such as Redis do blocking I/O, keep it off the event loop.
+        await asyncio.to_thread(self.events.publish, user_id, event_type, seq, task)
+
+    async def get_tasks(self, request, user_id):
+        def load(session):
+            # Overdue lists change as time passes, not only on writes, so they get no ETag
+            etag = None
+            if not list_depends_on_time(request.args):
+                etag = task_list_etag(user_id, UserTaskState.current_version(session, user_id), request.args)
+                if request.not_modified(etag):
+                    return etag, None
+            return etag, list_tasks(
+                session, user_id, request.args,
+                self.config['TASKS_PAGE_DEFAULT_LIMIT'], self.config['TASKS_PAGE_MAX_LIMIT']
+            )
+
+        try:
+            async with self.sessions() as session:
+                etag, response = await session.run_sync(load)
+        except ValueError as exept:
+            return 400, {"error": str(exept)}, []
+
+        if response is None:
+            return 304, None, validator_headers(etag)
+        return 200, response, validator_headers(etag) if etag else []
+
+    async def create_task(self, request, user_id):
+        data = await request.get_json()
+        if not data:
+            return 400, {"error": "No data provided"}, []
+
+        fields, error_msg = parse_task_fields(data)
+        if error_msg:
+            return 400, {"error": error_msg}, []
+
+        def create(session):
+            task = create_task_record(session, user_id, fields)
+            return task.change_seq, task.to_dict()
+
+        async with self.sessions() as session:
+            change_seq, task_dict = await session.run_sync(create)
+            await session.commit()
+
+        await self.publish(user_id, 'task.created', change_seq, task_dict)
+        return 201, {"message": "Task created successfully", "task": task_dict}, []
+
+    async def get_task(self, request, user_id, task_id):
+        def load(session):
+            task = find_task(session, user_id, task_id)
+            return task and (task.to_dict(), task.updated_at)
+
+        async with self.sessions() as session:
+            found = await session.run_sync(load)
+        if not found:
+            return 404, {"error": "Task not found"}, []
+
+        task_dict, updated_at = found
+        etag = task_etag(task_id, updated_at)
+        if request.not_modified(etag, updated_at):
+            return 304, None, validator_headers(etag, updated_at)
+        return 200, {"task": task_dict}, validator_headers(etag, updated_at)
+
+    async def update_task(self, request, user_id, task_id):
+        data = await request.get_json()
+
+        def update(session):
+            task = find_task(session, user_id, task_id)
+            if not task:
+                return 404, {"error": "Task not found"}
+            if request.precondition_failed(task_etag(task.id, task.updated_at)):
+                return 412, {"error": "Task was modified by another request"}
+            if not data:
+                return 400, {"error": "No data provided"}
+            fields, error_msg = parse_task_fields(data, partial=True)
+            if error_msg:
+                return 400, {"error": error_msg}
+            update_task_record(session, task, fields)
+            return 200, (task.change_seq, task.to_dict(), task.updated_at)
+
+        async with self.sessions() as session:
+            status, result = await session.run_sync(update)
+            if status != 200:
+                return status, result, []
+            await session.commit()
+
+        change_seq, task_dict, updated_at = result
+
+        await self.publish(user_id, 'task.updated', change_seq, task_dict)
+        body = {"message": "Task updated successfully", "task": task_dict}
+        return 200, body, validator_headers(task_etag(task_id, updated_at), updated_at)
+
+    async def delete_task(self, request, user_id, task_id):
+        def delete(session):
+            task = find_task(session, user_id, task_id)
+            return task and delete_task_record(session, task)
+
+        async with self.sessions() as session:
+            change_seq = await session.run_sync(delete)
+            if not change_seq:
+                return 404, {"error": "Task not found"}, []
+            await session.commit()
+
+        await self.publish(user_id, 'task.deleted', change_seq, {"id": task_id})
+        return 200, {"message": "Task deleted successfully"}, []
+
+
+def load_config(config_name):
+    """Load one of the classes from ``src.config`` into a plain mapping"""
+    config = Config(os.getcwd())
+    config.from_object(config_classes.get(config_name, config_classes['default']))
+    return config
+
+
+def create_asgi_app(config_name=None):
+    """ASGI factory, e.g. ``uvicorn --factory src.asgi:create_asgi_app``"""
+    return AsyncTaskApp(load_config(config_name or os.environ.get('FLASK_ENV', 'development')))
@@ -1,19 +1,25 @@
 from flask import jsonify
 from flask_jwt_extended import create_access_token
-from werkzeug.security import generate_password_hash, check_password_hash
 from src.database import db
 from src.models import User
+from src.sharding import place_new_user
 
 def authenticate_user(username, password):
-    """Authenticate a user using the username and password"""
+    """Authenticate a user using the username and password.
+
+    Hashes made with outdated KDF parameters are upgraded on a successful login.
+    """
 
     user = User.query.filter_by(username=username).first()
     if user and user.check_password(password):
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
         return user
     return None
 
 def create_user(username, password):
-    """Create a new user"""
+    """Create a new user, placing its tasks on a shard when they are sharded"""
     if User.query.filter_by(username=username).first():
         return None, "Username already exists"
     
@@ -21,6 +27,8 @@ def create_user(username, password):
     user.set_password(password)
 
     db.session.add(user)
+    db.session.flush()
+    place_new_user(db.session, user)
     db.session.commit()
 
     return user, None
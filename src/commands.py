@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+import click
+
+from sqlalchemy.orm import Session
+
+from src.database import db
+
+
+def task_engines(app):
+    """Engines of every database holding task data by shard name, the primary first"""
+    from src.sharding import PRIMARY_SHARD
+
+    engines = {PRIMARY_SHARD: db.engine}
+    if 'shards' in app.extensions:
+        engines.update(app.extensions['shards'].engines)
+    return engines
+
+
+def task_sessions(app):
+    """Yield a session on every database holding task data, ``db.session`` for the primary"""
+    for engine in task_engines(app).values():
+        if engine is db.engine:
+            yield db.session
+        else:
+            with Session(engine) as session:
+                yield session
+
+
+def register_commands(app):
+    """Register maintenance CLI commands with the Flask app"""
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the full-text search index from the tasks table of every shard"""
+        from src.search import rebuild_search_index
+
+        for session in task_sessions(app):
+            rebuild_search_index(session)
+        click.echo("Search index rebuilt.")
+
+    @app.cli.command('rebuild-task-stats')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild the counters of this user.')
+    def rebuild_task_stats_command(user_id):
+        """Recompute the task counters behind /api/tasks/stats on every shard, fixing any drift"""
+        from src.stats import rebuild_task_stats
+
+        rebuilt = 0
+        for session in task_sessions(app):
+            rebuilt += rebuild_task_stats(session, user_id)
+            session.commit()
+        click.echo(f"Rebuilt task stats for {rebuilt} users.")
+
+    @app.cli.command('create-task-indexes')
+    def create_task_indexes_command():
+        """Add the task indexes missing from databases created by an older version"""
+        from src.models import create_task_indexes
+
+        for name, engine in task_engines(app).items():
+            created = create_task_indexes(engine)
+            click.echo(f"{name}: created {', '.join(created) or 'no indexes'}.")
+
+    @app.cli.command('snapshot-sqlite-replicas')
+    def snapshot_sqlite_replicas_command():
+        """Copy the SQLite primary into the SQLite files of DATABASE_REPLICA_URLS"""
+        from src.replicas import snapshot_sqlite_replicas
+
+        refreshed = snapshot_sqlite_replicas(app)
+        click.echo(f"Refreshed {refreshed} SQLite replicas.")
+
+    @app.cli.command('move-user-shard')
+    @click.argument('user_id', type=int)
+    @click.argument('shard')
+    @click.option('--settle', type=float, default=None,
+                  help='Seconds to let placement caches catch up, SHARD_MOVE_SETTLE_SECONDS by default.')
+    def move_user_shard_command(user_id, shard, settle):
+        """Move a user's tasks to SHARD ('primary' for the main database) while the API keeps serving"""
+        from src.sharding import move_users
+
+        if 'shards' not in app.extensions:
+            raise click.ClickException("DATABASE_SHARD_URLS is not configured.")
+        try:
+            moved = move_users(app, [(user_id, shard)], settle)
+        except ValueError as exept:
+            raise click.ClickException(str(exept))
+        if user_id not in moved:
+            click.echo(f"User {user_id} is already on {shard}.")
+        else:
+            click.echo(f"Moved {moved[user_id]} tasks of user {user_id} to {shard}.")
+
+    @app.cli.command('rebalance-shards')
+    @click.option('--dry-run', is_flag=True, help='Only list the users that would move.')
+    @click.option('--settle', type=float, default=None,
+                  help='Seconds to let placement caches catch up, SHARD_MOVE_SETTLE_SECONDS by default.')
+    def rebalance_shards_command(dry_run, settle):
+        """Move every user whose tasks are not on the shard the hash ring assigns, e.g. after adding a shard"""
+        from src.sharding import move_users, plan_rebalance
+
+        if 'shards' not in app.extensions:
+            raise click.ClickException("DATABASE_SHARD_URLS is not configured.")
+        plan = plan_rebalance(app)
+        for user_id, current, home in plan:
+            click.echo(f"user {user_id}: {current} -> {home}")
+        if dry_run:
+            click.echo(f"{len(plan)} users would move.")
+            return
+        moved = move_users(app, [(user_id, home) for user_id, _, home in plan], settle)
+        click.echo(f"Moved {sum(moved.values())} tasks of {len(moved)} users.")
+
+    @app.cli.command('shard-stats')
+    def shard_stats_command():
+        """Count users and tasks on the primary and every shard"""
+        from src.sharding import shard_stats
+
+        for shard, stats in shard_stats(app).items():
+            click.echo(f"{shard}: {stats['users']} users, {stats['tasks']} tasks")
+
+    @app.cli.command('prune-tombstones')
+    @click.option('--days', type=int, default=None, help='Keep tombstones younger than this many days.')
+    def prune_tombstones_command(days):
+        """Delete old task tombstones on every shard; clients syncing from before them must resync"""
+        from src.models import TaskTombstone, UserTaskState
+
+        retention = days if days is not None else app.config['TASKS_TOMBSTONE_RETENTION_DAYS']
+        cutoff = datetime.utcnow() - timedelta(days=retention)
+
+        deleted = users = 0
+        for session in task_sessions(app):
+            pruned = session.execute(
+                db.select(TaskTombstone.user_id, db.func.max(TaskTombstone.change_seq))
+                .where(TaskTombstone.deleted_at < cutoff)
+                .group_by(TaskTombstone.user_id)
+            ).all()
+            for user_id, max_seq in pruned:
+                session.execute(
+                    db.update(UserTaskState)
+                    .where(UserTaskState.user_id == user_id)
+                    .values(tombstones_pruned_seq=max_seq)
+                )
+            deleted += session.execute(
+                db.delete(TaskTombstone).where(TaskTombstone.deleted_at < cutoff)
+            ).rowcount
+            users += len(pruned)
+            session.commit()
+        click.echo(f"Pruned {deleted} tombstones for {users} users.")
@@ -0,0 +1,297 @@
+import ipaddress
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        compressor = self.stream()
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self):
+        # wbits 16 + MAX_WBITS writes the gzip container instead of raw zlib
+        return _ZlibStream(zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS))
+
+
+class _ZlibStream:
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush_block(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self):
+        return _BrotliStream(brotli.Compressor(quality=self.level))
+
+
+class _BrotliStream:
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush_block(self):
+        return self._compressor.flush()
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self.level = level
+        self._compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def stream(self):
+        return _ZstdStream(zstandard.ZstdCompressor(level=self.level).compressobj())
+
+
+class _ZstdStream:
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush_block(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+ENCODERS = {
+    'gzip': (GzipEncoder, lambda: True),
+    'br': (BrotliEncoder, lambda: brotli is not None),
+    'zstd': (ZstdEncoder, lambda: zstandard is not None),
+}
+
+
+def available_encodings(names):
+    """Filter configured encoding names down to the ones installed, keeping their order"""
+    encodings = []
+    for name in names:
+        if name not in ENCODERS:
+            raise ValueError(f"Unknown compression algorithm: {name}")
+        if ENCODERS[name][1]():
+            encodings.append(name)
+    return encodings
+
+
+def compressed_etag(etag, encoding):
+    """ETag of the compressed representation, distinct per encoding"""
+    return f"{etag}-{encoding}"
+
+
+def etag_variants(etag):
+    """The ETag plus the ETags its compressed representations are served with"""
+    return [etag] + [compressed_etag(etag, name) for name in ENCODERS]
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by ETag, bounded by total size"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class Compressor:
+    """Negotiates and applies Content-Encoding for the app's responses.
+
+    Clients get the first configured encoding they accept. Callers from
+    ``COMPRESSION_INTERNAL_NETWORKS`` get the fastest level instead, or no
+    compression when ``COMPRESSION_INTERNAL_LEVEL`` is 0. Bodies of responses
+    with an ETag are cached compressed, so an unchanged list is compressed once.
+    """
+
+    def __init__(self, config):
+        self.encodings = available_encodings(
+            [name.strip() for name in config['COMPRESSION_ALGORITHMS'].split(',') if name.strip()]
+        )
+        self.min_size = config['COMPRESSION_MIN_SIZE']
+        self.mimetypes = {
+            mimetype.strip() for mimetype in config['COMPRESSION_MIMETYPES'].split(',') if mimetype.strip()
+        }
+        levels = {
+            'gzip': config['COMPRESSION_GZIP_LEVEL'],
+            'br': config['COMPRESSION_BROTLI_LEVEL'],
+            'zstd': config['COMPRESSION_ZSTD_LEVEL'],
+        }
+        self.encoders = {name: ENCODERS[name][0](levels[name]) for name in self.encodings}
+
+        internal_level = config['COMPRESSION_INTERNAL_LEVEL']
+        self.internal_encoders = {}
+        if internal_level:
+            self.internal_encoders = {name: ENCODERS[name][0](internal_level) for name in self.encodings}
+        self.internal_networks = [
+            ipaddress.ip_network(network.strip())
+            for network in config['COMPRESSION_INTERNAL_NETWORKS'].split(',') if network.strip()
+        ]
+        self.cache = CompressedCache(config['COMPRESSION_CACHE_MAX_BYTES'])
+
+    def is_internal(self, remote_addr):
+        if not self.internal_networks or not remote_addr:
+            return False
+        try:
+            address = ipaddress.ip_address(remote_addr)
+        except ValueError:
+            return False
+        return any(address in network for network in self.internal_networks)
+
+    def select_encoder(self):
+        """Pick the encoder for the current request, None for an uncompressed response"""
+        encoders = self.internal_encoders if self.is_internal(request.remote_addr) else self.encoders
+        if not encoders:
+            return None
+        name = request.accept_encodings.best_match(list(encoders))
+        return encoders.get(name)
+
+    def is_compressible(self, response):
+        if response.mimetype not in self.mimetypes:
+            return False
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers or request.method == 'HEAD':
+            return False
+        return 'no-transform' not in (response.headers.get('Cache-Control') or '')
+
+    def after_request(self, response):
+        if response.status_code == 304:
+            return self._tag_not_modified(response)
+        if not self.is_compressible(response):
+            return response
+
+        encoder = self.select_encoder()
+        response.vary.add('Accept-Encoding')
+        if encoder is None:
+            return response
+
+        if response.is_streamed:
+            return self._compress_stream(response, encoder)
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        if etag:
+            key = (etag, encoder.name, encoder.level)
+            compressed = self.cache.get(key)
+            if compressed is None:
+                compressed = encoder.compress(body)
+                self.cache.put(key, compressed)
+            response.set_etag(compressed_etag(etag, encoder.name))
+        else:
+            compressed = encoder.compress(body)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoder.name
+        return response
+
+    def _compress_stream(self, response, encoder):
+        chunks = response.response
+        stream = encoder.stream()
+
+        def generate():
+            try:
+                for chunk in chunks:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    # Flush every chunk so events reach the client without waiting for more output
+                    yield stream.compress(chunk) + stream.flush_block()
+                yield stream.flush()
+            finally:
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+
+        response.response = generate()
+        response.headers['Content-Encoding'] = encoder.name
+        response.headers.pop('Content-Length', None)
+        etag, _ = response.get_etag()
+        if etag:
+            response.set_etag(compressed_etag(etag, encoder.name))
+        return response
+
+    def _tag_not_modified(self, response):
+        """Echo the encoding-specific ETag on a 304 when the client validated with one"""
+        etag, _ = response.get_etag()
+        if not etag or not request.if_none_match:
+            return response
+        for name in self.encodings:
+            if request.if_none_match.contains_weak(compressed_etag(etag, name)):
+                response.set_etag(compressed_etag(etag, name))
+                response.vary.add('Accept-Encoding')
+                break
+        return response
+
+
+def init_compression(app):
+    """Compress responses after each request when COMPRESSION_ENABLED is set"""
+    if not app.config['COMPRESSION_ENABLED']:
+        return
+    compressor = Compressor(app.config)
+    app.extensions['compressor'] = compressor
+    app.after_request(compressor.after_request)
@@ -0,0 +1,71 @@
+import hashlib
+from datetime import timezone
+
+from flask import current_app, request
+from werkzeug.http import http_date, quote_etag
+
+from src.compression import etag_variants
+
+
+def task_etag(task_id, updated_at):
+    """ETag for a single task, derived from its id and last update time"""
+    stamp = updated_at.isoformat() if updated_at else ''
+    return hashlib.sha1(f"task:{task_id}:{stamp}".encode('utf-8')).hexdigest()[:20]
+
+
+def normalized_args(args):
+    """Query args as a string that doesn't depend on their order"""
+    return '&'.join(f"{key}={value}" for key, value in sorted(args.items(multi=True)))
+
+
+def task_list_etag(user_id, version, args):
+    """ETag for a task list response, derived from the user's version counter and the query args"""
+    return hashlib.sha1(f"tasks:{user_id}:{version}:{normalized_args(args)}".encode('utf-8')).hexdigest()[:20]
+
+
+def _as_utc(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def check_not_modified(if_none_match, if_modified_since, etag, last_modified=None):
+    """Evaluate parsed If-None-Match / If-Modified-Since values against the current state"""
+    if if_none_match:
+        return any(if_none_match.contains_weak(variant) for variant in etag_variants(etag))
+    if last_modified is not None and if_modified_since is not None:
+        return _as_utc(last_modified) <= if_modified_since
+    return False
+
+
+def is_not_modified(etag, last_modified=None):
+    """Check If-None-Match (or If-Modified-Since when no ETag was sent) against the current state"""
+    return check_not_modified(request.if_none_match, request.if_modified_since, etag, last_modified)
+
+
+def check_precondition_failed(if_match, etag):
+    """Evaluate a parsed If-Match value; True when the client's copy is stale"""
+    if not if_match:
+        return False
+    return not (if_match.star_tag or any(if_match.contains(variant) for variant in etag_variants(etag)))
+
+
+def validator_headers(etag, last_modified=None):
+    """List the ETag, Last-Modified and Cache-Control headers for a response"""
+    headers = [('ETag', quote_etag(etag))]
+    if last_modified is not None:
+        headers.append(('Last-Modified', http_date(_as_utc(last_modified))))
+    headers.append(('Cache-Control', 'private, no-cache'))
+    return headers
+
+
+def with_validators(response, etag, last_modified=None):
+    """Attach the cache validators to a response"""
+    for name, value in validator_headers(etag, last_modified):
+        response.headers[name] = value
+    return response
+
+
+def not_modified_response(etag, last_modified=None):
+    """Build an empty 304 response carrying the current validators"""
+    return with_validators(current_app.response_class(status=304), etag, last_modified)
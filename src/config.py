@@ -11,12 +11,107 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+
+    DATABASE_REPLICA_URLS = os.environ.get('DATABASE_REPLICA_URLS') or ''
+    DB_REPLICA_PIN_SECONDS = float(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+    DATABASE_SHARD_URLS = os.environ.get('DATABASE_SHARD_URLS') or ''
+    SHARD_VIRTUAL_NODES = int(os.environ.get('SHARD_VIRTUAL_NODES', 64))
+    SHARD_PLACEMENT_TTL = float(os.environ.get('SHARD_PLACEMENT_TTL', 5))
+    SHARD_MOVE_SETTLE_SECONDS = float(os.environ.get('SHARD_MOVE_SETTLE_SECONDS', 10))
+    SHARD_ID_BLOCK_SIZE = int(os.environ.get('SHARD_ID_BLOCK_SIZE', 1000))
+
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -65536))
+
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwtsecretkey'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_TOKEN_LOCATION = ['headers']
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
 
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    PASSWORD_HASH_SALT_LENGTH = int(os.environ.get('PASSWORD_HASH_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+    PASSWORD_HASH_TIMEOUT = int(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_ALGORITHMS = os.environ.get('COMPRESSION_ALGORITHMS') or 'zstd,br,gzip'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_LEVEL = int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 5))
+    COMPRESSION_ZSTD_LEVEL = int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 6))
+    COMPRESSION_INTERNAL_NETWORKS = os.environ.get('COMPRESSION_INTERNAL_NETWORKS') or ''
+    COMPRESSION_INTERNAL_LEVEL = int(os.environ.get('COMPRESSION_INTERNAL_LEVEL', 1))
+    COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get('COMPRESSION_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    COMPRESSION_MIMETYPES = os.environ.get('COMPRESSION_MIMETYPES') or (
+        'application/json,text/event-stream,text/plain,text/html,text/css,application/javascript'
+    )
+
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or 'memory'
+    RATELIMIT_STORAGE_PATH = os.environ.get('RATELIMIT_STORAGE_PATH')
+    RATELIMIT_SHARED_SLOTS = int(os.environ.get('RATELIMIT_SHARED_SLOTS', 65536))
+    RATELIMIT_RULES = os.environ.get('RATELIMIT_RULES') or 'auth=10/60,read=600/60,write=120/60,stream=30/60'
+    # Reverse proxies in front of the app whose X-Forwarded-* headers are trusted
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+    INSTRUMENTATION_SERVER_TIMING = os.environ.get('INSTRUMENTATION_SERVER_TIMING', 'true').lower() == 'true'
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE') or 'off'
+    QUERY_BUDGET_REPEAT_LIMIT = int(os.environ.get('QUERY_BUDGET_REPEAT_LIMIT', 5))
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true'
+    PROFILER_SLOW_MS = int(os.environ.get('PROFILER_SLOW_MS', 250))
+    PROFILER_INTERVAL_MS = int(os.environ.get('PROFILER_INTERVAL_MS', 5))
+    PROFILER_OUTPUT_DIR = os.environ.get('PROFILER_OUTPUT_DIR') or 'profiles'
+
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 300))
+    TRUST_TOKEN_IDENTITY = os.environ.get('TRUST_TOKEN_IDENTITY', 'false').lower() == 'true'
+
+    # Threads of each gunicorn worker; open event streams hold one each, see EVENTS_MAX_STREAMS
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 16))
+
+    TASKS_PAGE_DEFAULT_LIMIT = int(os.environ.get('TASKS_PAGE_DEFAULT_LIMIT', 50))
+    TASKS_PAGE_MAX_LIMIT = int(os.environ.get('TASKS_PAGE_MAX_LIMIT', 200))
+    TASKS_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TASKS_TOMBSTONE_RETENTION_DAYS', 30))
+    TASKS_BATCH_MAX_OPERATIONS = int(os.environ.get('TASKS_BATCH_MAX_OPERATIONS', 500))
+
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', 'false').lower() == 'true'
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 2))
+    GROUP_COMMIT_TIMEOUT = float(os.environ.get('GROUP_COMMIT_TIMEOUT', 30))
+
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND') or 'memory'
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL') or 'redis://localhost:6379/1'
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+
+    EVENT_BUS_BACKEND = os.environ.get('EVENT_BUS_BACKEND') or 'memory'
+    EVENT_BUS_URL = os.environ.get('EVENT_BUS_URL') or 'redis://localhost:6379/0'
+    EVENT_BUS_HISTORY_SIZE = int(os.environ.get('EVENT_BUS_HISTORY_SIZE', 100))
+    # Users whose recent events a process keeps for replay, and how long after their last write
+    EVENT_BUS_HISTORY_CHANNELS = int(os.environ.get('EVENT_BUS_HISTORY_CHANNELS', 10000))
+    EVENT_BUS_HISTORY_TTL = int(os.environ.get('EVENT_BUS_HISTORY_TTL', 600))
+    EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_STREAM_MAX_SECONDS = int(os.environ.get('EVENTS_STREAM_MAX_SECONDS', 300))
+    EVENTS_LONG_POLL_MAX_SECONDS = int(os.environ.get('EVENTS_LONG_POLL_MAX_SECONDS', 30))
+    # Open streams and long polls per process; each holds a worker thread, so by default
+    # all of SERVER_THREADS but four, which stay free for regular requests
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', max(SERVER_THREADS - 4, 1)))
+
     API_TITLE = "Qpurpose API"
     API_VERSION = "v0.0.0"
     OPENAPI_VERSION = "3.0.3"
@@ -24,6 +119,7 @@ class Config:
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE') or 'log'
 
 class TestingConfig(Config):
     """Testing configuration"""
@@ -31,6 +127,9 @@ class TestingConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=5)
+    PASSWORD_HASH_WORKERS = 0
+    RATELIMIT_ENABLED = False
+    QUERY_BUDGET_MODE = 'raise'
 
 class ProductionConfig(Config):
     """Production configuration"""
@@ -39,6 +138,20 @@ class ProductionConfig(Config):
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
 
+    SERVER_BIND = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 5000)}"
+    SERVER_WORKERS = int(os.environ.get('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 1000))
+    SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', 100))
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 30))
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+    SERVER_KEEPALIVE = int(os.environ.get('SERVER_KEEPALIVE', 5))
+    SERVER_PRELOAD_APP = os.environ.get('SERVER_PRELOAD_APP', 'true').lower() == 'true'
+
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or 'shared'
+    INSTRUMENTATION_SERVER_TIMING = os.environ.get('INSTRUMENTATION_SERVER_TIMING', 'false').lower() == 'true'
+    # /metrics reveals per-route traffic, only serve it when asked to (ideally with METRICS_TOKEN)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+
 config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
@@ -1,11 +1,218 @@
+import time
+
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, TextClause, create_engine, event, exc, inspect
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import QueuePool
+
+from src.metrics import registry
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+POOL_WAIT_SECONDS = registry.histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting for a connection from the pool',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+POOL_TIMEOUTS = registry.counter(
+    'db_pool_checkout_timeouts_total',
+    'Pool checkouts that gave up after pool_timeout'
+)
+
+# Tables that always live in the primary database, even when task data is sharded
+DIRECTORY_TABLES = {'users', 'user_shards', 'id_blocks'}
 
 class Base(DeclarativeBase):
     """Base class for SQLAlchemy models."""
     pass
 
-db = SQLAlchemy(model_class=Base)
+
+class RoutingSession(Session):
+    """Session sending statements of sharded and replica-routed requests to other engines.
+
+    ``src.sharding.user_shard`` puts the engine holding the user's tasks on
+    ``g.db_shard``; every statement except those on ``DIRECTORY_TABLES``
+    goes there. ``src.replicas.read_replica`` puts the replica engine chosen
+    for the request on ``g.db_replica``, which serves the remaining SELECTs.
+    Flushes and every other statement go to the primary and mark the
+    request as having written.
+    """
+
+    @staticmethod
+    def _is_read(clause):
+        if clause is None or isinstance(clause, Select):
+            return True
+        return isinstance(clause, TextClause) and clause.text.lstrip()[:6].upper() == 'SELECT'
+
+    @staticmethod
+    def _is_directory(mapper, clause):
+        if mapper is not None:
+            return inspect(mapper).local_table.name in DIRECTORY_TABLES
+        return isinstance(clause, UpdateBase) and clause.table.name in DIRECTORY_TABLES
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            writing = self._flushing or not self._is_read(clause)
+            if writing:
+                g.db_wrote = True
+            if g.get('db_shard') is not None and not self._is_directory(mapper, clause):
+                return g.db_shard
+            if not writing and g.get('db_replica') is not None:
+                return g.db_replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def build_engine_options(config, uri=None):
+    """Build SQLALCHEMY_ENGINE_OPTIONS for the configured database, or for ``uri``.
+
+    Explicit ``SQLALCHEMY_ENGINE_OPTIONS`` entries win over the ones derived
+    from the ``DB_*`` settings.
+    """
+    url = make_url(uri or config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+
+    if not _is_memory_sqlite(url):
+        options.update({
+            'poolclass': TimedQueuePool,
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        })
+
+    statement_timeout = config['DB_STATEMENT_TIMEOUT_MS']
+    if statement_timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def _create_engine(config, url):
+    engine = create_engine(url, **build_engine_options(config, url))
+    if engine.dialect.name == 'sqlite':
+        install_sqlite_pragmas(engine, config)
+    return engine
+
+
+def create_replica_engines(config):
+    """Create an engine for each read replica listed in DATABASE_REPLICA_URLS.
+
+    Replicas get the same pool options and SQLite pragmas as the primary.
+    """
+    return [_create_engine(config, url.strip()) for url in config['DATABASE_REPLICA_URLS'].split(',') if url.strip()]
+
+
+def create_shard_engines(config):
+    """Create an engine for each ``name=url`` entry of DATABASE_SHARD_URLS, keyed by shard name"""
+    engines = {}
+    for entry in config['DATABASE_SHARD_URLS'].split(','):
+        if not entry.strip():
+            continue
+        name, separator, url = entry.partition('=')
+        if not separator or not name.strip() or not url.strip():
+            raise ValueError(f"Invalid DATABASE_SHARD_URLS entry: {entry.strip()}")
+        engines[name.strip()] = _create_engine(config, url.strip())
+    return engines
+
+
+def sqlite_pragmas(config):
+    """List the PRAGMA statements to run on every new SQLite connection"""
+    journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"Unsupported SQLITE_JOURNAL_MODE: {journal_mode}")
+    if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"Unsupported SQLITE_SYNCHRONOUS: {synchronous}")
+
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+    ]
+
+
+def install_sqlite_pragmas(engine, config):
+    """Run the configured PRAGMA statements on every new connection of ``engine``"""
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def install_engine_hooks(app):
+    """Apply per-connection tuning to the engines created for the app"""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                install_sqlite_pragmas(engine, app.config)
+
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(uri):
+    """Swap the driver of a database URI for its asyncio counterpart"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def build_async_engine_options(config):
+    """Build create_async_engine options from the same DB_* settings.
+
+    The async engine brings its own asyncio-aware queue pool, and asyncpg
+    takes the statement timeout as a server setting.
+    """
+    options = build_engine_options(config)
+    if options.get('poolclass') is TimedQueuePool:
+        del options['poolclass']
+
+    statement_timeout = config['DB_STATEMENT_TIMEOUT_MS']
+    if statement_timeout and make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'postgresql':
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(int(statement_timeout))}}
+    return options
+
 
 def init_db(app):
     """Initialize the database with the Flask app."""
@@ -13,4 +220,4 @@ def init_db(app):
     
     with app.app_context():
         db.create_all()
-        print("Database tables created.")
\ No newline at end of file
+        print("Database tables created.")
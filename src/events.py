@@ -0,0 +1,236 @@
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+
+from flask import current_app
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def user_channel(user_id):
+    return f"tasks:{user_id}"
+
+
+class Subscription:
+    """Queue of events delivered to one listener on one channel"""
+
+    def __init__(self, backend, channel, maxsize):
+        self.backend = backend
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout):
+        """Wait up to ``timeout`` seconds for the next event, None if nothing arrived"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InProcessBackend:
+    """Fans events out to subscribers in this process and keeps a short replay history.
+
+    This is enough for a single process and stands in for a shared broker
+    in tests; with several workers use a cross-process backend instead.
+    History is kept for at most ``max_channels`` channels, least recently
+    published first out, and dropped once a channel saw no event for
+    ``history_ttl`` seconds; a client reconnecting after that is told to
+    resync.
+    """
+
+    def __init__(self, history_size=100, subscriber_queue_size=1000, max_channels=10000, history_ttl=600):
+        self.history_size = history_size
+        self.subscriber_queue_size = subscriber_queue_size
+        self.max_channels = max_channels
+        self.history_ttl = history_ttl
+        self._subscribers = defaultdict(set)
+        # channel -> (events, expiry), in order of the last publish
+        self._history = OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            self._record(channel, event)
+        self._deliver(channel, event)
+
+    def _record(self, channel, event):
+        entry = self._history.pop(channel, None)
+        events = entry[0] if entry is not None else deque(maxlen=self.history_size)
+        events.append(event)
+        now = time.monotonic()
+        self._history[channel] = (events, now + self.history_ttl)
+        while self._history and (len(self._history) > self.max_channels
+                                 or next(iter(self._history.values()))[1] <= now):
+            self._history.popitem(last=False)
+
+    def _deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # A stalled listener loses events; it can catch up from the change feed.
+                pass
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.subscriber_queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def history(self, channel):
+        with self._lock:
+            entry = self._history.get(channel)
+            if entry is None or entry[1] <= time.monotonic():
+                return []
+            return list(entry[0])
+
+
+class RedisBackend(InProcessBackend):
+    """Shares events between processes through Redis pub/sub.
+
+    Each process runs one listener thread that feeds its local subscribers,
+    and the replay history is kept in a capped Redis list.
+    """
+
+    def __init__(self, url, history_size=100, subscriber_queue_size=1000):
+        super().__init__(history_size, subscriber_queue_size)
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, channel, event):
+        payload = json.dumps(event)
+        pipeline = self._redis.pipeline()
+        pipeline.rpush(f"{channel}:history", payload)
+        pipeline.ltrim(f"{channel}:history", -self.history_size, -1)
+        pipeline.publish(channel, payload)
+        pipeline.execute()
+
+    def subscribe(self, channel):
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def history(self, channel):
+        return [json.loads(payload) for payload in self._redis.lrange(f"{channel}:history", 0, -1)]
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-bus-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(user_channel('*'))
+        for message in pubsub.listen():
+            channel = message['channel'].decode('utf-8')
+            event = json.loads(message['data'])
+            # The history lives in Redis, local subscribers only need the event
+            self._deliver(channel, event)
+
+
+class EventBus:
+    """Publishes task change events per user"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def publish(self, user_id, event_type, seq, task):
+        self.backend.publish(user_channel(user_id), {'type': event_type, 'seq': seq, 'task': task})
+
+    def subscribe(self, user_id):
+        return self.backend.subscribe(user_channel(user_id))
+
+    def events_after(self, user_id, seq):
+        """Replay buffered events after ``seq``, in sequence order"""
+        history = self.backend.history(user_channel(user_id))
+        return sorted((event for event in history if event['seq'] > seq), key=lambda event: event['seq'])
+
+
+class StreamSlots:
+    """Caps the event streams and long polls one process holds open at once.
+
+    Each of them keeps a worker thread busy for its whole duration, so
+    without a cap a few open dashboards would take every thread of a worker.
+    A limit of 0 means no cap.
+    """
+
+    def __init__(self, limit):
+        self._slots = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+    def acquire(self):
+        """Take a slot, returning the function that gives it back, or None when all are taken"""
+        if self._slots is None:
+            return lambda: None
+        if not self._slots.acquire(blocking=False):
+            return None
+
+        released = []
+
+        def release():
+            if not released:
+                released.append(True)
+                self._slots.release()
+        return release
+
+
+def create_backend(config):
+    """Build the event bus backend named by EVENT_BUS_BACKEND"""
+    name = config['EVENT_BUS_BACKEND']
+    if name == 'memory':
+        return InProcessBackend(
+            config['EVENT_BUS_HISTORY_SIZE'],
+            max_channels=config['EVENT_BUS_HISTORY_CHANNELS'],
+            history_ttl=config['EVENT_BUS_HISTORY_TTL']
+        )
+    if name == 'redis':
+        if redis is None:
+            raise ValueError("EVENT_BUS_BACKEND=redis needs the redis package, see requirements-optional.txt")
+        return RedisBackend(config['EVENT_BUS_URL'], config['EVENT_BUS_HISTORY_SIZE'])
+    raise ValueError(f"Unknown EVENT_BUS_BACKEND: {name}")
+
+
+def init_event_bus(app):
+    """Attach the task event bus to the app"""
+    app.extensions['event_bus'] = EventBus(create_backend(app.config))
+    app.extensions['event_stream_slots'] = StreamSlots(app.config['EVENTS_MAX_STREAMS'])
+
+
+def get_event_bus():
+    return current_app.extensions['event_bus']
+
+
+def get_stream_slots():
+    return current_app.extensions['event_stream_slots']
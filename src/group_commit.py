@@ -0,0 +1,143 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from flask import current_app, g
+from sqlalchemy.orm import sessionmaker
+
+from src.database import db
+from src.metrics import registry
+
+GROUP_SIZE = registry.histogram(
+    'db_group_commit_size', 'Mutations committed together in one group commit transaction',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+GROUP_SECONDS = registry.histogram(
+    'db_group_commit_seconds', 'Time to run and commit one group of mutations'
+)
+
+
+class GroupCommitWriter:
+    """Runs the mutations of concurrent requests on one thread and commits them together.
+
+    A future from ``submit`` resolves only after the transaction holding its
+    mutation committed, so a response still means the write is durable; the
+    requests just share the fsync and one hold of the write lock. When a
+    group fails, its mutations are retried in a transaction each, so one bad
+    mutation can't fail the others.
+    """
+
+    def __init__(self, app, engine, max_batch=64, max_delay=0.002):
+        self.app = app
+        self.sessions = sessionmaker(bind=engine, expire_on_commit=False)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def _ensure_thread(self):
+        # Started lazily so every forked worker gets its own writer and queue
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.SimpleQueue()
+                threading.Thread(target=self._run, args=(self._queue,), name='group-commit', daemon=True).start()
+            return self._queue
+
+    def submit(self, mutation):
+        """Queue ``mutation(session)`` for the next group, returning a future of its result"""
+        future = Future()
+        self._ensure_thread().put((mutation, future))
+        return future
+
+    def _run(self, pending):
+        while True:
+            group = [pending.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(group) < self.max_batch:
+                try:
+                    group.append(pending.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            # Mutations whose request gave up waiting were cancelled and must not run
+            group = [(mutation, future) for mutation, future in group if future.set_running_or_notify_cancel()]
+            if group:
+                self._commit(group)
+
+    def _commit(self, group):
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                results = self._apply([mutation for mutation, _ in group])
+            except Exception:
+                for mutation, future in group:
+                    try:
+                        future.set_result(self._apply([mutation])[0])
+                    except Exception as exept:
+                        future.set_exception(exept)
+            else:
+                for (_, future), result in zip(group, results):
+                    future.set_result(result)
+        GROUP_SIZE.observe(len(group))
+        GROUP_SECONDS.observe(time.perf_counter() - started)
+
+    def _apply(self, mutations):
+        with self.sessions() as session:
+            results = [mutation(session) for mutation in mutations]
+            session.commit()
+            return results
+
+
+class GroupCommit:
+    """One writer per database engine, created on first use"""
+
+    def __init__(self, app):
+        self.app = app
+        self.max_batch = app.config['GROUP_COMMIT_MAX_BATCH']
+        self.max_delay = app.config['GROUP_COMMIT_MAX_DELAY_MS'] / 1000
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    def writer(self, engine):
+        with self._lock:
+            if engine not in self._writers:
+                self._writers[engine] = GroupCommitWriter(self.app, engine, self.max_batch, self.max_delay)
+            return self._writers[engine]
+
+
+def run_write(mutation):
+    """Run ``mutation(session)`` in a transaction and return its result once committed.
+
+    With group commit enabled the mutation joins those of other requests in
+    the writer's next transaction, on the request's shard when tasks are
+    sharded. Otherwise it runs on ``db.session``. Mutations must return
+    plain data, not ORM objects. A mutation still queued after
+    GROUP_COMMIT_TIMEOUT is cancelled and the timeout raised, so an error
+    still means nothing was written.
+    """
+    group_commit = current_app.extensions.get('group_commit')
+    if group_commit is None:
+        result = mutation(db.session)
+        db.session.commit()
+        return result
+
+    # Statements run on the writer's session, mark the write for replica pinning here
+    g.db_wrote = True
+    writer = group_commit.writer(g.get('db_shard') or db.engine)
+    future = writer.submit(mutation)
+    try:
+        return future.result(timeout=current_app.config['GROUP_COMMIT_TIMEOUT'])
+    except FutureTimeoutError:
+        # Only fail the request if the write can no longer happen; once started, wait for its outcome
+        if future.cancel():
+            raise
+        return future.result()
+
+
+def init_group_commit(app):
+    """Commit task writes of concurrent requests together when GROUP_COMMIT_ENABLED is set"""
+    if app.config['GROUP_COMMIT_ENABLED']:
+        app.extensions['group_commit'] = GroupCommit(app)
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing pool has no room for another request"""
+    pass
+
+
+class PasswordHasher:
+    """Runs password KDFs on a bounded process pool so they don't block request workers.
+
+    With ``workers=0`` the KDF runs inline in the calling thread.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, salt_length=DEFAULT_SALT_LENGTH,
+                 workers=0, max_pending=32, timeout=10):
+        self.method = method
+        self.salt_length = salt_length
+        self._stored_method = None
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending > 0 else None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        """Hash a password with the configured KDF parameters"""
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Check whether a stored hash was made with different KDF parameters"""
+        if not pwhash or pwhash.count('$') < 2:
+            return True
+        method, salt, _ = pwhash.split('$', 2)
+        return method != self.stored_method() or len(salt) != self.salt_length
+
+    def stored_method(self):
+        """The method as werkzeug writes it into hashes, with every parameter spelled out.
+
+        A short ``PASSWORD_HASH_METHOD`` such as ``scrypt`` is stored as
+        ``scrypt:32768:8:1``; this hashes once to find out, then remembers it.
+        """
+        if self._stored_method is None:
+            self._stored_method = generate_password_hash('', self.method, 1).split('$', 1)[0]
+        return self._stored_method
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._executor_pid = None
+
+    def _get_executor(self):
+        # A pool inherited through fork belongs to the parent, so each process builds its own.
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                start_methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in start_methods else 'spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, function, *args):
+        if self.workers <= 0:
+            return function(*args)
+
+        if self._slots is None or not self._slots.acquire(blocking=False):
+            raise HashingBusyError("Password hashing is saturated")
+        try:
+            future = self._get_executor().submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the KDF finishes, a timed out one keeps a worker busy until then
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashingBusyError("Password hashing timed out")
+
+
+_inline_hasher = PasswordHasher()
+
+
+def init_password_hasher(app):
+    """Attach a password hasher configured from the app config"""
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        salt_length=app.config['PASSWORD_HASH_SALT_LENGTH'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT']
+    )
+
+
+def get_password_hasher():
+    """Get the app's password hasher, or an inline default outside an app"""
+    if has_app_context() and 'password_hasher' in current_app.extensions:
+        return current_app.extensions['password_hasher']
+    return _inline_hasher
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event
+
+from src.models import User
+
+
+class IdentityCache:
+    """Process-local LRU of user ids known to exist, with a time to live"""
+
+    def __init__(self, maxsize=10000, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, user_id):
+        with self._lock:
+            expires_at = self._entries.get(user_id)
+            if expires_at is None:
+                return False
+            if expires_at <= self._clock():
+                del self._entries[user_id]
+                return False
+            self._entries.move_to_end(user_id)
+            return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, user_id):
+        """Remember that a user exists until the TTL runs out"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = self._clock() + self.ttl
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Forget a user, e.g. after it was changed or deleted"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def init_identity_cache(app):
+    """Attach an identity cache sized from the app config"""
+    app.extensions['identity_cache'] = IdentityCache(
+        maxsize=app.config['IDENTITY_CACHE_SIZE'],
+        ttl=app.config['IDENTITY_CACHE_TTL']
+    )
+
+
+def get_identity_cache():
+    return current_app.extensions['identity_cache']
+
+
+def verify_request_identity(optional=False):
+    """Verify the request's access token once and return its identity.
+
+    The rate limiter checks the token before the view runs and the view's
+    ``timed_jwt_required`` reuses that result instead of decoding it again.
+    Missing or invalid tokens aren't remembered, so a required check still
+    raises the usual error.
+    """
+    if not g.get('jwt_verified'):
+        if verify_jwt_in_request(optional=optional) is None:
+            return None
+        g.jwt_verified = True
+    return get_jwt_identity()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    if has_app_context() and 'identity_cache' in current_app.extensions:
+        get_identity_cache().invalidate(target.id)
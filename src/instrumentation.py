@@ -0,0 +1,304 @@
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, current_app, g, has_request_context, request
+from flask_jwt_extended import verify_jwt_in_request
+from sqlalchemy import event
+
+from src.database import db
+from src.identity import verify_request_identity
+from src.metrics import registry, render_prometheus
+
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by endpoint, method and status'
+)
+PHASE_SECONDS = registry.histogram(
+    'http_request_phase_seconds', 'Time spent in each instrumented phase of a request, by endpoint'
+)
+REQUEST_QUERIES = registry.histogram(
+    'http_request_sql_queries', 'SQL statements executed per request, by endpoint',
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+QUERY_SECONDS = registry.histogram(
+    'db_query_duration_seconds', 'Time spent executing a single SQL statement'
+)
+
+
+class RequestTimings:
+    """Time spent in each phase of the current request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.budget_exempt = 0
+        self.statements = Counter()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        entries = [f'total;dur={total * 1000:.2f}']
+        if self.sql_count:
+            entries.append(f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.sql_count} queries"')
+        entries.extend(f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.phases.items())
+        return ', '.join(entries)
+
+
+def current_timings():
+    """The timings of the request being handled, None outside of an instrumented request"""
+    if not has_request_context():
+        return None
+    return g.get('request_timings')
+
+
+@contextmanager
+def phase(name):
+    """Attribute the time spent in the block to ``name`` in the request's timings"""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator form of ``phase``"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def install_query_timing(engine):
+    """Count and time every statement run on ``engine``"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        QUERY_SECONDS.observe(elapsed)
+        timings = current_timings()
+        if timings is not None:
+            timings.sql_count += 1
+            timings.sql_seconds += elapsed
+            timings.statements[statement] += 1
+
+
+def timed_jwt_required(**options):
+    """``flask_jwt_extended.jwt_required`` that times token verification as the ``auth`` phase.
+
+    Takes the same options as ``verify_jwt_in_request``; without any, a token
+    the rate limiter already verified isn't decoded again.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with phase('auth'):
+                if options:
+                    verify_jwt_in_request(**options)
+                else:
+                    verify_request_identity()
+            return current_app.ensure_sync(view)(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more SQL statements than its route allows"""
+
+
+def query_budget(limit):
+    """Declare the most SQL statements a view may run per request"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+@contextmanager
+def outside_query_budget():
+    """Don't count the block's statements against the view's query budget.
+
+    For lookups made on behalf of every route, such as finding a user's shard.
+    """
+    timings = current_timings()
+    before = timings.sql_count if timings is not None else 0
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.budget_exempt += timings.sql_count - before
+
+
+def check_query_budget(timings, endpoint, mode, repeat_limit):
+    """Log or raise when a request exceeded its budget or repeated a statement like an N+1 loop"""
+    problems = []
+    view = current_app.view_functions.get(endpoint)
+    limit = getattr(view, 'query_budget', None)
+    counted = timings.sql_count - timings.budget_exempt
+    if limit is not None and counted > limit:
+        problems.append(f"{endpoint} ran {counted} SQL statements, its budget is {limit}")
+
+    for statement, count in timings.statements.items():
+        if count > repeat_limit:
+            problems.append(f"{endpoint} ran the same statement {count} times, likely an N+1: {statement}")
+
+    for problem in problems:
+        if mode == 'raise':
+            raise QueryBudgetExceeded(problem)
+        current_app.logger.warning(problem)
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads handling requests and keeps those of slow ones.
+
+    A single daemon thread wakes every ``interval`` seconds and records the
+    current frame of each thread with a request in flight. Requests slower
+    than ``threshold`` are written to ``output_dir`` as folded stacks
+    (``frame;frame;frame count``), the input format of flamegraph tools.
+    """
+
+    def __init__(self, output_dir, threshold, interval):
+        self.output_dir = output_dir
+        self.threshold = threshold
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_thread(self):
+        # Started lazily so every forked worker gets its own sampler
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='request-profiler', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def start(self):
+        self._ensure_thread()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def stop(self, name, elapsed):
+        """Stop sampling the current thread; returns the written path for slow requests"""
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or elapsed < self.threshold:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(
+            self.output_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{int(elapsed * 1000)}ms-{name}-{os.getpid()}.folded"
+        )
+        with open(path, 'w') as output:
+            for stack, count in samples.items():
+                output.write(f'{stack} {count}\n')
+        return path
+
+
+def init_instrumentation(app):
+    """Time requests, SQL and serialization, and serve the metrics at /metrics"""
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+
+    if 'sqlalchemy' in app.extensions:
+        with app.app_context():
+            for engine in db.engines.values():
+                install_query_timing(engine)
+
+    profiler = None
+    if app.config['PROFILER_ENABLED']:
+        profiler = SamplingProfiler(
+            app.config['PROFILER_OUTPUT_DIR'],
+            app.config['PROFILER_SLOW_MS'] / 1000,
+            app.config['PROFILER_INTERVAL_MS'] / 1000
+        )
+        app.extensions['profiler'] = profiler
+    server_timing = app.config['INSTRUMENTATION_SERVER_TIMING']
+    budget_mode = app.config['QUERY_BUDGET_MODE']
+    repeat_limit = app.config['QUERY_BUDGET_REPEAT_LIMIT']
+    if budget_mode not in ('off', 'log', 'raise'):
+        raise ValueError(f"Unknown QUERY_BUDGET_MODE: {budget_mode}")
+
+    @app.before_request
+    def start_request_timing():
+        g.request_timings = RequestTimings()
+        if profiler is not None:
+            profiler.start()
+
+    @app.after_request
+    def record_request_timing(response):
+        timings = g.pop('request_timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.started
+        endpoint = request.endpoint or 'unmatched'
+
+        REQUEST_SECONDS.observe(total, endpoint=endpoint, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(timings.sql_count, endpoint=endpoint)
+        for name, seconds in timings.phases.items():
+            PHASE_SECONDS.observe(seconds, endpoint=endpoint, phase=name)
+        if timings.sql_count:
+            PHASE_SECONDS.observe(timings.sql_seconds, endpoint=endpoint, phase='db')
+
+        if profiler is not None:
+            profiler.stop(endpoint, total)
+        if server_timing:
+            response.headers['Server-Timing'] = timings.server_timing(total)
+        if budget_mode != 'off':
+            check_query_budget(timings, endpoint, budget_mode, repeat_limit)
+        return response
+
+    @app.teardown_request
+    def stop_profiling(error):
+        # Requests that raised never reach after_request
+        if profiler is not None and g.pop('request_timings', None) is not None:
+            profiler.stop(request.endpoint or 'unmatched', 0)
+
+    if app.config['METRICS_ENABLED']:
+        token = app.config['METRICS_TOKEN']
+
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            """Prometheus scrape endpoint for this process's metrics, behind METRICS_TOKEN when set"""
+            if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+                return Response('Unauthorized\n', status=401, mimetype='text/plain',
+                                headers={'WWW-Authenticate': 'Bearer'})
+            return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
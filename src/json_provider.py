@@ -0,0 +1,88 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+from src.instrumentation import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """Serialize the types the encoders don't handle natively"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(obj, sort_keys=True, indent=False):
+    """Encode ``obj`` to JSON bytes outside of a Flask app"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    separators = None if indent else (',', ':')
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, sort_keys=sort_keys,
+        indent=2 if indent else None, separators=separators
+    ).encode('utf-8')
+
+
+# The json.dumps arguments orjson reproduces byte for byte
+COMPACT = {'separators': (',', ':')}
+PRETTY = {'indent': 2}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson when it is installed.
+
+    Datetimes are written as ISO 8601 strings, matching ``to_dict``. Output
+    follows ``DefaultJSONProvider``: responses are pretty printed when
+    ``compact`` is False, or None in debug mode, and ``dumps`` passes its
+    keyword arguments on to ``json.dumps``. orjson is only used where it
+    writes the same bytes, otherwise the stdlib encoder is. Non-ASCII text
+    is written as UTF-8 unless ``ensure_ascii`` is set.
+    """
+
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        with phase('serialize'):
+            body = self._encode(obj, **(PRETTY if pretty else COMPACT)) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _encode(self, obj, **kwargs):
+        if orjson is not None and kwargs in (COMPACT, PRETTY):
+            body = encode_json(obj, sort_keys=self.sort_keys, indent=kwargs == PRETTY)
+            if not self.ensure_ascii or body.isascii():
+                return body
+
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs).encode('utf-8')
@@ -0,0 +1,126 @@
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Bucketed distribution of observed values, optionally split by labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][position] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(labels))
+        return series['count'] if series else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, series in self._series.items():
+                labels = dict(key)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, series['buckets']):
+                    cumulative += bucket_count
+                    samples.append((f'{self.name}_bucket', dict(labels, le=repr(bound)), cumulative))
+                samples.append((f'{self.name}_bucket', dict(labels, le='+Inf'), series['count']))
+                samples.append((f'{self.name}_sum', labels, series['sum']))
+                samples.append((f'{self.name}_count', labels, series['count']))
+        return samples
+
+
+class MetricsRegistry:
+    """Process-local collection of named metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get_or_create(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+
+registry = MetricsRegistry()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render_prometheus(metrics_registry=registry):
+    """Render the registry in the Prometheus text exposition format"""
+    lines = []
+    for metric in metrics_registry.metrics():
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -1,6 +1,8 @@
 from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
 from src.database import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.hashing import get_password_hasher
 
 class User(db.Model):
     """User model for authentication."""
@@ -12,17 +14,24 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     tasks = db.relationship('Task', backref='author', lazy=True, cascade='all, delete-orphan')
+    task_state = db.relationship('UserTaskState', uselist=False, cascade='all, delete-orphan')
+    task_tombstones = db.relationship('TaskTombstone', lazy='dynamic', cascade='all, delete-orphan')
+    task_due_buckets = db.relationship('TaskDueBucket', lazy='dynamic', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<User {self.username}>'
     
     def set_password(self, user_password):
         """Hash and set the user's password."""
-        self.password_hash = generate_password_hash(user_password)
+        self.password_hash = get_password_hasher().hash(user_password)
 
     def check_password(self, user_password):
         """Check if the password is correct."""
-        return check_password_hash(self.password_hash, user_password)
+        return get_password_hasher().verify(self.password_hash, user_password)
+
+    def password_needs_rehash(self):
+        """Check if the stored hash uses outdated KDF parameters."""
+        return get_password_hasher().needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convert user to a dictionary"""
@@ -30,7 +39,7 @@ class User(db.Model):
             'id': self.id,
             'username': self.username,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'task_count': len(self.tasks) if self.tasks else 0
+            'task_count': self.task_state.task_count if self.task_state else 0
         }
     
 class Task(db.Model):
@@ -45,7 +54,19 @@ class Task(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_tasks_user_created_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_tasks_user_change_seq', 'user_id', 'change_seq', 'id'),
+        # Access paths of the task list's filters and sorts, see queries.plan_task_list()
+        db.Index('ix_tasks_user_completed_created', 'user_id', 'is_completed', 'created_at', 'id'),
+        db.Index('ix_tasks_user_due_title', 'user_id', 'due_date', 'title', 'id'),
+        db.Index('ix_tasks_user_completed_due', 'user_id', 'is_completed', 'due_date', 'title', 'id'),
+        db.Index('ix_tasks_user_updated', 'user_id', 'updated_at', 'id'),
+        db.Index('ix_tasks_user_title', 'user_id', 'title', 'id'),
+    )
 
     def __repr__(self):
         return f'<Task {self.title[:30]}>'
@@ -76,4 +97,169 @@ class Task(db.Model):
             if hasattr(self, key) and key not in ['id', 'created_at', 'user_id']:
                 setattr(self, key, value)
 
-        self.updated_at = datetime.utcnow()
\ No newline at end of file
+        self.updated_at = datetime.utcnow()
+
+def dialect_insert(session, table):
+    """Build an INSERT supporting ON CONFLICT for the session's database"""
+    dialect = session.get_bind().engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table)
+    if dialect == 'sqlite':
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+class UserTaskState(db.Model):
+    """Per-user bookkeeping for the task list, such as its version counter."""
+    __tablename__ = 'user_task_state'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    tombstones_pruned_seq = db.Column(db.Integer, nullable=False, default=0)
+    task_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserTaskState {self.user_id} v{self.version}>'
+
+    @classmethod
+    def current_version(cls, session, user_id):
+        """Get the user's task list version, 0 if nothing was written yet."""
+        version = session.execute(
+            db.select(cls.version).where(cls.user_id == user_id)
+        ).scalar()
+        return version or 0
+
+    @classmethod
+    def pruned_seq(cls, session, user_id):
+        """Get the highest change sequence whose tombstones were pruned."""
+        pruned = session.execute(
+            db.select(cls.tombstones_pruned_seq).where(cls.user_id == user_id)
+        ).scalar()
+        return pruned or 0
+
+    @classmethod
+    def bump_version(cls, session, user_id, amount=1):
+        """Advance the user's task list version inside the current transaction."""
+        table = cls.__table__
+        statement = dialect_insert(session, table).values(user_id=user_id, version=amount)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={'version': table.c.version + amount}
+        ).returning(table.c.version)
+        return session.execute(statement).scalar_one()
+
+    @classmethod
+    def adjust_counts(cls, session, user_id, tasks=0, completed=0):
+        """Add to the user's task counters inside the current transaction."""
+        table = cls.__table__
+        statement = dialect_insert(session, table).values(
+            user_id=user_id, version=0, task_count=tasks, completed_count=completed
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                'task_count': table.c.task_count + tasks,
+                'completed_count': table.c.completed_count + completed
+            }
+        )
+        session.execute(statement)
+
+class TaskDueBucket(db.Model):
+    """Number of open tasks a user has due on each day, used for the overdue stats."""
+    __tablename__ = 'task_due_buckets'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    due_day = db.Column(db.Date, primary_key=True)
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TaskDueBucket {self.user_id} {self.due_day}: {self.open_count}>'
+
+    @classmethod
+    def adjust(cls, session, user_id, deltas):
+        """Add ``{day: delta}`` to the user's buckets, dropping buckets that reach zero."""
+        if not deltas:
+            return
+        table = cls.__table__
+        statement = dialect_insert(session, table).values([
+            {'user_id': user_id, 'due_day': day, 'open_count': delta} for day, delta in deltas.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.due_day],
+            set_={'open_count': table.c.open_count + statement.excluded.open_count}
+        )
+        session.execute(statement)
+
+        emptied = [day for day, delta in deltas.items() if delta < 0]
+        if emptied:
+            session.execute(
+                db.delete(cls).where(cls.user_id == user_id, cls.due_day.in_(emptied), cls.open_count <= 0)
+            )
+
+class TaskTombstone(db.Model):
+    """Record of a deleted task, kept so sync clients can learn about deletions."""
+    __tablename__ = 'task_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_task_tombstones_user_change_seq', 'user_id', 'change_seq', 'task_id'),
+    )
+
+    def __repr__(self):
+        return f'<TaskTombstone {self.task_id} @{self.change_seq}>'
+
+    def to_dict(self):
+        """Convert the tombstone to a dictionary."""
+        return {
+            'id': self.task_id,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
+
+class UserShard(db.Model):
+    """Shard holding a user's tasks; users without a row keep theirs in the primary database."""
+    __tablename__ = 'user_shards'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    shard = db.Column(db.String(64), nullable=False)
+    moving = db.Column(db.Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f'<UserShard {self.user_id} {self.shard}{" moving" if self.moving else ""}>'
+
+class IdBlock(db.Model):
+    """Next unreserved id of a sequence shared by every shard, handed out in blocks."""
+    __tablename__ = 'id_blocks'
+
+    name = db.Column(db.String(64), primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<IdBlock {self.name} @{self.next_id}>'
+
+
+# Indexes dropped from Task, superseded by one of its current indexes
+REPLACED_TASK_INDEXES = ('ix_tasks_user_due_date',)
+
+
+def create_task_indexes(engine):
+    """Bring the indexes of an existing tasks table up to date, returning the names created.
+
+    ``create_all`` skips tables that already exist, so databases created
+    before an index was added need this to get it.
+    """
+    created = []
+    with engine.begin() as connection:
+        existing = {index['name'] for index in inspect(connection).get_indexes(Task.__tablename__)}
+        for name in REPLACED_TASK_INDEXES:
+            if name in existing:
+                connection.execute(text(f"DROP INDEX {name}"))
+        for index in sorted(Task.__table__.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(connection)
+                created.append(index.name)
+    return created
@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, literal, or_, tuple_
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Decode a cursor back into sort key values, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError("Invalid cursor")
+
+    values = []
+    for value, value_type in zip(payload, types):
+        try:
+            if value is None:
+                values.append(None)
+            elif value_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(value_type(value))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_after(keys, values):
+    """Build the WHERE clause selecting rows that sort strictly after the given key values.
+
+    ``keys`` is a list of ``(column, descending)`` pairs in sort order. When
+    every key sorts the same way this is a row value comparison, which the
+    database turns into a seek on a matching index; mixed directions expand
+    into one OR branch per key.
+    """
+    directions = {descending for _, descending in keys}
+    if len(directions) == 1:
+        columns = tuple_(*(column for column, _ in keys))
+        bound = tuple_(*(literal(value, column.type) for (column, _), value in zip(keys, values)))
+        return columns < bound if directions.pop() else columns > bound
+
+    clauses = []
+    for position, (column, descending) in enumerate(keys):
+        equal_prefix = [keys[i][0] == values[i] for i in range(position)]
+        step = column < values[position] if descending else column > values[position]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def parse_limit(raw_limit, default, maximum):
+    """Parse the ``limit`` query parameter, raising ValueError when it is out of range"""
+    if raw_limit is None or raw_limit == '':
+        return default
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        raise ValueError("Limit must be an integer")
+    if limit < 1 or limit > maximum:
+        raise ValueError(f"Limit must be between 1 and {maximum}")
+    return limit
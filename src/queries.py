@@ -0,0 +1,129 @@
+from src.models import Task
+
+TASK_COLUMNS = (
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.due_date,
+    Task.is_completed,
+    Task.created_at,
+    Task.updated_at,
+    Task.user_id,
+)
+
+TASK_FIELD_NAMES = tuple(column.key for column in TASK_COLUMNS)
+
+TASK_FIELDS = {column.key: column for column in TASK_COLUMNS}
+
+
+def parse_fields(raw_fields):
+    """Parse a ``fields=id,title`` sparse fieldset into field names.
+
+    Returns every task field when nothing was requested and raises
+    ValueError for unknown names.
+    """
+    if not raw_fields:
+        return TASK_FIELD_NAMES
+
+    names = []
+    for name in raw_fields.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in TASK_FIELDS:
+            raise ValueError(f"Unknown field: {name}. Available fields: {','.join(TASK_FIELD_NAMES)}")
+        if name not in names:
+            names.append(name)
+
+    if not names:
+        raise ValueError("fields must name at least one field")
+    return tuple(names)
+
+
+def task_columns(fields, required=()):
+    """Columns to select for ``fields``, followed by any ``required`` ones not already included.
+
+    Required columns (e.g. the cursor's sort key) come last so that
+    task_row_to_dict() drops them from the output.
+    """
+    columns = [TASK_FIELDS[name] for name in fields]
+    columns.extend(column for column in required if column.key not in fields)
+    return columns
+
+
+def task_row_to_dict(row, fields=TASK_FIELD_NAMES):
+    """Convert a selected row into a task dict holding only ``fields``.
+
+    Datetimes are left as objects for the JSON provider to encode; any extra
+    trailing columns such as sort keys or a search rank are dropped.
+    """
+    return dict(zip(fields, row))
+
+
+SORT_FIELDS = ('created_at', 'updated_at', 'due_date', 'title')
+
+
+def parse_sort(raw_sort, default):
+    """Parse a ``sort=-due_date,title`` parameter into ``(field, descending)`` pairs.
+
+    A leading ``-`` sorts that field in descending order. Returns ``default``
+    when nothing was requested and raises ValueError for unknown fields.
+    """
+    if not raw_sort:
+        return default
+
+    keys = []
+    for name in raw_sort.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        if name not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {name}. Available fields: {','.join(SORT_FIELDS)}")
+        if name in (key for key, _ in keys):
+            raise ValueError(f"Sort field {name} is repeated")
+        keys.append((name, descending))
+
+    if not keys:
+        raise ValueError("sort must name at least one field")
+    return keys
+
+
+def plan_task_list(equal, range_field, sort):
+    """Pick the index that serves a task list query, as ``(index name, sort keys)``.
+
+    ``equal`` holds the fields compared for equality besides ``user_id``,
+    ``range_field`` the field with a range filter, if any, and ``sort`` the
+    requested ``(field, descending)`` pairs. An index fits when it starts
+    with ``user_id`` and the equality fields, continues with the sort fields
+    and ends in ``id``, so the database seeks to the page and reads it in
+    order. Its remaining columns become tie breakers after the requested
+    keys, which makes the order total for keyset cursors.
+
+    Raises ValueError when no index fits rather than letting the query scan.
+    """
+    if range_field is not None and sort[0][0] != range_field:
+        raise ValueError(f"Filtering on {range_field} requires sort={range_field} or sort=-{range_field}")
+    descending = sort[0][1]
+    if any(key_descending != descending for _, key_descending in sort):
+        raise ValueError("Sort fields must all be ascending or all descending")
+
+    names = [name for name, _ in sort]
+    candidates = []
+    for index in Task.__table__.indexes:
+        columns = [column.name for column in index.columns]
+        if columns[0] != 'user_id' or columns[-1] != 'id':
+            continue
+        prefix, tail = columns[1:len(equal) + 1], columns[len(equal) + 1:]
+        if set(prefix) == set(equal) and tail[:len(names)] == names:
+            candidates.append((len(tail), index.name, tail))
+
+    if not candidates:
+        filtered = sorted(equal) + ([range_field] if range_field else [])
+        if filtered:
+            raise ValueError(f"Sorting by {','.join(names)} is not supported with filters on {', '.join(filtered)}")
+        raise ValueError(f"Sorting by {','.join(names)} is not supported")
+
+    _, name, tail = min(candidates)
+    return name, [(getattr(Task, column), descending) for column in tail]
@@ -0,0 +1,254 @@
+import hashlib
+import math
+import mmap
+import multiprocessing
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+from src.identity import verify_request_identity
+from src.metrics import registry
+
+RATE_LIMITED = registry.counter(
+    'rate_limited_requests_total', 'Requests rejected by the rate limiter, by route class'
+)
+
+# Endpoints not listed here, such as /health, are never limited
+ROUTE_CLASSES = {
+    'login': 'auth',
+    'register': 'auth',
+    'get_tasks': 'read',
+    'get_task': 'read',
+    'get_task_stats': 'read',
+    'get_task_changes': 'read',
+    'stream_task_events': 'stream',
+    'create_task': 'write',
+    'update_task': 'write',
+    'delete_task': 'write',
+    'batch_tasks': 'write',
+}
+
+
+class Rule:
+    """Token bucket holding ``capacity`` tokens, refilled completely over ``period`` seconds"""
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+
+
+def parse_rules(raw):
+    """Parse ``class=capacity/seconds`` pairs, e.g. ``auth=10/60,read=600/60``"""
+    rules = {}
+    for item in raw.split(','):
+        if not item.strip():
+            continue
+        try:
+            route_class, limit = item.split('=')
+            capacity, period = limit.split('/')
+            rules[route_class.strip()] = Rule(int(capacity), float(period))
+        except ValueError:
+            raise ValueError(f"Invalid RATELIMIT_RULES entry: {item.strip()}") from None
+    return rules
+
+
+def _refill(tokens, updated, rule, now, cost):
+    tokens = min(rule.capacity, tokens + (now - updated) * rule.rate)
+    if tokens >= cost:
+        return True, tokens - cost
+    return False, tokens
+
+
+class MemoryStorage:
+    """Buckets in a dict, private to the process; least recently used keys are dropped first"""
+
+    def __init__(self, maxsize=100000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, rule, cost=1):
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (rule.capacity, now))
+            allowed, tokens = _refill(tokens, updated, rule, now, cost)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class SharedMemoryStorage:
+    """Buckets in an anonymous shared mapping inherited by pre-forked workers.
+
+    The table must be created before the workers fork (gunicorn's
+    ``preload_app``). Keys hash to a group of ``probes`` slots; when a group
+    is full the least recently updated bucket in it is reused.
+    """
+
+    SLOT = struct.Struct('Qdd')
+
+    def __init__(self, slots=65536, probes=8, lock_stripes=64, clock=time.monotonic):
+        self.probes = probes
+        self.groups = max(1, slots // probes)
+        self._clock = clock
+        self._memory = mmap.mmap(-1, self.groups * probes * self.SLOT.size)
+        self._locks = [multiprocessing.Lock() for _ in range(lock_stripes)]
+
+    @staticmethod
+    def _hash(key):
+        # A stable hash, unlike hash(), so every worker agrees on the slot; 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') | 1
+
+    def consume(self, key, rule, cost=1):
+        key_hash = self._hash(key)
+        group = key_hash % self.groups
+        base = group * self.probes
+        now = self._clock()
+
+        with self._locks[group % len(self._locks)]:
+            target, tokens, updated = None, rule.capacity, now
+            oldest = math.inf
+            for offset in range(base, base + self.probes):
+                slot_hash, slot_tokens, slot_updated = self.SLOT.unpack_from(self._memory, offset * self.SLOT.size)
+                if slot_hash == key_hash:
+                    target, tokens, updated = offset, slot_tokens, slot_updated
+                    break
+                if slot_hash == 0:
+                    slot_updated = -math.inf
+                if slot_updated < oldest:
+                    target, oldest = offset, slot_updated
+
+            allowed, tokens = _refill(tokens, updated, rule, now, cost)
+            self.SLOT.pack_into(self._memory, target * self.SLOT.size, key_hash, tokens, now)
+        return allowed, tokens
+
+
+class SQLiteStorage:
+    """Buckets in a local SQLite file, standing in for an external store such as Redis.
+
+    Each check is a single upsert, so any process on the host can share the
+    buckets without inheriting memory from a common parent.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+            '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER NOT NULL)'
+        )
+
+    def _connect(self):
+        # One connection per thread, and never one inherited across a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def consume(self, key, rule, cost=1):
+        now = self._clock()
+        refilled = 'min(:capacity, tokens + (:now - updated) * :rate)'
+        allowed, tokens = self._connect().execute(
+            'INSERT INTO rate_limit_buckets (key, tokens, updated, allowed) '
+            'VALUES (:key, :capacity - :cost, :now, :capacity >= :cost) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            f'tokens = CASE WHEN {refilled} >= :cost THEN {refilled} - :cost ELSE {refilled} END, '
+            f'allowed = {refilled} >= :cost, updated = :now '
+            'RETURNING allowed, tokens',
+            {'key': key, 'capacity': rule.capacity, 'rate': rule.rate, 'cost': cost, 'now': now}
+        ).fetchone()
+        return bool(allowed), tokens
+
+
+def create_storage(config):
+    """Build the bucket storage named by RATELIMIT_STORAGE"""
+    name = config['RATELIMIT_STORAGE']
+    if name == 'memory':
+        return MemoryStorage()
+    if name == 'shared':
+        return SharedMemoryStorage(config['RATELIMIT_SHARED_SLOTS'])
+    if name == 'sqlite':
+        path = config['RATELIMIT_STORAGE_PATH'] or os.path.join(tempfile.gettempdir(), 'task-manager-ratelimit.db')
+        return SQLiteStorage(path)
+    raise ValueError(f"Unknown RATELIMIT_STORAGE: {name}")
+
+
+class RateLimiter:
+    """Checks each request against the token bucket of its route class.
+
+    Authenticated requests are keyed on the token identity, logins on the
+    username and client IP, anonymous requests and registrations on the
+    client IP.
+    """
+
+    def __init__(self, storage, rules):
+        self.storage = storage
+        self.rules = rules
+
+    def request_key(self, route_class):
+        if route_class == 'auth':
+            data = request.get_json(silent=True) if request.endpoint == 'login' else None
+            username = data.get('username') if isinstance(data, dict) else None
+            if isinstance(username, str) and username:
+                # Clients sharing an address don't lock each other out of their own accounts
+                digest = hashlib.blake2b(username.encode('utf-8'), digest_size=8).hexdigest()
+                return f"{route_class}:login:{digest}:ip:{request.remote_addr}"
+        else:
+            try:
+                identity = verify_request_identity(optional=True)
+            except Exception:
+                identity = None
+            if identity:
+                return f"{route_class}:user:{identity}"
+        return f"{route_class}:ip:{request.remote_addr}"
+
+    def before_request(self):
+        route_class = ROUTE_CLASSES.get(request.endpoint)
+        rule = self.rules.get(route_class)
+        if rule is None or request.method == 'OPTIONS':
+            return None
+
+        allowed, tokens = self.storage.consume(self.request_key(route_class), rule)
+        g.rate_limit = (rule, tokens)
+        if allowed:
+            return None
+
+        RATE_LIMITED.inc(route_class=route_class)
+        response = jsonify({"error": "Rate limit exceeded"})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil((1 - tokens) / rule.rate))
+        return response
+
+    def after_request(self, response):
+        limit = g.pop('rate_limit', None)
+        if limit is not None:
+            rule, tokens = limit
+            response.headers['RateLimit-Limit'] = str(rule.capacity)
+            response.headers['RateLimit-Remaining'] = str(int(tokens))
+            response.headers['RateLimit-Reset'] = str(math.ceil((rule.capacity - tokens) / rule.rate))
+            response.headers['RateLimit-Policy'] = f"{rule.capacity};w={int(rule.period)}"
+        return response
+
+
+def init_rate_limiter(app):
+    """Attach the rate limiter to the app when RATELIMIT_ENABLED is set"""
+    if not app.config['RATELIMIT_ENABLED']:
+        return
+    limiter = RateLimiter(create_storage(app.config), parse_rules(app.config['RATELIMIT_RULES']))
+    app.extensions['rate_limiter'] = limiter
+    app.before_request(limiter.before_request)
+    app.after_request(limiter.after_request)
+
@@ -0,0 +1,146 @@
+import hashlib
+import mmap
+import multiprocessing
+import random
+import struct
+import time
+from functools import wraps
+
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity
+
+from src.database import db, create_replica_engines
+from src.instrumentation import install_query_timing
+from src.metrics import registry
+
+READ_ROUTING = registry.counter(
+    'db_read_routing_total', 'Replica-eligible requests by the database that served them'
+)
+
+
+class PrimaryPins:
+    """Until when each user's reads stay on the primary, shared by pre-forked workers.
+
+    The deadlines live in an anonymous shared mapping, which gunicorn workers
+    inherit when the app is created before they fork (``SERVER_PRELOAD_APP``);
+    otherwise every worker keeps its own. Keys hash to one of ``slots``
+    deadlines, so a collision at worst keeps another user on the primary too.
+    """
+
+    SLOT = struct.Struct('d')
+
+    def __init__(self, slots=65536):
+        self.slots = slots
+        self._memory = mmap.mmap(-1, slots * self.SLOT.size)
+        self._lock = multiprocessing.Lock()
+
+    def _offset(self, key):
+        # A stable hash, unlike hash(), so every worker agrees on the slot
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.slots * self.SLOT.size
+
+    def pin(self, key, until):
+        offset = self._offset(key)
+        with self._lock:
+            if self.SLOT.unpack_from(self._memory, offset)[0] < until:
+                self.SLOT.pack_into(self._memory, offset, until)
+
+    def pinned(self, key, now):
+        with self._lock:
+            return self.SLOT.unpack_from(self._memory, self._offset(key))[0] > now
+
+
+def request_pin_keys():
+    """Keys of the user a request acts for: the token identity, or the username a login or registration names"""
+    keys = [f'user:{user_id}' for user_id in g.get('db_pin_users', ())]
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # No token was verified for this request
+        identity = None
+    if identity is not None:
+        keys.append(f'user:{identity}')
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('username'), str):
+        keys.append(f"username:{data['username'].strip()}")
+    return keys
+
+
+def choose_replica():
+    """Pick the replica for the current request, unless its user must read from the primary"""
+    replicas = current_app.extensions.get('read_replicas')
+    if not replicas:
+        return None
+    pins = current_app.extensions['primary_pins']
+    now = time.time()
+    if any(pins.pinned(key, now) for key in request_pin_keys()):
+        READ_ROUTING.inc(target='primary')
+        return None
+    g.db_replica = random.choice(replicas)
+    READ_ROUTING.inc(target='replica')
+    return g.db_replica
+
+
+def read_replica(view):
+    """Serve the view's SELECTs from a read replica when any are configured.
+
+    Goes below ``timed_jwt_required``, so the pin of the signed-in user is known.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        choose_replica()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def pin_user(user_id):
+    """Also pin ``user_id`` if the request wrote, e.g. the user a registration just created"""
+    g.setdefault('db_pin_users', []).append(user_id)
+
+
+def pin_to_primary(response):
+    """Keep a user's reads on the primary for a while after they wrote, so they read their own writes.
+
+    The pin is kept on the server by user rather than in a cookie, since API
+    clients sending bearer tokens rarely return cookies.
+    """
+    if g.pop('db_wrote', False):
+        pins = current_app.extensions['primary_pins']
+        until = time.time() + current_app.config['DB_REPLICA_PIN_SECONDS']
+        for key in request_pin_keys():
+            pins.pin(key, until)
+    return response
+
+
+def init_read_replicas(app):
+    """Route reads of ``read_replica`` views to the engines of DATABASE_REPLICA_URLS"""
+    replicas = create_replica_engines(app.config)
+    if not replicas:
+        return
+    if app.config['INSTRUMENTATION_ENABLED']:
+        for engine in replicas:
+            install_query_timing(engine)
+    app.extensions['read_replicas'] = replicas
+    app.extensions['primary_pins'] = PrimaryPins()
+    app.after_request(pin_to_primary)
+
+
+def snapshot_sqlite_replicas(app):
+    """Copy the SQLite primary into each file-based SQLite replica, simulating replication locally.
+
+    Returns the number of replicas refreshed.
+    """
+    refreshed = 0
+    with app.app_context():
+        primary = db.engine
+        for replica in app.extensions.get('read_replicas', []):
+            if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+                continue
+            source, target = primary.raw_connection(), replica.raw_connection()
+            try:
+                source.driver_connection.backup(target.driver_connection)
+            finally:
+                target.close()
+                source.close()
+            refreshed += 1
+    return refreshed
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from src.metrics import registry
+
+CACHE_LOOKUPS = registry.counter(
+    'response_cache_lookups_total', 'Task list response cache lookups, by result'
+)
+CACHE_EVICTIONS = registry.counter(
+    'response_cache_evictions_total', 'Cached responses dropped for space or because the user\'s tasks changed'
+)
+
+
+class MemoryResponseCache:
+    """Per-process LRU of response bodies, bounded by their total size.
+
+    Entries are keyed by the user's task list version, so a write makes
+    them unreachable at once; storing a body for a newer version also drops
+    the user's older entries rather than leaving them for the LRU. Entries
+    also expire after ``ttl`` seconds, a safety net for writes that bypass
+    the version.
+    """
+
+    def __init__(self, max_bytes, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version, query):
+        key = (user_id, version, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, expires = entry
+            if time.monotonic() >= expires:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def put(self, user_id, version, query, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            current = self._versions.get(user_id)
+            if current is not None and current[0] > version:
+                # Read from a lagging replica, a newer version is already cached
+                return
+            if current is not None and current[0] < version:
+                for key in list(current[1]):
+                    self._remove(key)
+                current = None
+            if current is None:
+                current = self._versions[user_id] = (version, set())
+
+            key = (user_id, version, query)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[0])
+            self._entries[key] = (body, time.monotonic() + self.ttl)
+            self._size += len(body)
+            current[1].add(key)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self._size -= len(self._entries.pop(key)[0])
+        keys = self._versions[key[0]][1]
+        keys.discard(key)
+        if not keys:
+            del self._versions[key[0]]
+        CACHE_EVICTIONS.inc()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisResponseCache:
+    """Response bodies shared by every worker through Redis.
+
+    Entries expire after ``ttl`` seconds; Redis' maxmemory policy bounds
+    the total size. An unreachable Redis counts as a miss.
+    """
+
+    def __init__(self, url, ttl=300):
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+        self._errors = redis.RedisError
+
+    @staticmethod
+    def _key(user_id, version, query):
+        return f"response:tasks:{user_id}:{version}:{query}"
+
+    def get(self, user_id, version, query):
+        try:
+            return self._redis.get(self._key(user_id, version, query))
+        except self._errors:
+            return None
+
+    def put(self, user_id, version, query, body):
+        try:
+            self._redis.set(self._key(user_id, version, query), body, ex=self.ttl)
+        except self._errors:
+            pass
+
+
+def create_cache_backend(config):
+    """Build the response cache backend named by RESPONSE_CACHE_BACKEND, None when it is off"""
+    name = config['RESPONSE_CACHE_BACKEND']
+    if name == 'off':
+        return None
+    if name == 'memory':
+        return MemoryResponseCache(config['RESPONSE_CACHE_MAX_BYTES'], config['RESPONSE_CACHE_TTL'])
+    if name == 'redis':
+        if redis is None:
+            raise ValueError("RESPONSE_CACHE_BACKEND=redis needs the redis package, see requirements-optional.txt")
+        return RedisResponseCache(config['RESPONSE_CACHE_URL'], config['RESPONSE_CACHE_TTL'])
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {name}")
+
+
+def cached_json_response(user_id, version, query, build):
+    """Serve the JSON body cached for the user's list version and query, or jsonify ``build()`` and cache it"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        return jsonify(build())
+
+    body = cache.get(user_id, version, query)
+    if body is not None:
+        CACHE_LOOKUPS.inc(result='hit')
+        return current_app.response_class(body, mimetype=current_app.json.mimetype)
+
+    CACHE_LOOKUPS.inc(result='miss')
+    response = jsonify(build())
+    cache.put(user_id, version, query, response.get_data())
+    return response
+
+
+def init_response_cache(app):
+    """Attach the task list response cache configured by RESPONSE_CACHE_BACKEND"""
+    backend = create_cache_backend(app.config)
+    if backend is not None:
+        app.extensions['response_cache'] = backend
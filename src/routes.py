@@ -1,20 +1,59 @@
-from flask import request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import request, jsonify, current_app
+from flask_jwt_extended import get_jwt_identity
+import time
+from functools import partial
 from datetime import datetime
+from sqlalchemy import select, insert, update, delete
 
 from src.database import db
-from src.models import User, Task
+from src.models import User, Task, UserTaskState, TaskTombstone
 from src.auth import authenticate_user, create_user, create_auth_token
+from src.identity import get_identity_cache
+from src.events import get_event_bus, get_stream_slots
+from src.hashing import HashingBusyError
+from src.instrumentation import timed, timed_jwt_required, query_budget
+from src.replicas import pin_user, read_replica
+from src.sharding import user_shard, with_task_ids
+from src.group_commit import run_write
+from src.response_cache import cached_json_response
+from src.queries import TASK_COLUMNS, task_row_to_dict
+from src.stats import TaskCountsDelta, task_stats
+from src.tasks import (
+    parse_task_fields, list_tasks, list_depends_on_time, find_task,
+    create_task_record, update_task_record, delete_task_record
+)
+from src.conditional import (
+    task_etag, task_list_etag, normalized_args, is_not_modified, check_precondition_failed,
+    with_validators, not_modified_response
+)
+from src.pagination import encode_cursor, decode_cursor, keyset_after, parse_limit
 
-def get_current_user():
-    """Get the current authenticated user from JWT"""
+@timed('identity')
+def get_current_user_id():
+    """Get the id of the current authenticated user without loading the User row.
+
+    Ids confirmed to exist are kept in the identity cache; with
+    ``TRUST_TOKEN_IDENTITY`` enabled the token claim is used as is.
+    """
     try:
-        user_id = get_jwt_identity()
-        if user_id:
-            return User.query.get(int(user_id))
+        identity = get_jwt_identity()
+        if not identity:
+            return None
+        user_id = int(identity)
     except Exception:
-        pass
-    return None
+        return None
+
+    if current_app.config['TRUST_TOKEN_IDENTITY']:
+        return user_id
+
+    cache = get_identity_cache()
+    if user_id in cache:
+        return user_id
+
+    if db.session.query(User.id).filter_by(id=user_id).first() is None:
+        return None
+    cache.add(user_id)
+    return user_id
 
 def validate_required_fields(data, required_fields):
     """Validate that all required fields exist"""
@@ -23,6 +62,13 @@ def validate_required_fields(data, required_fields):
         return False, f"Missing required fields: {','.join(missing_fields)}"
     return True, None
     
+def hashing_busy_response():
+    """Build the response for a saturated password hashing pool"""
+    response = jsonify({"error": "Server is busy, please retry shortly"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@query_budget(3)
 def register():
     """Register a new user"""
     try:
@@ -45,6 +91,8 @@ def register():
         user, error = create_user(username, password)
         if error:
             return jsonify({"error": error}), 400
+        # The returned token may be used right away, before replicas have the user
+        pin_user(user.id)
         
         token = create_auth_token(user)
 
@@ -58,9 +106,14 @@ def register():
             "access_token": token
         }), 201
     
+    except HashingBusyError:
+        db.session.rollback()
+        return hashing_busy_response()
     except Exception as exept:
         return jsonify({"error": f"Registration failed: {str(exept)}"}), 500
     
+@query_budget(2)
+@read_replica
 def login():
     """Authenticate user and return JWT token"""
     try:
@@ -91,174 +144,542 @@ def login():
             "access_token": token
         }), 200
     
+    except HashingBusyError:
+        db.session.rollback()
+        return hashing_busy_response()
     except Exception as exept:
         return jsonify({"error": f"Login failed: {str(exept)}"}), 401
     
-@jwt_required()
+@query_budget(4)
+@timed_jwt_required()
+@read_replica
+@user_shard
 def get_tasks():
-    """Get all tasks for the authenticated user"""
+    """Get a filtered, sorted page of tasks for the authenticated user, newest first by default"""
     try:
-        current_user = get_current_user()
-        if not current_user:
+        user_id = get_current_user_id()
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
-            
-        completed = request.args.get('completed', type=str)
-        search = request.args.get('search', type=str)
-
-        query = Task.query.filter_by(user_id=current_user.id)
-
-        if completed is not None:
-            if completed.lower() == 'true':
-                query = query.filter_by(is_completed=True)
-            elif completed.lower() == 'false':
-                query = query.filter_by(is_completed=False)
-
-        if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Task.title.ilike(search_term)) |
-                (Task.description.ilike(search_term))
+
+        def load():
+            return list_tasks(
+                db.session, user_id, request.args,
+                current_app.config['TASKS_PAGE_DEFAULT_LIMIT'],
+                current_app.config['TASKS_PAGE_MAX_LIMIT']
             )
 
-        tasks = query.order_by(Task.created_at.desc()).all()
+        if list_depends_on_time(request.args):
+            # Overdue lists change as time passes, not only on writes: no ETag and no caching
+            try:
+                return jsonify(load()), 200
+            except ValueError as exept:
+                return jsonify({"error": str(exept)}), 400
 
-        return jsonify({
-            "tasks": [task.to_dict() for task in tasks],
-            "count": len(tasks)
-        }), 200
+        version = UserTaskState.current_version(db.session, user_id)
+        etag = task_list_etag(user_id, version, request.args)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+
+        try:
+            response = cached_json_response(user_id, version, normalized_args(request.args), load)
+        except ValueError as exept:
+            return jsonify({"error": str(exept)}), 400
+
+        return with_validators(response, etag), 200
         
     except Exception as exept:
         return jsonify({"error": f"Failed to get tasks: {str(exept)}"}), 500
         
-@jwt_required()
+@query_budget(6)
+@timed_jwt_required()
+@user_shard
 def create_task():
     """Create a new task for the authenticated user"""
 
     try:
-        current_user = get_current_user()
-        if not current_user:
+        user_id = get_current_user_id()
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
         
         data = request.get_json()
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        is_valid, error_msg = validate_required_fields(data, ['title'])
-        if not is_valid:
+        fields, error_msg = parse_task_fields(data)
+        if error_msg:
             return jsonify({"error": error_msg}), 400
-        
-        due_date = None
-        if 'due_date' in data and data['due_date']:
-            try:
-                due_date = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00'))
-            except ValueError:
-                return jsonify({"error": "Invalid date format. Use ISO format (e.g., 2024-12-31T23:59:59)"}), 400
-            
-            task = Task(
-                title=data['title'].strip(),
-                description=data.get('description', '').strip(),
-                due_date=due_date,
-                is_completed=data.get('is_completed', False),
-                user_id=current_user.id
-            )
 
-            db.session.add(task)
-            db.session.commit()
+        fields = with_task_ids([fields])[0]
+
+        def create(session):
+            task = create_task_record(session, user_id, fields)
+            return task.change_seq, task.to_dict()
 
-            return jsonify({
-                "message": "Task created successfully",
-                "task": task.to_dict()
-            }), 201
+        change_seq, task_dict = run_write(create)
+        get_event_bus().publish(user_id, 'task.created', change_seq, task_dict)
+
+        return jsonify({
+            "message": "Task created successfully",
+            "task": task_dict
+        }), 201
         
     except Exception as exept:
         db.session.rollback()
         return jsonify({"error": f"Failed to create task: {str(exept)}"}), 500
     
-@jwt_required()
+@query_budget(2)
+@timed_jwt_required()
+@read_replica
+@user_shard
 def get_task(id):
     """Get an specific task by ID"""
     try:
-        current_user = get_current_user()
-        if not current_user:
+        user_id = get_current_user_id()
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
         
-        task = Task.query.filter_by(id=id, user_id=current_user.id).first()
+        task = find_task(db.session, user_id, id)
         if not task:
             return jsonify({"error": "Task not found"}), 404
-        
-        return jsonify({"task": task.to_dict()}), 200
+
+        etag = task_etag(task.id, task.updated_at)
+        if is_not_modified(etag, task.updated_at):
+            return not_modified_response(etag, task.updated_at)
+
+        return with_validators(jsonify({"task": task.to_dict()}), etag, task.updated_at), 200
     
     except Exception as exept:
         return jsonify({"error": f"Failed to get task: {str(exept)}"}), 500
     
-@jwt_required()
+@query_budget(7)
+@timed_jwt_required()
+@user_shard
 def update_task(id):
     """Update a specific task"""
     try:
-        current_user = get_current_user()
-        if not current_user:
+        user_id = get_current_user_id()
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
         
-        task = Task.query.filter_by(id=id, user_id=current_user.id).first()
-        if not task:
-            return jsonify({"error": "Task not found"}), 404
-        
+        if_match = request.if_match
         data = request.get_json()
-        if not data:
-            return jsonify({"error": "No data provided"}), 400
-        
-        if 'title' in data:
-            task.title = data['title'].strip()
-
-        if 'description' in data:
-            task.description = data['description'].strip()
 
-        if 'due_date' in data:
-            if data['due_date'] is None:
-                task.due_date = None
-            else:
-                try:
-                    task.due_date = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00'))
-                except ValueError:
-                    return jsonify({"error": "Invalid date format. Use ISO format"}), 400
-                
-        if 'is_completed' in data:
-            task.is_completed = bool(data['is_completed'])
+        def update(session):
+            task = find_task(session, user_id, id)
+            if not task:
+                return 404, {"error": "Task not found"}
+            if check_precondition_failed(if_match, task_etag(task.id, task.updated_at)):
+                return 412, {"error": "Task was modified by another request"}
+            if not data:
+                return 400, {"error": "No data provided"}
+            fields, error_msg = parse_task_fields(data, partial=True)
+            if error_msg:
+                return 400, {"error": error_msg}
+            update_task_record(session, task, fields)
+            return 200, (task.change_seq, task.to_dict(), task.updated_at)
 
-        task.updated_at = datetime.utcnow()
+        status, result = run_write(update)
+        if status != 200:
+            return jsonify(result), status
 
-        db.session.commit()
+        change_seq, task_dict, updated_at = result
+        get_event_bus().publish(user_id, 'task.updated', change_seq, task_dict)
 
-        return jsonify({
+        response = jsonify({
             "message": "Task updated successfully",
-            "task": task.to_dict()
-        }), 200
+            "task": task_dict
+        })
+        return with_validators(response, task_etag(id, updated_at), updated_at), 200
     
     except Exception as exept:
         db.session.rollback()
         return jsonify({"error": f"Failed to update task: {str(exept)}"}), 500
     
-@jwt_required()
+@query_budget(8)
+@timed_jwt_required()
+@user_shard
 def delete_task(id):
     """Delete a specific task"""
     try:
-        current_user = get_current_user()
-        if not current_user:
+        user_id = get_current_user_id()
+        if not user_id:
             return jsonify({"error": "User not found"}), 404
         
-        task = Task.query.filter_by(id=id, user_id=current_user.id).first()
+        task = find_task(db.session, user_id, id)
         if not task:
             return jsonify({"error": "Task not found"}), 404
         
-        db.session.delete(task)
+        task_id = task.id
+        change_seq = delete_task_record(db.session, task)
         db.session.commit()
 
+        get_event_bus().publish(user_id, 'task.deleted', change_seq, {"id": task_id})
+
         return jsonify({"message": "Task deleted successfully"}), 200
     
     except Exception as exept:
         db.session.rollback()
         return jsonify({"error": f"Failed to delete task: {str(exept)}"}), 500
 
+@query_budget(4)
+@timed_jwt_required()
+@user_shard
+def get_task_stats():
+    """Get task counts for the authenticated user from the maintained counters"""
+    try:
+        user_id = get_current_user_id()
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+
+        return jsonify({"stats": task_stats(db.session, user_id)}), 200
+
+    except Exception as exept:
+        return jsonify({"error": f"Failed to get task stats: {str(exept)}"}), 500
+
+@query_budget(10)
+@timed_jwt_required()
+@user_shard
+def batch_tasks():
+    """Apply a list of create/update/delete operations in a single transaction.
+
+    Each operation gets its own result entry. Operations that fail validation
+    or reference a missing task are reported and skipped; the rest are written
+    with bulk statements and committed together.
+    """
+    try:
+        user_id = get_current_user_id()
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return jsonify({"error": "operations must be a non-empty list"}), 400
+
+        max_operations = current_app.config['TASKS_BATCH_MAX_OPERATIONS']
+        if len(operations) > max_operations:
+            return jsonify({"error": f"A batch may contain at most {max_operations} operations"}), 400
+
+        results = [None] * len(operations)
+        creates, updates, deletes = [], {}, {}
+
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                results[index] = {"index": index, "status": 400, "error": "Operation must be an object"}
+                continue
+
+            op = operation.get('op')
+            if op == 'create':
+                fields, error_msg = parse_task_fields(operation.get('data') or {})
+                if error_msg:
+                    results[index] = {"index": index, "op": op, "status": 400, "error": error_msg}
+                else:
+                    creates.append((index, fields))
+            elif op in ('update', 'delete'):
+                task_id = operation.get('id')
+                # bool is an int subclass, JSON true/false must not pass for ids 1/0
+                if not isinstance(task_id, int) or isinstance(task_id, bool):
+                    results[index] = {"index": index, "op": op, "status": 400, "error": "id must be an integer"}
+                elif task_id in updates or task_id in deletes:
+                    results[index] = {"index": index, "op": op, "id": task_id, "status": 400,
+                                      "error": "Task already appears in this batch"}
+                elif op == 'delete':
+                    deletes[task_id] = index
+                else:
+                    fields, error_msg = parse_task_fields(operation.get('data') or {}, partial=True)
+                    if error_msg:
+                        results[index] = {"index": index, "op": op, "id": task_id, "status": 400, "error": error_msg}
+                    else:
+                        updates[task_id] = (index, fields)
+            else:
+                results[index] = {"index": index, "op": op, "status": 400,
+                                  "error": "op must be one of create, update, delete"}
+
+        referenced_ids = list(updates) + list(deletes)
+        owned = {}
+        if referenced_ids:
+            owned = {row.id: row for row in db.session.execute(
+                select(Task.id, Task.is_completed, Task.due_date)
+                .where(Task.user_id == user_id, Task.id.in_(referenced_ids))
+            )}
+        for task_id in referenced_ids:
+            if task_id not in owned:
+                index = updates.pop(task_id)[0] if task_id in updates else deletes.pop(task_id)
+                results[index] = {"index": index, "op": operations[index]['op'], "id": task_id,
+                                  "status": 404, "error": "Task not found"}
+
+        # Reserved before the transaction writes, the id sequence of sharded tasks lives in the primary
+        creates = list(zip([index for index, _ in creates], with_task_ids([fields for _, fields in creates])))
+
+        now = datetime.utcnow()
+
+        counts = TaskCountsDelta()
+        for _, fields in creates:
+            counts.add(fields['is_completed'], fields.get('due_date'))
+        for task_id, (_, fields) in updates.items():
+            before = owned[task_id]
+            counts.remove(before.is_completed, before.due_date)
+            counts.add(fields.get('is_completed', before.is_completed), fields.get('due_date', before.due_date))
+        for task_id in deletes:
+            counts.remove(owned[task_id].is_completed, owned[task_id].due_date)
+        counts.apply(db.session, user_id)
+
+        # Every applied operation gets its own change sequence number, in batch order
+        applied = len(creates) + len(updates) + len(deletes)
+        next_seq = 0
+        if applied:
+            next_seq = UserTaskState.bump_version(db.session, user_id, applied) - applied + 1
+
+        created_seqs = {}
+        if creates:
+            # Rows are matched back through their unique change_seq: asking for
+            # them in parameter order makes SQLite insert one row per statement
+            created = {task.change_seq: task for task in db.session.scalars(
+                insert(Task).returning(Task),
+                [dict(fields, user_id=user_id, change_seq=next_seq + offset)
+                 for offset, (_, fields) in enumerate(creates)]
+            )}
+            for offset, (index, _) in enumerate(creates):
+                task = created[next_seq + offset]
+                results[index] = {"index": index, "op": "create", "status": 201, "task": task.to_dict()}
+            next_seq += len(creates)
+            created_seqs = {task.id: task.change_seq for task in created.values()}
+
+        if updates:
+            db.session.execute(
+                update(Task),
+                [dict(fields, id=task_id, updated_at=now, change_seq=next_seq + offset)
+                 for offset, (task_id, (_, fields)) in enumerate(updates.items())]
+            )
+            next_seq += len(updates)
+
+        if deletes:
+            db.session.execute(
+                delete(Task).where(Task.user_id == user_id, Task.id.in_(list(deletes)))
+            )
+            db.session.execute(
+                insert(TaskTombstone),
+                [{"task_id": task_id, "user_id": user_id, "change_seq": next_seq + offset, "deleted_at": now}
+                 for offset, task_id in enumerate(deletes)]
+            )
+
+        db.session.commit()
+
+        event_bus = get_event_bus()
+
+        for index, _ in creates:
+            task_dict = results[index]['task']
+            event_bus.publish(user_id, 'task.created', created_seqs[task_dict['id']], task_dict)
+
+        if updates:
+            for task in Task.query.filter(Task.id.in_(list(updates))):
+                index = updates[task.id][0]
+                results[index] = {"index": index, "op": "update", "id": task.id, "status": 200, "task": task.to_dict()}
+                event_bus.publish(user_id, 'task.updated', task.change_seq, results[index]['task'])
+
+        for offset, (task_id, index) in enumerate(deletes.items()):
+            results[index] = {"index": index, "op": "delete", "id": task_id, "status": 200}
+            event_bus.publish(user_id, 'task.deleted', next_seq + offset, {"id": task_id})
+
+        return jsonify({
+            "results": results,
+            "succeeded": sum(1 for result in results if result['status'] < 400),
+            "failed": sum(1 for result in results if result['status'] >= 400)
+        }), 200
+
+    except Exception as exept:
+        db.session.rollback()
+        return jsonify({"error": f"Failed to apply batch: {str(exept)}"}), 500
+
+def change_position_after(seq_column, id_column, position):
+    """Filter for changes after a ``(change_seq, id)`` watermark position.
+
+    An id of None means every change with that sequence was already seen.
+    """
+    change_seq, last_id = position
+    if last_id is None:
+        return seq_column > change_seq
+    return keyset_after([(seq_column, False), (id_column, False)], position)
+
+@query_budget(5)
+@timed_jwt_required()
+@user_shard
+def get_task_changes():
+    """Get tasks changed and deleted since a watermark, in change order.
+
+    ``since`` is the opaque watermark from a previous response; without it a
+    full snapshot of live tasks is returned. Keep calling with the returned
+    watermark while ``has_more`` is true.
+    """
+    try:
+        user_id = get_current_user_id()
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+
+        try:
+            limit = parse_limit(
+                request.args.get('limit'),
+                current_app.config['TASKS_PAGE_DEFAULT_LIMIT'],
+                current_app.config['TASKS_PAGE_MAX_LIMIT']
+            )
+        except ValueError as exept:
+            return jsonify({"error": str(exept)}), 400
+
+        since = request.args.get('since')
+        if since:
+            try:
+                position = decode_cursor(since, [int, int])
+            except ValueError:
+                return jsonify({"error": "Invalid watermark"}), 400
+            if position[0] < UserTaskState.pruned_seq(db.session, user_id):
+                return jsonify({"error": "Watermark is too old, a full resync is required"}), 410
+        else:
+            position = [-1, None]
+
+        version = UserTaskState.current_version(db.session, user_id)
+
+        task_rows = db.session.query(*TASK_COLUMNS, Task.change_seq).filter(
+            Task.user_id == user_id,
+            change_position_after(Task.change_seq, Task.id, position)
+        ).order_by(Task.change_seq, Task.id).limit(limit + 1).all()
+
+        tombstones = []
+        if since:
+            tombstones = TaskTombstone.query.filter(
+                TaskTombstone.user_id == user_id,
+                change_position_after(TaskTombstone.change_seq, TaskTombstone.task_id, position)
+            ).order_by(TaskTombstone.change_seq, TaskTombstone.task_id).limit(limit + 1).all()
+
+        changes = sorted(
+            [((row.change_seq, row.id), 'task', row) for row in task_rows] +
+            [((tombstone.change_seq, tombstone.task_id), 'deleted', tombstone) for tombstone in tombstones],
+            key=lambda change: change[0]
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        if has_more:
+            watermark = encode_cursor(list(changes[-1][0]))
+        else:
+            last_seq = changes[-1][0][0] if changes else position[0]
+            watermark = encode_cursor([max(version, last_seq), None])
+
+        return jsonify({
+            "tasks": [task_row_to_dict(row) for _, kind, row in changes if kind == 'task'],
+            "deleted": [tombstone.to_dict() for _, kind, tombstone in changes if kind == 'deleted'],
+            "watermark": watermark,
+            "has_more": has_more
+        }), 200
+
+    except Exception as exept:
+        return jsonify({"error": f"Failed to get task changes: {str(exept)}"}), 500
+
+def format_sse(event, dumps):
+    """Format an event as a server-sent events message"""
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {dumps(event)}\n\n"
+
+@query_budget(4)
+@timed_jwt_required()
+@user_shard
+def stream_task_events():
+    """Push task changes for the authenticated user.
+
+    Streams server-sent events by default; ``?mode=poll`` holds the request
+    open until an event arrives or the timeout passes. Resume with
+    ``Last-Event-ID`` or ``?since=<seq>``. Idle connections hold no database
+    connection, but they do hold a worker thread: past ``EVENTS_MAX_STREAMS``
+    open ones per process, new ones get a 503.
+    """
+    release = None
+    try:
+        user_id = get_current_user_id()
+        if not user_id:
+            return jsonify({"error": "User not found"}), 404
+
+        release = get_stream_slots().acquire()
+        if release is None:
+            response = jsonify({"error": "Too many open event streams, please retry shortly"})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+
+        since = request.args.get('since', type=int)
+        if since is None:
+            since = request.headers.get('Last-Event-ID', type=int)
+
+        version = UserTaskState.current_version(db.session, user_id)
+        db.session.close()
+
+        if since is None:
+            since = version
+
+        config = current_app.config
+        event_bus = get_event_bus()
+        subscription = event_bus.subscribe(user_id)
+
+        replay = event_bus.events_after(user_id, since)
+        resync = since < version and (not replay or replay[0]['seq'] != since + 1)
+
+        if request.args.get('mode') == 'poll':
+            try:
+                with subscription:
+                    events = [] if resync else replay
+                    if not events and not resync:
+                        timeout = min(
+                            request.args.get('timeout', config['EVENTS_LONG_POLL_MAX_SECONDS'], type=float),
+                            config['EVENTS_LONG_POLL_MAX_SECONDS']
+                        )
+                        first = subscription.get(max(timeout, 0))
+                        if first is not None:
+                            events = sorted(
+                                (event for event in [first] + subscription.drain() if event['seq'] > since),
+                                key=lambda event: event['seq']
+                            )
+                    return jsonify({
+                        "events": events,
+                        "last_seq": events[-1]['seq'] if events else max(since, version),
+                        "resync": resync
+                    }), 200
+            finally:
+                release()
+
+        dumps = partial(current_app.json.dumps, separators=(',', ':'))
+        heartbeat = config['EVENTS_HEARTBEAT_SECONDS']
+        max_duration = config['EVENTS_STREAM_MAX_SECONDS']
+
+        def generate():
+            with subscription:
+                yield "retry: 3000\n\n"
+                if resync:
+                    yield f"event: resync\ndata: {dumps({'last_seq': version})}\n\n"
+                    return
+                delivered = set()
+                for event in replay:
+                    delivered.add(event['seq'])
+                    yield format_sse(event, dumps)
+                deadline = time.monotonic() + max_duration
+                while time.monotonic() < deadline:
+                    event = subscription.get(heartbeat)
+                    if event is None:
+                        yield ": keepalive\n\n"
+                    elif event['seq'] > since and event['seq'] not in delivered:
+                        yield format_sse(event, dumps)
+
+        response = current_app.response_class(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        # Closed by the server once the stream ends or the client goes away, even if it never started
+        response.call_on_close(release)
+        return response
+
+    except Exception as exept:
+        if release is not None:
+            release()
+        return jsonify({"error": f"Failed to stream task events: {str(exept)}"}), 500
+
 def register_routes(app, api):
     """
     Register all API routes with the Flask app and API
@@ -268,6 +689,10 @@ def register_routes(app, api):
     
     app.add_url_rule('/api/tasks', 'get_tasks', get_tasks, methods=['GET'])
     app.add_url_rule('/api/tasks', 'create_task', create_task, methods=['POST'])
+    app.add_url_rule('/api/tasks/stats', 'get_task_stats', get_task_stats, methods=['GET'])
+    app.add_url_rule('/api/tasks/batch', 'batch_tasks', batch_tasks, methods=['POST'])
+    app.add_url_rule('/api/tasks/changes', 'get_task_changes', get_task_changes, methods=['GET'])
+    app.add_url_rule('/api/tasks/events', 'stream_task_events', stream_task_events, methods=['GET'])
     app.add_url_rule('/api/tasks/<int:id>', 'get_task', get_task, methods=['GET'])
     app.add_url_rule('/api/tasks/<int:id>', 'update_task', update_task, methods=['PUT'])
     app.add_url_rule('/api/tasks/<int:id>', 'delete_task', delete_task, methods=['DELETE'])
\ No newline at end of file
@@ -0,0 +1,139 @@
+import re
+import weakref
+
+from sqlalchemy import DDL, Float, Integer, event, func, text
+
+from src.models import Task
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, user_id UNINDEXED,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, user_id ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+        INSERT INTO tasks_fts(rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END""",
+]
+
+SQLITE_SEARCH_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS tasks_fts_insert",
+    "DROP TRIGGER IF EXISTS tasks_fts_delete",
+    "DROP TRIGGER IF EXISTS tasks_fts_update",
+    "DROP TABLE IF EXISTS tasks_fts",
+]
+
+POSTGRES_SEARCH_DDL = [
+    """CREATE INDEX IF NOT EXISTS ix_tasks_search ON tasks USING GIN (
+        to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))
+    )""",
+]
+
+_availability = weakref.WeakKeyDictionary()
+
+
+def _install_ddl(table, ddl_statements, dialect, hook):
+    for statement in ddl_statements:
+        event.listen(table, hook, DDL(statement).execute_if(dialect=dialect))
+
+
+def install_search_ddl(table):
+    """Create and drop the search index along with ``table``, a tasks table"""
+    _install_ddl(table, SQLITE_SEARCH_DDL, 'sqlite', 'after_create')
+    _install_ddl(table, SQLITE_SEARCH_DROP_DDL, 'sqlite', 'before_drop')
+    _install_ddl(table, POSTGRES_SEARCH_DDL, 'postgresql', 'after_create')
+
+
+install_search_ddl(Task.__table__)
+
+
+def tokenize(term):
+    """Split a search term into the words the index can match"""
+    return re.findall(r'\w+', term or '', re.UNICODE)
+
+
+def _postgres_document():
+    return func.to_tsvector(
+        'simple',
+        func.coalesce(Task.title, '') + ' ' + func.coalesce(Task.description, '')
+    )
+
+
+def is_search_index_available(session):
+    """Check whether the full-text index exists for the session's database"""
+    engine = session.get_bind().engine
+    if engine not in _availability:
+        dialect = engine.dialect.name
+        if dialect == 'sqlite':
+            # An index created before user_id was added can't be filtered per user
+            found = session.execute(
+                text("SELECT 1 FROM pragma_table_info('tasks_fts') WHERE name = 'user_id'")
+            ).first()
+            _availability[engine] = found is not None
+        else:
+            _availability[engine] = dialect == 'postgresql'
+    return _availability[engine]
+
+
+def apply_search(query, session, term, user_id):
+    """Restrict a Task query of ``user_id``'s tasks to rows matching ``term``.
+
+    Returns the filtered query and a rank expression that sorts best matches
+    first in ascending order, or None for the rank when the full-text index
+    is not available and a plain substring scan was used instead. The rank
+    only depends on the task's own text, so it stays put while other users
+    write and a ``(rank, id)`` cursor keeps its place between pages.
+    """
+    words = tokenize(term)
+    if not words or not is_search_index_available(session):
+        search_term = f"%{term}%"
+        return query.filter(
+            (Task.title.ilike(search_term)) |
+            (Task.description.ilike(search_term))
+        ), None
+
+    if session.get_bind().engine.dialect.name == 'sqlite':
+        # bm25 weighs terms by how common they are across every user's tasks, so its
+        # scores shift with other users' writes; rank title matches first instead
+        match = ' '.join(f'"{word}"*' for word in words)
+        matches = text(
+            "SELECT task_id, MIN(rank) AS rank FROM ("
+            "SELECT rowid AS task_id, 0.0 AS rank FROM tasks_fts "
+            "WHERE tasks_fts MATCH :title_match AND user_id = :user_id "
+            "UNION ALL "
+            "SELECT rowid, 1.0 FROM tasks_fts WHERE tasks_fts MATCH :match AND user_id = :user_id"
+            ") GROUP BY task_id"
+        ).bindparams(
+            match=match, title_match=f'title : ({match})', user_id=user_id
+        ).columns(task_id=Integer, rank=Float).subquery('task_search')
+        return query.join(matches, matches.c.task_id == Task.id), matches.c.rank
+
+    ts_query = func.to_tsquery('simple', ' & '.join(f"{word}:*" for word in words))
+    document = _postgres_document()
+    return query.filter(document.op('@@')(ts_query)), -func.ts_rank(document, ts_query)
+
+
+def rebuild_search_index(session):
+    """Recreate the full-text index with the current layout and repopulate it from the tasks table"""
+    engine = session.get_bind().engine
+    dialect = engine.dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DROP_DDL + SQLITE_SEARCH_DDL:
+            session.execute(text(statement))
+        session.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            session.execute(text(statement))
+    session.commit()
+    _availability.pop(engine, None)
@@ -0,0 +1,89 @@
+from src.database import db
+
+
+def gunicorn_options(config):
+    """Build gunicorn settings from the app config"""
+    return {
+        'bind': config['SERVER_BIND'],
+        'workers': config['SERVER_WORKERS'],
+        'threads': config['SERVER_THREADS'],
+        'worker_class': 'gthread',
+        'max_requests': config['SERVER_MAX_REQUESTS'],
+        'max_requests_jitter': config['SERVER_MAX_REQUESTS_JITTER'],
+        'timeout': config['SERVER_TIMEOUT'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT'],
+        'keepalive': config['SERVER_KEEPALIVE'],
+        'preload_app': config['SERVER_PRELOAD_APP'],
+        'post_fork': post_fork,
+    }
+
+
+def reset_engines_after_fork(app):
+    """Drop pooled connections inherited from the parent process.
+
+    ``close=False`` leaves the parent's sockets alone while giving the child
+    a fresh pool, so no connection is ever shared across processes.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    for engine in app.extensions.get('read_replicas', []):
+        engine.dispose(close=False)
+    if 'shards' in app.extensions:
+        for engine in app.extensions['shards'].engines.values():
+            engine.dispose(close=False)
+
+
+def post_fork(server, worker):
+    """gunicorn hook run in each worker right after it is forked"""
+    reset_engines_after_fork(server.app.wsgi())
+    worker.log.info("Worker %s ready with a fresh database pool", worker.pid)
+
+
+def serve(config_name='production'):
+    """Serve the app with a pre-fork gunicorn server.
+
+    Send HUP to the master for a graceful reload; workers are recycled after
+    ``SERVER_MAX_REQUESTS`` requests.
+    """
+    from gunicorn.app.base import BaseApplication
+    from src.app import create_app
+    from src.sharding import create_shard_schemas
+
+    app = create_app(config_name)
+    with app.app_context():
+        db.create_all()
+    create_shard_schemas(app)
+
+    class TaskManagerApplication(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options(app.config).items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    TaskManagerApplication().run()
+
+
+def serve_async(config_name='production'):
+    """Serve the task endpoints from ``src.asgi`` on uvicorn's event loop.
+
+    Each worker process handles many concurrent connections on one thread;
+    ``WEB_CONCURRENCY`` sets the number of worker processes.
+    """
+    import os
+    import uvicorn
+
+    os.environ['FLASK_ENV'] = config_name
+    uvicorn.run(
+        'src.asgi:create_asgi_app',
+        factory=True,
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', 5000)),
+        workers=int(os.environ.get('WEB_CONCURRENCY', 1)),
+        backlog=int(os.environ.get('SERVER_BACKLOG', 2048)),
+        timeout_keep_alive=int(os.environ.get('SERVER_KEEPALIVE', 5)),
+        lifespan='on',
+    )
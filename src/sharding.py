@@ -0,0 +1,365 @@
+import bisect
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import MetaData, delete, exc, func, insert, select, update
+
+from src.database import db, create_shard_engines
+from src.instrumentation import install_query_timing, outside_query_budget
+from src.metrics import registry
+from src.models import (
+    IdBlock, Task, TaskDueBucket, TaskTombstone, User, UserShard, UserTaskState, dialect_insert
+)
+from src.search import install_search_ddl
+
+SHARD_REQUESTS = registry.counter(
+    'db_shard_requests_total', 'Sharded requests by the shard holding the user\'s tasks'
+)
+
+# Placement of users without a user_shards row: their tasks predate sharding
+PRIMARY_SHARD = 'primary'
+
+# Per-user tables that live on the user's shard, parents first
+SHARDED_MODELS = (UserTaskState, Task, TaskDueBucket, TaskTombstone)
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to node names through virtual nodes.
+
+    Adding or removing a node only reassigns the keys of the ring segments
+    it gains or loses, about 1/N of them, instead of reshuffling every key.
+    """
+
+    def __init__(self, nodes, vnodes=64):
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        self.nodes = sorted(nodes)
+        points = sorted((self._hash(f'{node}#{replica}'), node) for node in self.nodes for replica in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def node_for(self, key):
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class IdAllocator:
+    """Hands out ids that are unique across every shard, reserved from the primary in blocks.
+
+    Tasks keep their id when their user moves to another shard, so the id
+    can't come from the autoincrement of the database the row is written to.
+    """
+
+    def __init__(self, name, block_size=1000):
+        self.name = name
+        self.block_size = block_size
+        self._next = self._end = 0
+        self._lock = threading.Lock()
+
+    def allocate(self, count):
+        with self._lock:
+            ids = []
+            while len(ids) < count:
+                if self._next >= self._end:
+                    with outside_query_budget():
+                        self._next, self._end = self._reserve(max(self.block_size, count - len(ids)))
+                taken = min(count - len(ids), self._end - self._next)
+                ids.extend(range(self._next, self._next + taken))
+                self._next += taken
+            return ids
+
+    def _reserve(self, size):
+        table = IdBlock.__table__
+        for attempt in range(2):
+            try:
+                # Its own transaction, so the block stays reserved whatever the request does
+                with db.engine.begin() as connection:
+                    end = connection.execute(
+                        update(table).where(table.c.name == self.name)
+                        .values(next_id=table.c.next_id + size).returning(table.c.next_id)
+                    ).scalar()
+                    if end is not None:
+                        return end - size, end
+                    # The first block starts above the ids handed out before sharding was enabled
+                    start = connection.execute(select(func.coalesce(func.max(Task.id), 0) + 1)).scalar_one()
+                    connection.execute(insert(table).values(name=self.name, next_id=start + size))
+                    return start, start + size
+            except exc.IntegrityError:
+                # Another process created the sequence first
+                if attempt:
+                    raise
+
+
+class ShardRouter:
+    """Places users on shards and caches the placements read from the directory.
+
+    Placements are cached for ``placement_ttl`` seconds; moving a user waits
+    out that TTL on both sides of the copy so no process acts on a stale one.
+    """
+
+    def __init__(self, engines, vnodes=64, placement_ttl=5, cache_size=10000, id_block_size=1000,
+                 clock=time.monotonic):
+        self.engines = engines
+        self.ring = HashRing(list(engines), vnodes)
+        self.placement_ttl = placement_ttl
+        self.cache_size = cache_size
+        self.task_ids = IdAllocator('tasks', id_block_size)
+        self._clock = clock
+        self._placements = OrderedDict()
+        self._lock = threading.Lock()
+
+    def home_shard(self, user_id):
+        """The shard the ring assigns to ``user_id``"""
+        return self.ring.node_for(user_id)
+
+    def engine(self, shard):
+        return db.engine if shard == PRIMARY_SHARD else self.engines[shard]
+
+    def lookup(self, session, user_id):
+        """Read ``(shard, moving)`` of a user from the directory, bypassing the cache"""
+        row = session.execute(
+            select(UserShard.shard, UserShard.moving).where(UserShard.user_id == user_id)
+        ).first()
+        return (row.shard, row.moving) if row else (PRIMARY_SHARD, False)
+
+    def placement(self, session, user_id):
+        """``(shard, moving)`` of a user, from the cache while it is fresh"""
+        now = self._clock()
+        with self._lock:
+            cached = self._placements.get(user_id)
+        if cached is not None and cached[2] > now:
+            return cached[:2]
+
+        shard, moving = self.lookup(session, user_id)
+        if self.placement_ttl > 0 and self.cache_size > 0:
+            with self._lock:
+                self._placements[user_id] = (shard, moving, now + self.placement_ttl)
+                self._placements.move_to_end(user_id)
+                while len(self._placements) > self.cache_size:
+                    self._placements.popitem(last=False)
+        return shard, moving
+
+    def forget(self, user_id):
+        with self._lock:
+            self._placements.pop(user_id, None)
+
+
+def get_shard_router():
+    """The app's shard router, None when tasks are not sharded"""
+    return current_app.extensions.get('shards')
+
+
+def user_shard(view):
+    """Send the view's task statements to the shard of the authenticated user.
+
+    Goes below ``timed_jwt_required``. While the user's tasks are being moved,
+    reads are served from the old shard and writes are refused with a 503.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = get_shard_router()
+        if router is None:
+            return view(*args, **kwargs)
+        try:
+            user_id = int(get_jwt_identity())
+        except (TypeError, ValueError):
+            return view(*args, **kwargs)
+
+        with outside_query_budget():
+            shard, moving = router.placement(db.session, user_id)
+        if moving and request.method not in SAFE_METHODS:
+            response = jsonify({"error": "Tasks are being moved, please retry shortly"})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        g.db_shard = None if shard == PRIMARY_SHARD else router.engines[shard]
+        SHARD_REQUESTS.inc(shard=shard)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def with_task_ids(rows):
+    """Give each dict of task fields an id from the shared sequence when tasks are sharded"""
+    router = get_shard_router()
+    if router is None:
+        return rows
+    return [dict(row, id=task_id) for row, task_id in zip(rows, router.task_ids.allocate(len(rows)))]
+
+
+def place_new_user(session, user):
+    """Record the shard the ring assigns to a newly registered user"""
+    router = get_shard_router()
+    if router is not None:
+        with outside_query_budget():
+            session.execute(insert(UserShard).values(user_id=user.id, shard=router.home_shard(user.id)))
+
+
+def shard_metadata():
+    """The sharded tables without foreign keys, as the users they reference stay in the primary"""
+    metadata = MetaData()
+    for model in SHARDED_MODELS:
+        table = model.__table__.to_metadata(metadata)
+        for foreign_key in list(table.foreign_keys):
+            table.constraints.discard(foreign_key.constraint)
+            table.foreign_keys.discard(foreign_key)
+            foreign_key.parent.foreign_keys.discard(foreign_key)
+        if model is Task:
+            install_search_ddl(table)
+    return metadata
+
+
+def create_shard_schemas(app):
+    """Create the sharded tables, with their search index, on every shard"""
+    router = app.extensions.get('shards')
+    if router is None:
+        return
+    metadata = shard_metadata()
+    for engine in router.engines.values():
+        metadata.create_all(engine)
+
+
+def _set_placement(user_id, shard, moving):
+    table = UserShard.__table__
+    statement = dialect_insert(db.session, table).values(user_id=user_id, shard=shard, moving=moving)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.user_id], set_={'shard': shard, 'moving': moving}
+    ))
+    db.session.commit()
+
+
+def _delete_user_rows(connection, user_id):
+    for model in reversed(SHARDED_MODELS):
+        table = model.__table__
+        connection.execute(delete(table).where(table.c.user_id == user_id))
+
+
+def _copy_user_rows(source, target, user_id):
+    # Leftovers of an interrupted move would collide with the copy
+    _delete_user_rows(target, user_id)
+    copied = {}
+    for model in SHARDED_MODELS:
+        table = model.__table__
+        rows = [dict(row._mapping) for row in source.execute(select(table).where(table.c.user_id == user_id))]
+        if model is TaskTombstone:
+            # Tombstone ids are never exposed, the target numbers its own
+            for row in rows:
+                del row['id']
+        if rows:
+            target.execute(insert(table), rows)
+        copied[table.name] = len(rows)
+    return copied
+
+
+def move_users(app, moves, settle_seconds=None):
+    """Move the tasks of each ``(user_id, target_shard)`` while the API keeps serving.
+
+    The users are marked as moving, so their writes are refused, and every
+    process's placement cache gets ``settle_seconds`` to notice. Then the
+    rows are copied, the directory points at the targets, and once no cache
+    can still send reads to the old copies they are deleted. Returns the
+    number of tasks moved per user.
+    """
+    router = app.extensions['shards']
+    settle = app.config['SHARD_MOVE_SETTLE_SECONDS'] if settle_seconds is None else settle_seconds
+    moved = {}
+    with app.app_context():
+        sources = {}
+        for user_id, target in moves:
+            if target != PRIMARY_SHARD and target not in router.engines:
+                raise ValueError(f"Unknown shard: {target}")
+            source, _ = router.lookup(db.session, user_id)
+            if source != target:
+                sources[user_id] = source
+        moves = [(user_id, target) for user_id, target in moves if user_id in sources]
+        if not moves:
+            return moved
+
+        for user_id, _ in moves:
+            _set_placement(user_id, sources[user_id], moving=True)
+        time.sleep(settle)
+
+        for user_id, target in moves:
+            with router.engine(sources[user_id]).connect() as source, router.engine(target).begin() as connection:
+                moved[user_id] = _copy_user_rows(source, connection, user_id)['tasks']
+            _set_placement(user_id, target, moving=False)
+            router.forget(user_id)
+        time.sleep(settle)
+
+        for user_id, _ in moves:
+            with router.engine(sources[user_id]).begin() as connection:
+                _delete_user_rows(connection, user_id)
+    return moved
+
+
+def plan_rebalance(app):
+    """List ``(user_id, current_shard, home_shard)`` of every user not on the shard the ring assigns"""
+    router = app.extensions['shards']
+    with app.app_context():
+        placements = dict(db.session.execute(select(UserShard.user_id, UserShard.shard)).all())
+        user_ids = db.session.scalars(select(User.id).order_by(User.id)).all()
+        db.session.rollback()
+    plan = []
+    for user_id in user_ids:
+        current, home = placements.get(user_id, PRIMARY_SHARD), router.home_shard(user_id)
+        if current != home:
+            plan.append((user_id, current, home))
+    return plan
+
+
+def scatter_gather(app, statement):
+    """Run a read-only ``statement`` on the primary and every shard at once.
+
+    Returns the rows of each database keyed by shard name, for admin queries
+    that have to look at every user's tasks.
+    """
+    router = app.extensions.get('shards')
+    with app.app_context():
+        engines = {PRIMARY_SHARD: db.engine}
+    engines.update(router.engines if router is not None else {})
+
+    def gather(engine):
+        with engine.connect() as connection:
+            return connection.execute(statement).all()
+
+    with ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix='scatter') as pool:
+        futures = {shard: pool.submit(gather, engine) for shard, engine in engines.items()}
+        return {shard: future.result() for shard, future in futures.items()}
+
+
+def shard_stats(app):
+    """Count the users with tasks and their tasks on every shard"""
+    results = scatter_gather(app, select(
+        func.count(UserTaskState.user_id), func.coalesce(func.sum(UserTaskState.task_count), 0)
+    ).where(UserTaskState.task_count > 0))
+    return {shard: {'users': rows[0][0], 'tasks': rows[0][1]} for shard, rows in results.items()}
+
+
+def init_sharding(app):
+    """Spread task data over the engines of DATABASE_SHARD_URLS by user id"""
+    engines = create_shard_engines(app.config)
+    if not engines:
+        return
+    if PRIMARY_SHARD in engines:
+        raise ValueError(f"'{PRIMARY_SHARD}' is reserved for the primary database, pick another shard name")
+    if app.config['INSTRUMENTATION_ENABLED']:
+        for engine in engines.values():
+            install_query_timing(engine)
+    app.extensions['shards'] = ShardRouter(
+        engines,
+        vnodes=app.config['SHARD_VIRTUAL_NODES'],
+        placement_ttl=app.config['SHARD_PLACEMENT_TTL'],
+        # Sized like the identity cache, both hold an entry per active user
+        cache_size=app.config['IDENTITY_CACHE_SIZE'],
+        id_block_size=app.config['SHARD_ID_BLOCK_SIZE'],
+    )
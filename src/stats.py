@@ -0,0 +1,123 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+
+from src.models import Task, TaskDueBucket, UserTaskState
+
+
+class TaskCountsDelta:
+    """Collects how a set of task writes changes a user's counters.
+
+    Record each task's ``(is_completed, due_date)`` before and after the
+    write, then ``apply`` the net change in the same transaction.
+    """
+
+    def __init__(self):
+        self.tasks = 0
+        self.completed = 0
+        self.open_due = Counter()
+
+    def add(self, is_completed, due_date):
+        self._count(1, is_completed, due_date)
+
+    def remove(self, is_completed, due_date):
+        self._count(-1, is_completed, due_date)
+
+    def _count(self, sign, is_completed, due_date):
+        self.tasks += sign
+        if is_completed:
+            self.completed += sign
+        elif due_date is not None:
+            self.open_due[due_date.date()] += sign
+
+    def apply(self, session, user_id):
+        if self.tasks or self.completed:
+            UserTaskState.adjust_counts(session, user_id, self.tasks, self.completed)
+        TaskDueBucket.adjust(session, user_id, {day: delta for day, delta in self.open_due.items() if delta})
+
+
+def task_stats(session, user_id, now=None):
+    """Summarize the user's tasks from the maintained counters.
+
+    Overdue tasks are the open ones due before ``now``: whole days come from
+    the due-date buckets and only today's tasks are looked up individually.
+    """
+    now = now or datetime.utcnow()
+    today = now.date()
+    start_of_day = datetime.combine(today, datetime.min.time())
+
+    state = session.execute(
+        select(UserTaskState.task_count, UserTaskState.completed_count).where(UserTaskState.user_id == user_id)
+    ).first()
+    total, completed = state if state else (0, 0)
+
+    overdue_days, due_today, upcoming = session.execute(
+        select(
+            func.coalesce(func.sum(case((TaskDueBucket.due_day < today, TaskDueBucket.open_count), else_=0)), 0),
+            func.coalesce(func.sum(case((TaskDueBucket.due_day == today, TaskDueBucket.open_count), else_=0)), 0),
+            func.coalesce(func.sum(case((TaskDueBucket.due_day > today, TaskDueBucket.open_count), else_=0)), 0),
+        ).where(TaskDueBucket.user_id == user_id)
+    ).one()
+
+    overdue_today = 0
+    if due_today:
+        overdue_today = session.execute(
+            select(func.count()).select_from(Task).where(
+                Task.user_id == user_id,
+                Task.is_completed.is_not(True),
+                Task.due_date >= start_of_day,
+                Task.due_date < now
+            )
+        ).scalar()
+
+    pending = total - completed
+    return {
+        "total": total,
+        "completed": completed,
+        "pending": pending,
+        "overdue": overdue_days + overdue_today,
+        "due_today": due_today - overdue_today,
+        "upcoming": upcoming,
+        "no_due_date": pending - overdue_days - due_today - upcoming
+    }
+
+
+def rebuild_task_stats(session, user_id=None):
+    """Recompute the counters and due-date buckets from the tasks table.
+
+    Covers every user, or only ``user_id`` when given. Returns the number of
+    users whose counters were rewritten.
+    """
+    def scoped(statement, column):
+        return statement.where(column == user_id) if user_id is not None else statement
+
+    missing = scoped(
+        select(Task.user_id).distinct().where(Task.user_id.not_in(select(UserTaskState.user_id))),
+        Task.user_id
+    )
+    session.execute(insert(UserTaskState).from_select(['user_id'], missing))
+
+    task_count = select(func.count()).where(Task.user_id == UserTaskState.user_id).scalar_subquery()
+    completed_count = select(func.count()).where(
+        Task.user_id == UserTaskState.user_id, Task.is_completed.is_(True)
+    ).scalar_subquery()
+    rebuilt = session.execute(
+        scoped(update(UserTaskState), UserTaskState.user_id)
+        .values(task_count=task_count, completed_count=completed_count)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    session.execute(scoped(delete(TaskDueBucket), TaskDueBucket.user_id))
+    due_day = func.date(Task.due_date)
+    buckets = scoped(
+        select(Task.user_id, due_day, func.count())
+        .where(Task.is_completed.is_not(True), Task.due_date.is_not(None))
+        .group_by(Task.user_id, due_day),
+        Task.user_id
+    )
+    session.execute(
+        insert(TaskDueBucket).from_select(['user_id', 'due_day', 'open_count'], buckets)
+    )
+    return rebuilt
+
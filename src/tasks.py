@@ -0,0 +1,298 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from src.models import Task, User, UserTaskState, TaskTombstone
+from src.search import apply_search
+from src.queries import parse_fields, parse_sort, plan_task_list, task_columns, task_row_to_dict
+from src.stats import TaskCountsDelta
+from src.instrumentation import phase
+from src.pagination import encode_cursor, decode_cursor, keyset_after, parse_limit
+
+
+def parse_due_date(value):
+    """Parse an ISO 8601 due date as naive UTC, raising ValueError when it is malformed.
+
+    Due dates are stored without an offset, so dates carrying one are converted
+    to UTC first; naive dates are taken to be UTC already.
+    """
+    if not isinstance(value, str):
+        raise ValueError("Invalid date format")
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_task_fields(data, partial=False):
+    """Validate a task payload and convert it into column values.
+
+    Returns ``(fields, error)``. With ``partial`` only the fields present in
+    ``data`` are returned, as needed for updates.
+    """
+    if not partial and 'title' not in data:
+        return None, "Missing required fields: title"
+
+    fields = {}
+    if 'title' in data:
+        if not isinstance(data['title'], str):
+            return None, "Title must be a string"
+        fields['title'] = data['title'].strip()
+
+    if 'description' in data:
+        description = data['description']
+        fields['description'] = description.strip() if isinstance(description, str) else description
+    elif not partial:
+        fields['description'] = ''
+
+    if 'due_date' in data:
+        if data['due_date']:
+            try:
+                fields['due_date'] = parse_due_date(data['due_date'])
+            except ValueError:
+                return None, "Invalid date format. Use ISO format (e.g., 2024-12-31T23:59:59)"
+        else:
+            fields['due_date'] = None
+
+    if 'is_completed' in data:
+        fields['is_completed'] = bool(data['is_completed'])
+    elif not partial:
+        fields['is_completed'] = False
+
+    return fields, None
+
+
+def parse_filter_date(args, name):
+    """Parse an ISO 8601 date filter from ``args`` as naive UTC, None when it is absent"""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return parse_due_date(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}. Use ISO format (e.g., 2024-12-31T23:59:59)")
+
+
+def list_depends_on_time(args):
+    """Whether a task list query selects by the current time, so its result changes without writes"""
+    return (args.get('overdue') or '').lower() == 'true'
+
+
+def list_tasks(session, user_id, args, default_limit, max_limit):
+    """Build one page of the user's task list from the request ``args``.
+
+    Besides ``completed`` and ``search`` the list filters by ``due_before``,
+    ``due_after``, ``updated_since`` and ``overdue=true``, and sorts by
+    ``sort``. Unless searching, the query must be served by an index, see
+    plan_task_list(). Raises ValueError with a client-facing message for
+    invalid or unsupported arguments.
+    """
+    completed = args.get('completed')
+    search = args.get('search')
+    include_count = (args.get('include_count') or '').lower() == 'true'
+    limit = parse_limit(args.get('limit'), default_limit, max_limit)
+    fields = parse_fields(args.get('fields'))
+    due_before = parse_filter_date(args, 'due_before')
+    due_after = parse_filter_date(args, 'due_after')
+    updated_since = parse_filter_date(args, 'updated_since')
+    overdue = list_depends_on_time(args)
+
+    filters = [Task.user_id == user_id]
+    equal = set()
+    if completed is not None and completed.lower() in ('true', 'false'):
+        filters.append(Task.is_completed.is_(completed.lower() == 'true'))
+        equal.add('is_completed')
+    if overdue:
+        if 'is_completed' in equal and completed.lower() == 'true':
+            raise ValueError("overdue can't be combined with completed=true")
+        filters.extend([Task.is_completed.is_(False), Task.due_date < datetime.utcnow()])
+        equal.add('is_completed')
+    if due_before is not None:
+        filters.append(Task.due_date < due_before)
+    if due_after is not None:
+        filters.append(Task.due_date > due_after)
+    if updated_since is not None:
+        filters.append(Task.updated_at >= updated_since)
+
+    range_fields = set()
+    if overdue or due_before is not None or due_after is not None:
+        range_fields.add('due_date')
+    if updated_since is not None:
+        range_fields.add('updated_at')
+    if len(range_fields) > 1:
+        raise ValueError("Filter on due dates or on updated_since, not both")
+    range_field = range_fields.pop() if range_fields else None
+
+    if search:
+        if args.get('sort'):
+            raise ValueError("sort can't be combined with search, results are ordered by relevance")
+        sort_keys = None
+    else:
+        default_sort = [(range_field, False)] if range_field else [('created_at', True)]
+        _, sort_keys = plan_task_list(equal, range_field, parse_sort(args.get('sort'), default_sort))
+
+    required = [column for column, _ in sort_keys] if sort_keys else [Task.created_at, Task.id]
+    query = session.query(*task_columns(fields, required=required)).filter(*filters)
+
+    rank = None
+    if search:
+        query, rank = apply_search(query, session, search, user_id)
+        if rank is not None:
+            query = query.add_columns(rank.label('search_rank'))
+            sort_keys = [(rank, False), (Task.id, True)]
+        else:
+            sort_keys = [(Task.created_at, True), (Task.id, True)]
+
+    count = query.count() if include_count else None
+
+    if rank is not None:
+        cursor_names = ['search_rank', 'id']
+        cursor_types = [float, int]
+    else:
+        cursor_names = [column.key for column, _ in sort_keys]
+        cursor_types = [column.type.python_type for column, _ in sort_keys]
+
+    segments = [(query, sort_keys)]
+    if range_field != 'due_date' and any(column is Task.due_date for column, _ in sort_keys):
+        # SQLite sorts NULL first, so tasks without a due date are read as a second segment
+        # after the dated ones, each in index order; the cursor leads with its segment
+        undated_keys = [(column, descending) for column, descending in sort_keys if column is not Task.due_date]
+        segments = [(query.filter(Task.due_date.is_not(None)), sort_keys),
+                    (query.filter(Task.due_date.is_(None)), undated_keys)]
+        cursor_types = [int] + cursor_types
+
+    cursor = args.get('cursor')
+    values = decode_cursor(cursor, cursor_types) if cursor else None
+    start = 0
+    if values is not None and len(segments) > 1:
+        start, values = values[0], values[1:]
+        if start not in range(len(segments)):
+            raise ValueError("Invalid cursor")
+
+    rows = []
+    for position in range(start, len(segments)):
+        segment_query, keys = segments[position]
+        if values is not None and position == start:
+            key_values = [value for (column, _), value in zip(sort_keys, values)
+                          if any(column is key for key, _ in keys)]
+            segment_query = segment_query.filter(keyset_after(keys, key_values))
+        order_by = [column.desc() if descending else column.asc() for column, descending in keys]
+        fetched = segment_query.order_by(*order_by).limit(limit + 1 - len(rows)).all()
+        rows.extend((position, row) for row in fetched)
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        position, last = rows[limit - 1]
+        key = [getattr(last, name) for name in cursor_names]
+        next_cursor = encode_cursor([position] + key if len(segments) > 1 else key)
+    rows = [row for _, row in rows[:limit]]
+
+    with phase('to_dict'):
+        tasks = [task_row_to_dict(row, fields) for row in rows]
+    response = {
+        "tasks": tasks,
+        "next_cursor": next_cursor
+    }
+    if include_count:
+        response["count"] = count
+    return response
+
+
+def find_task(session, user_id, task_id):
+    """Load one of the user's tasks, None if it doesn't exist or belongs to someone else"""
+    return session.query(Task).filter_by(id=task_id, user_id=user_id).first()
+
+
+def create_task_record(session, user_id, fields):
+    """Insert a task and give it the next change sequence number"""
+    task = Task(user_id=user_id, **fields)
+    task.change_seq = UserTaskState.bump_version(session, user_id)
+    session.add(task)
+    session.flush()
+    return task
+
+
+def update_task_record(session, task, fields):
+    """Apply validated fields to a task and give it the next change sequence number"""
+    for key, value in fields.items():
+        setattr(task, key, value)
+    task.updated_at = datetime.utcnow()
+    task.change_seq = UserTaskState.bump_version(session, task.user_id)
+    session.flush()
+    return task
+
+
+def delete_task_record(session, task):
+    """Delete a task, leaving a tombstone for sync clients; returns its change sequence number"""
+    change_seq = UserTaskState.bump_version(session, task.user_id)
+    # Flushed together, so account_task_writes() sees this deletion already has its tombstone
+    session.add(TaskTombstone(task_id=task.id, user_id=task.user_id, change_seq=change_seq))
+    session.delete(task)
+    session.flush()
+    return change_seq
+
+
+def stored_task_state(session, task):
+    """The ``(is_completed, due_date)`` the database holds for a task while a flush is pending"""
+    state = inspect(task)
+    values = []
+    for name in ('is_completed', 'due_date'):
+        history = state.attrs[name].history
+        if history.deleted:
+            values.append(history.deleted[0])
+        elif history.added:
+            # Assigned while expired, so the old value was never loaded
+            return tuple(session.execute(
+                select(Task.is_completed, Task.due_date).where(Task.id == task.id)
+            ).one())
+        else:
+            values.append(getattr(task, name))
+    return tuple(values)
+
+
+@event.listens_for(Session, 'before_flush')
+def account_task_writes(session, flush_context, instances):
+    """Keep list versions and task counters in step with every task write a session flushes.
+
+    The helpers above give each change its change sequence number, which
+    list ETags, cached lists and sync clients rely on, and deletions their
+    tombstone. Writes that skipped them, e.g. through ``Task.update()`` or a
+    plain ``session.delete()``, get theirs here. The task counters and
+    due-date buckets are adjusted here for both. Tasks deleted along with
+    their user are left alone, as that user's bookkeeping goes too. Bulk
+    statements such as the batch endpoint's don't pass through a flush and
+    account for themselves.
+    """
+    departed = {user.id for user in session.deleted if isinstance(user, User)}
+    tombstoned = {tombstone.task_id for tombstone in session.new if isinstance(tombstone, TaskTombstone)}
+    counts = defaultdict(TaskCountsDelta)
+
+    for task in list(session.new):
+        if not isinstance(task, Task) or task.user_id in departed:
+            continue
+        if task.change_seq is None:
+            task.change_seq = UserTaskState.bump_version(session, task.user_id)
+        counts[task.user_id].add(task.is_completed, task.due_date)
+
+    for task in list(session.dirty):
+        if not isinstance(task, Task) or task.user_id in departed or not session.is_modified(task):
+            continue
+        if not inspect(task).attrs.change_seq.history.has_changes():
+            task.change_seq = UserTaskState.bump_version(session, task.user_id)
+        counts[task.user_id].remove(*stored_task_state(session, task))
+        counts[task.user_id].add(task.is_completed, task.due_date)
+
+    for task in list(session.deleted):
+        if not isinstance(task, Task) or task.user_id in departed:
+            continue
+        counts[task.user_id].remove(*stored_task_state(session, task))
+        if task.id not in tombstoned:
+            change_seq = UserTaskState.bump_version(session, task.user_id)
+            session.add(TaskTombstone(task_id=task.id, user_id=task.user_id, change_seq=change_seq))
+
+    for user_id, delta in counts.items():
+        delta.apply(session, user_id)
@@ -1,11 +1,17 @@
 import pytest
 import os
 import tempfile
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+from flask import has_app_context
+
 from src.app import create_app
+from src.config import TestingConfig
 from src.database import db
+from src.sharding import create_shard_schemas
 from src.models import User, Task
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker, scoped_session
 from pathlib import Path
 from faker import Faker
@@ -61,13 +67,14 @@ def db_session(app):
 
         session_factory = sessionmaker(bind=connection)
         session = scoped_session(session_factory)
-        db.session = session
+        app_session, db.session = db.session, session
 
         yield session
 
         transaction.rollback()
         connection.close()
         session.remove()
+        db.session = app_session
 
 @pytest.fixture
 def test_user_with_password(db_session):
@@ -117,3 +124,71 @@ def auth_headers(test_user_with_password, client):
     token = response.json['access_token']
     return {'Authorization': f'Bearer {token}'}
 
+@pytest.fixture
+def sign_in():
+    """Register a user through the API and return the headers of their login"""
+    def register_and_log_in(client, username, password='password123'):
+        client.post('/api/register', json={'username': username, 'password': password})
+        token = client.post('/api/login', json={'username': username, 'password': password}).json['access_token']
+        return {'Authorization': f'Bearer {token}'}
+    return register_and_log_in
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Build a testing app on a SQLite file with some of its settings overridden.
+
+    ``make_app(GROUP_COMMIT_ENABLED=True)`` sets the given TestingConfig
+    attributes for the test and creates the schema, on every shard too.
+    Engines of the app, its replicas and shards are disposed afterwards.
+    """
+    apps = []
+
+    def build(**overrides):
+        overrides.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'primary.db'}")
+        for name, value in overrides.items():
+            monkeypatch.setattr(TestingConfig, name, value)
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+        if 'shards' in app.extensions:
+            create_shard_schemas(app)
+        apps.append(app)
+        return app
+
+    yield build
+
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+        engines = list(app.extensions.get('read_replicas') or ())
+        if 'shards' in app.extensions:
+            engines.extend(app.extensions['shards'].engines.values())
+        for engine in engines:
+            engine.dispose()
+
+
+@pytest.fixture
+def assert_max_queries(app):
+    """Fail when the block runs more SQL statements than allowed, listing them"""
+    @contextmanager
+    def check(limit):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        # Popping an app context removes the session, so reuse the one db_session pushed
+        if has_app_context():
+            engine = db.engine
+        else:
+            with app.app_context():
+                engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        assert len(statements) <= limit, (
+            f"{len(statements)} SQL statements, expected at most {limit}:\n" + "\n".join(statements)
+        )
+    return check
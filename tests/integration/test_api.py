@@ -158,7 +158,7 @@ def test_create_task_invalid_date(client, auth_headers):
 
 def test_get_tasks_empty(client, auth_headers):
     """Test getting tasks when user has no tasks"""
-    response = client.get('/api/tasks', headers=auth_headers)
+    response = client.get('/api/tasks?include_count=true', headers=auth_headers)
 
     assert response.status_code == 200
     data = response.get_json()
@@ -170,7 +170,7 @@ def test_get_tasks_empty(client, auth_headers):
 
 def test_get_tasks_with_data(client, auth_headers, test_tasks):
     """Test getting tasks when user has tasks"""
-    response = client.get('/api/tasks', headers=auth_headers)
+    response = client.get('/api/tasks?include_count=true', headers=auth_headers)
 
     assert response.status_code == 200
     data = response.get_json()
@@ -189,7 +189,7 @@ def test_get_tasks_with_data(client, auth_headers, test_tasks):
 
 def test_get_completed_tasks(client, auth_headers, test_tasks):
     """Test retrieve the completed tasks"""
-    response = client.get('/api/tasks?completed=true', headers=auth_headers)
+    response = client.get('/api/tasks?completed=true&include_count=true', headers=auth_headers)
 
     assert response.status_code == 200
     data = response.get_json()
@@ -198,7 +198,7 @@ def test_get_completed_tasks(client, auth_headers, test_tasks):
     for task in data['tasks']:
         assert task['is_completed'] is True
 
-    response = client.get('/api/tasks?completed=false', headers=auth_headers)
+    response = client.get('/api/tasks?completed=false&include_count=true', headers=auth_headers)
 
     assert response.status_code == 200
     data = response.get_json()
@@ -207,6 +207,47 @@ def test_get_completed_tasks(client, auth_headers, test_tasks):
     for task in data['tasks']:
         assert task['is_completed'] is False
 
+def test_get_tasks_count_is_optional(client, auth_headers, test_tasks):
+    """Test that the total count is only computed on request"""
+    response = client.get('/api/tasks', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert 'count' not in data
+    assert len(data['tasks']) == 3
+    assert data['next_cursor'] is None
+
+def test_get_tasks_cursor_pagination(client, auth_headers, test_tasks):
+    """Test walking all tasks page by page with the cursor"""
+    response = client.get('/api/tasks?limit=2', headers=auth_headers)
+
+    assert response.status_code == 200
+    first_page = response.get_json()
+    assert len(first_page['tasks']) == 2
+    assert first_page['next_cursor'] is not None
+
+    response = client.get(f"/api/tasks?limit=2&cursor={first_page['next_cursor']}", headers=auth_headers)
+
+    assert response.status_code == 200
+    second_page = response.get_json()
+    assert len(second_page['tasks']) == 1
+    assert second_page['next_cursor'] is None
+
+    seen_ids = [task['id'] for task in first_page['tasks'] + second_page['tasks']]
+    assert sorted(seen_ids) == sorted(task.id for task in test_tasks)
+
+def test_get_tasks_invalid_pagination(client, auth_headers):
+    """Test rejecting malformed cursors and out of range limits"""
+    response = client.get('/api/tasks?cursor=not-a-cursor', headers=auth_headers)
+    assert response.status_code == 400
+    assert 'cursor' in response.get_json()['error'].lower()
+
+    response = client.get('/api/tasks?limit=0', headers=auth_headers)
+    assert response.status_code == 400
+
+    response = client.get('/api/tasks?limit=abc', headers=auth_headers)
+    assert response.status_code == 400
+
 def test_get_single_task_success(client, auth_headers, test_tasks):
     """Test getting a single task"""
     task_id = test_tasks[0].id
@@ -303,4 +344,141 @@ def test_delete_task_not_found(client, auth_headers):
     """Test deleting non-existent task"""
     response = client.delete('/api/tasks/99999', headers=auth_headers)
     
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_search_tasks(client, auth_headers, test_tasks):
+    """Test searching tasks through the API"""
+    response = client.get('/api/tasks?search=Task 2', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['tasks'][0]['title'] == 'Test Task 2'
+
+    response = client.get('/api/tasks?search=descrip&limit=2', headers=auth_headers)
+
+    assert response.status_code == 200
+    first_page = response.get_json()
+    assert len(first_page['tasks']) == 2
+
+    response = client.get(f"/api/tasks?search=descrip&limit=2&cursor={first_page['next_cursor']}", headers=auth_headers)
+
+    assert response.status_code == 200
+    second_page = response.get_json()
+    assert len(second_page['tasks']) == 1
+    assert second_page['next_cursor'] is None
+
+
+def test_search_pages_stay_stable_when_other_users_write(client, auth_headers, sign_in):
+    """Test that a search cursor keeps its place while another user adds matching tasks"""
+    for title, description in [('Quarterly report', ''), ('Report draft for the board', ''),
+                               ('Email Sam', 'Attach the report'), ('Print', 'Report and slides')]:
+        client.post('/api/tasks', json={'title': title, 'description': description}, headers=auth_headers)
+    expected = [task['title'] for task in client.get('/api/tasks?search=report', headers=auth_headers).json['tasks']]
+    assert expected == ['Report draft for the board', 'Quarterly report', 'Print', 'Email Sam']
+
+    first_page = client.get('/api/tasks?search=report&limit=2', headers=auth_headers).json
+    other_headers = sign_in(client, 'otheruser')
+    for number in range(20):
+        client.post('/api/tasks', json={'title': f'Report {number}', 'description': 'report report'},
+                    headers=other_headers)
+    second_page = client.get(f"/api/tasks?search=report&limit=2&cursor={first_page['next_cursor']}",
+                             headers=auth_headers).json
+
+    assert [task['title'] for task in first_page['tasks'] + second_page['tasks']] == expected
+    assert second_page['next_cursor'] is None
+
+
+def test_create_task_without_due_date(client, auth_headers):
+    """Test creating a task without a due date"""
+    response = client.post('/api/tasks', json={'title': 'No due date'}, headers=auth_headers)
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['task']['title'] == 'No due date'
+    assert data['task']['due_date'] is None
+    assert data['task']['is_completed'] is False
+
+def test_batch_tasks(client, auth_headers, test_tasks):
+    """Test applying creates, updates and deletes in one batch"""
+    from src.models import Task
+
+    response = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'Batch created'}},
+        {'op': 'update', 'id': test_tasks[0].id, 'data': {'title': 'Batch updated', 'is_completed': False}},
+        {'op': 'delete', 'id': test_tasks[1].id},
+        {'op': 'create', 'data': {'description': 'Missing title'}},
+        {'op': 'delete', 'id': 99999},
+        {'op': 'archive', 'id': test_tasks[2].id},
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    results = data['results']
+
+    assert [result['status'] for result in results] == [201, 200, 200, 400, 404, 400]
+    assert data['succeeded'] == 3
+    assert data['failed'] == 3
+    assert results[0]['task']['title'] == 'Batch created'
+    assert results[1]['task']['title'] == 'Batch updated'
+    assert results[1]['task']['is_completed'] is False
+    assert Task.query.get(test_tasks[1].id) is None
+    assert Task.query.get(results[0]['task']['id']) is not None
+
+def test_batch_tasks_rejects_other_users_tasks(client, auth_headers, db_session):
+    """Test that a batch cannot touch another user's tasks"""
+    from src.models import User, Task
+    other_user = User(username='batch_other')
+    other_user.set_password("password")
+    db_session.add(other_user)
+    db_session.commit()
+
+    other_task = Task(title="Not yours", user_id=other_user.id)
+    db_session.add(other_task)
+    db_session.commit()
+
+    response = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'delete', 'id': other_task.id},
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['status'] == 404
+    assert Task.query.get(other_task.id) is not None
+
+def test_batch_tasks_invalid_payload(client, auth_headers):
+    """Test rejecting malformed batch payloads"""
+    response = client.post('/api/tasks/batch', json={'operations': []}, headers=auth_headers)
+    assert response.status_code == 400
+
+    response = client.post('/api/tasks/batch', json={'operations': [{'op': 'create', 'data': {'title': 't'}}] * 501}, headers=auth_headers)
+    assert response.status_code == 400
+
+    response = client.post('/api/tasks/batch', json={'operations': [{'op': 'delete', 'id': True}]}, headers=auth_headers)
+    assert response.json['results'][0]['status'] == 400
+    assert response.json['results'][0]['error'] == 'id must be an integer'
+
+def test_get_tasks_sparse_fieldset(app, client, auth_headers, test_tasks):
+    """Test that only the requested fields are selected and returned"""
+    from sqlalchemy import event
+    from src.database import db
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get('/api/tasks?fields=id,title,is_completed&limit=2', headers=auth_headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert all(set(task) == {'id', 'title', 'is_completed'} for task in data['tasks'])
+    assert data['next_cursor'] is not None
+    assert any('FROM tasks' in statement for statement in statements)
+    assert not any('tasks.description' in statement for statement in statements)
+
+    response = client.get('/api/tasks?fields=id,secret', headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import pytest
+
+from src.asgi import AsyncTaskApp, load_config
+
+
+class AsgiClient:
+    """Drive an ASGI app in-process, including its lifespan"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __aenter__(self):
+        self.lifespan_in = asyncio.Queue()
+        self.lifespan_out = asyncio.Queue()
+        self.lifespan = asyncio.create_task(
+            self.app({'type': 'lifespan'}, self.lifespan_in.get, self.lifespan_out.put)
+        )
+        await self.lifespan_in.put({'type': 'lifespan.startup'})
+        assert (await self.lifespan_out.get())['type'] == 'lifespan.startup.complete'
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.lifespan_in.put({'type': 'lifespan.shutdown'})
+        await self.lifespan
+
+    async def request(self, method, path, body=None, headers=None, query=''):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query.encode('latin-1'),
+            'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        }
+        received = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await self.app(scope, receive, send)
+        response_headers = {name.decode().lower(): value.decode() for name, value in sent[0]['headers']}
+        content = sent[1]['body']
+        return sent[0]['status'], response_headers, json.loads(content) if content else None
+
+
+def test_refuses_sharded_config(tmp_path):
+    """Test that the async app won't start when task data is sharded, as it only reaches the primary"""
+    config = load_config('testing')
+    config['DATABASE_SHARD_URLS'] = f"east=sqlite:///{(tmp_path / 'east.db').as_posix()}"
+
+    with pytest.raises(ValueError, match='DATABASE_SHARD_URLS'):
+        AsyncTaskApp(config)
+
+
+@pytest.fixture
+def flask_app(make_app):
+    """The WSGI app on the database the async app serves, used to register and sign in users"""
+    return make_app()
+
+
+@pytest.fixture
+def asgi_app(flask_app):
+    return AsyncTaskApp(load_config('testing'))
+
+
+def test_task_lifecycle(flask_app, asgi_app, sign_in):
+    """Test create, read, update and delete through the async handlers"""
+    async def scenario():
+        async with AsgiClient(asgi_app) as client:
+            headers = sign_in(flask_app.test_client(), 'asyncuser')
+
+            status, _, data = await client.request('POST', '/api/tasks', {'title': ' Async task '}, headers)
+            assert status == 201
+            task = data['task']
+            assert task['title'] == 'Async task'
+
+            status, response_headers, data = await client.request('GET', '/api/tasks', headers=headers)
+            assert status == 200
+            assert [item['id'] for item in data['tasks']] == [task['id']]
+
+            etag = response_headers['etag']
+            status, _, data = await client.request('GET', '/api/tasks', headers={**headers, 'If-None-Match': etag})
+            assert status == 304 and data is None
+
+            status, response_headers, data = await client.request(
+                'PUT', f"/api/tasks/{task['id']}", {'is_completed': True}, headers
+            )
+            assert status == 200 and data['task']['is_completed'] is True
+
+            status, _, _ = await client.request(
+                'PUT', f"/api/tasks/{task['id']}", {'title': 'Stale'}, {**headers, 'If-Match': etag}
+            )
+            assert status == 412
+
+            status, _, data = await client.request('GET', f"/api/tasks/{task['id']}", headers=headers)
+            assert status == 200 and data['task']['is_completed'] is True
+
+            status, _, _ = await client.request('DELETE', f"/api/tasks/{task['id']}", headers=headers)
+            assert status == 200
+            status, _, _ = await client.request('GET', f"/api/tasks/{task['id']}", headers=headers)
+            assert status == 404
+
+            events = asgi_app.events.events_after(task['user_id'], 0)
+            assert [event['type'] for event in events] == ['task.created', 'task.updated', 'task.deleted']
+
+    asyncio.run(scenario())
+
+
+def test_requests_are_validated(flask_app, asgi_app, sign_in):
+    """Test auth, routing and payload errors"""
+    async def scenario():
+        async with AsgiClient(asgi_app) as client:
+            status, _, _ = await client.request('GET', '/api/tasks')
+            assert status == 401
+
+            status, _, _ = await client.request('GET', '/api/tasks', headers={'Authorization': 'Bearer nonsense'})
+            assert status == 401
+
+            headers = sign_in(flask_app.test_client(), 'validator')
+            status, _, data = await client.request('POST', '/api/tasks', {'description': 'no title'}, headers)
+            assert status == 400 and 'title' in data['error']
+
+            status, _, _ = await client.request('GET', '/api/tasks', headers=headers, query='limit=abc')
+            assert status == 400
+
+            status, response_headers, _ = await client.request('PATCH', '/api/tasks/1', headers=headers)
+            assert status == 405 and 'PUT' in response_headers['allow']
+
+            status, _, _ = await client.request('GET', '/api/nowhere', headers=headers)
+            assert status == 404
+
+            other = sign_in(flask_app.test_client(), 'someoneelse')
+            _, _, data = await client.request('POST', '/api/tasks', {'title': 'Private'}, headers)
+            status, _, _ = await client.request('GET', f"/api/tasks/{data['task']['id']}", headers=other)
+            assert status == 404
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_requests(flask_app, asgi_app, sign_in):
+    """Test many overlapping requests served by one event loop"""
+    async def scenario():
+        async with AsgiClient(asgi_app) as client:
+            headers = sign_in(flask_app.test_client(), 'busyuser')
+            results = await asyncio.gather(*(
+                client.request('POST', '/api/tasks', {'title': f'Task {i}'}, headers) for i in range(25)
+            ))
+            assert [status for status, _, _ in results] == [201] * 25
+
+            status, _, data = await client.request('GET', '/api/tasks', headers=headers, query='include_count=true')
+            assert status == 200 and data['count'] == 25
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+def test_get_task_etag_and_304(client, auth_headers, test_tasks):
+    """Test that an unchanged task answers 304 to If-None-Match"""
+    task_id = test_tasks[0].id
+    response = client.get(f'/api/tasks/{task_id}', headers=auth_headers)
+
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+    response = client.get(f'/api/tasks/{task_id}', headers={**auth_headers, 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+def test_get_task_if_modified_since(client, auth_headers, test_tasks):
+    """Test If-Modified-Since on a single task"""
+    task_id = test_tasks[0].id
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(minutes=5), usegmt=True)
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(days=1), usegmt=True)
+
+    response = client.get(f'/api/tasks/{task_id}', headers={**auth_headers, 'If-Modified-Since': future})
+    assert response.status_code == 304
+
+    response = client.get(f'/api/tasks/{task_id}', headers={**auth_headers, 'If-Modified-Since': past})
+    assert response.status_code == 200
+
+def test_task_list_etag_changes_after_write(client, auth_headers, test_tasks):
+    """Test that the list ETag holds until the user's tasks change"""
+    response = client.get('/api/tasks?completed=false', headers=auth_headers)
+    etag = response.headers['ETag']
+
+    response = client.get('/api/tasks?completed=false', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = client.get('/api/tasks?completed=true', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+
+    client.put(f'/api/tasks/{test_tasks[0].id}', json={'title': 'Changed'}, headers=auth_headers)
+
+    response = client.get('/api/tasks?completed=false', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_update_task_if_match(client, auth_headers, test_tasks):
+    """Test optimistic concurrency with If-Match on update"""
+    task_id = test_tasks[0].id
+    etag = client.get(f'/api/tasks/{task_id}', headers=auth_headers).headers['ETag']
+
+    response = client.put(f'/api/tasks/{task_id}', json={'title': 'First writer'},
+                          headers={**auth_headers, 'If-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    response = client.put(f'/api/tasks/{task_id}', json={'title': 'Second writer'},
+                          headers={**auth_headers, 'If-Match': etag})
+    assert response.status_code == 412
+
+def test_compressed_list_revalidates(client, auth_headers, test_tasks):
+    """Test that the ETag of a compressed list still validates and guards updates"""
+    headers = {**auth_headers, 'Accept-Encoding': 'gzip'}
+    for index in range(20):
+        client.post('/api/tasks', json={'title': f'Padding {index}', 'description': 'y' * 200}, headers=auth_headers)
+
+    response = client.get('/api/tasks', headers=headers)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    response = client.get('/api/tasks', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+    task_id = test_tasks[0].id
+    task_etag = client.get(f'/api/tasks/{task_id}', headers=auth_headers).headers['ETag']
+    compressed_etag = task_etag[:-1] + '-br"'
+    response = client.put(f'/api/tasks/{task_id}', json={'title': 'Guarded'},
+                          headers={**auth_headers, 'If-Match': compressed_etag})
+    assert response.status_code == 200
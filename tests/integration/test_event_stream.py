@@ -0,0 +1,72 @@
+import pytest
+from src.events import EventBus, InProcessBackend, StreamSlots
+
+@pytest.fixture
+def event_bus(app, monkeypatch):
+    """Give each test its own empty event bus"""
+    bus = EventBus(InProcessBackend())
+    monkeypatch.setitem(app.extensions, 'event_bus', bus)
+    return bus
+
+def test_long_poll_returns_published_events(client, auth_headers, event_bus):
+    """Test that writes show up on the long-poll endpoint"""
+    response = client.get('/api/tasks/events?mode=poll&timeout=0', headers=auth_headers)
+    assert response.status_code == 200
+    start = response.get_json()['last_seq']
+
+    created = client.post('/api/tasks', json={'title': 'Watch me'}, headers=auth_headers).get_json()['task']
+    client.delete(f"/api/tasks/{created['id']}", headers=auth_headers)
+
+    response = client.get(f'/api/tasks/events?mode=poll&since={start}&timeout=1', headers=auth_headers)
+    data = response.get_json()
+
+    assert [event['type'] for event in data['events']] == ['task.created', 'task.deleted']
+    assert data['events'][0]['task']['title'] == 'Watch me'
+    assert data['last_seq'] == start + 2
+    assert data['resync'] is False
+
+def test_long_poll_times_out_empty(client, auth_headers, event_bus):
+    """Test that an idle long-poll returns no events"""
+    response = client.get('/api/tasks/events?mode=poll&timeout=0.05', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['events'] == []
+
+def test_long_poll_asks_for_resync_when_history_is_gone(client, auth_headers, event_bus):
+    """Test that missing history tells the client to resync"""
+    client.post('/api/tasks', json={'title': 'One'}, headers=auth_headers)
+    event_bus.backend._history.clear()
+
+    response = client.get('/api/tasks/events?mode=poll&since=0&timeout=0', headers=auth_headers)
+
+    assert response.get_json()['resync'] is True
+
+def test_sse_stream_replays_after_last_event_id(app, client, auth_headers, event_bus, monkeypatch):
+    """Test the event stream format and resuming with Last-Event-ID"""
+    monkeypatch.setitem(app.config, 'EVENTS_STREAM_MAX_SECONDS', 0)
+    client.post('/api/tasks', json={'title': 'First'}, headers=auth_headers)
+    client.post('/api/tasks', json={'title': 'Second'}, headers=auth_headers)
+
+    response = client.get('/api/tasks/events', headers={**auth_headers, 'Last-Event-ID': '1'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert 'id: 2\nevent: task.created\n' in body
+    assert 'First' not in body
+    assert 'Second' in body
+
+def test_open_streams_are_capped_per_process(app, client, auth_headers, event_bus, monkeypatch):
+    """Test that streams past EVENTS_MAX_STREAMS get a 503 until an open one closes"""
+    monkeypatch.setitem(app.extensions, 'event_stream_slots', StreamSlots(1))
+
+    stream = client.get('/api/tasks/events', headers=auth_headers, buffered=False)
+    assert stream.status_code == 200
+
+    busy = client.get('/api/tasks/events?mode=poll&timeout=0', headers=auth_headers)
+    assert busy.status_code == 503
+    assert busy.headers['Retry-After'] == '5'
+
+    stream.close()
+    assert client.get('/api/tasks/events?mode=poll&timeout=0', headers=auth_headers).status_code == 200
+    assert client.get('/api/tasks/events?mode=poll&timeout=0', headers=auth_headers).status_code == 200
@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+from sqlalchemy import func, select
+
+from src.database import db
+from src.group_commit import GROUP_SIZE, GroupCommitWriter, run_write
+from src.models import Task, User
+
+@pytest.fixture
+def group_commit_app(make_app):
+    """An app on a SQLite file with group commit enabled"""
+    return make_app(GROUP_COMMIT_ENABLED=True, GROUP_COMMIT_MAX_DELAY_MS=20)
+
+def test_concurrent_writes_share_commits(group_commit_app, sign_in):
+    """Test that concurrent creates and updates are committed in groups and all persist"""
+    headers = [sign_in(group_commit_app.test_client(), f'grouped{number}') for number in range(8)]
+    groups_before = GROUP_SIZE.count()
+    statuses = []
+
+    def write(user_headers):
+        client = group_commit_app.test_client()
+        for number in range(5):
+            created = client.post('/api/tasks', json={'title': f'Grouped {number}'}, headers=user_headers)
+            updated = client.put(f"/api/tasks/{created.json['task']['id']}", json={'is_completed': True},
+                                 headers=user_headers)
+            statuses.extend([created.status_code, updated.status_code])
+
+    threads = [threading.Thread(target=write, args=(user_headers,)) for user_headers in headers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count(201) == 40 and statuses.count(200) == 40
+    assert GROUP_SIZE.count() - groups_before < 80
+    with group_commit_app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Task).where(Task.is_completed)) == 40
+    client = group_commit_app.test_client()
+    assert client.get('/api/tasks/stats', headers=headers[0]).json['stats']['completed'] == 5
+
+def test_update_checks_run_in_the_writer(group_commit_app, sign_in):
+    """Test that 404, 412 and validation errors still come back from grouped updates"""
+    client = group_commit_app.test_client()
+    headers = sign_in(client, 'validated')
+    created = client.post('/api/tasks', json={'title': 'Checked'}, headers=headers)
+    task_id = created.json['task']['id']
+
+    assert client.put('/api/tasks/999999', json={'title': 'Missing'}, headers=headers).status_code == 404
+    stale = client.put(f'/api/tasks/{task_id}', json={'title': 'Stale'}, headers={**headers, 'If-Match': '"stale"'})
+    assert stale.status_code == 412
+    assert client.put(f'/api/tasks/{task_id}', json={'title': 5}, headers=headers).status_code == 400
+
+    response = client.put(f'/api/tasks/{task_id}', json={'title': 'Renamed'},
+                          headers={**headers, 'If-Match': created.headers.get('ETag') or '*'})
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert client.get(f'/api/tasks/{task_id}', headers=headers).json['task']['title'] == 'Renamed'
+
+def test_failing_mutation_does_not_fail_its_group(group_commit_app):
+    """Test that a group with a failing mutation is retried so the others still commit"""
+    with group_commit_app.app_context():
+        writer = GroupCommitWriter(group_commit_app, db.engine, max_batch=10, max_delay=0.05)
+
+    def add_user(username):
+        def mutation(session):
+            session.add(User(username=username, password_hash='hash'))
+            session.flush()
+            return username
+        return mutation
+
+    def fail(session):
+        raise RuntimeError("broken mutation")
+
+    futures = [writer.submit(add_user('first')), writer.submit(fail), writer.submit(add_user('second'))]
+
+    assert futures[0].result(timeout=5) == 'first'
+    with pytest.raises(RuntimeError, match='broken mutation'):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == 'second'
+    with group_commit_app.app_context():
+        usernames = db.session.scalars(select(User.username).where(User.username.in_(['first', 'second']))).all()
+        assert sorted(usernames) == ['first', 'second']
+
+def test_timed_out_writes_are_cancelled_or_awaited(group_commit_app, monkeypatch):
+    """Test that a write still queued at the timeout never runs, and a started one is waited for"""
+    monkeypatch.setitem(group_commit_app.config, 'GROUP_COMMIT_TIMEOUT', 0.1)
+    with group_commit_app.app_context():
+        writer = group_commit_app.extensions['group_commit'].writer(db.engine)
+    ran = []
+
+    def holding(release, started=None):
+        def hold(session):
+            if started is not None:
+                started.set()
+            release.wait(5)
+            ran.append('hold')
+            return 'held'
+        return hold
+
+    def add_user(session):
+        ran.append('queued')
+        session.add(User(username='never_written', password_hash='hash'))
+
+    release, started = threading.Event(), threading.Event()
+    held = writer.submit(holding(release, started))
+    assert started.wait(5)
+    with group_commit_app.test_request_context():
+        with pytest.raises(FutureTimeoutError):
+            run_write(add_user)
+    release.set()
+    assert held.result(timeout=5) == 'held'
+
+    release = threading.Event()
+    threading.Timer(0.3, release.set).start()
+    with group_commit_app.test_request_context():
+        assert run_write(holding(release)) == 'held'
+
+    assert ran == ['hold', 'hold']
+    with group_commit_app.app_context():
+        assert db.session.scalar(select(User).filter_by(username='never_written')) is None
@@ -0,0 +1,22 @@
+def test_server_timing_breaks_down_get_tasks(client, auth_headers, test_tasks):
+    """Test the Server-Timing phases reported for the task list"""
+    response = client.get('/api/tasks', headers=auth_headers)
+
+    timing = response.headers['Server-Timing']
+    for name in ('total;dur=', 'db;dur=', 'auth;dur=', 'identity;dur=', 'serialize;dur='):
+        assert name in timing
+    assert 'queries"' in timing
+
+def test_metrics_endpoint(client, auth_headers, test_tasks):
+    """Test that /metrics exposes per-route latency and SQL counts"""
+    client.get('/api/tasks', headers=auth_headers)
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+    text = response.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_duration_seconds_count{endpoint="get_tasks",method="GET",status="200"}' in text
+    assert 'http_request_sql_queries_count{endpoint="get_tasks"}' in text
+    assert 'db_pool_checkout_wait_seconds' in text
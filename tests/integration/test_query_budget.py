@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models import Task, User
+
+def add_tasks(db_session, user_id, count):
+    db_session.add_all([
+        Task(title=f'Bulk {i}', user_id=user_id, due_date=datetime.utcnow() + timedelta(days=i))
+        for i in range(count)
+    ])
+    db_session.commit()
+
+@pytest.mark.parametrize('path, limit', [
+    ('/api/tasks', 3),
+    ('/api/tasks?include_count=true&completed=false', 4),
+    ('/api/tasks?search=Bulk', 4),
+    ('/api/tasks/stats', 4),
+    ('/api/tasks/changes', 3),
+])
+def test_read_endpoints_have_flat_query_counts(client, auth_headers, test_tasks, db_session,
+                                               assert_max_queries, path, limit):
+    """Test that list endpoints run the same statements for 3 or 50 tasks"""
+    user_id = test_tasks[0].user_id
+    with assert_max_queries(limit) as few:
+        client.get(path, headers=auth_headers)
+
+    add_tasks(db_session, user_id, 47)
+    with assert_max_queries(limit) as many:
+        client.get(path, headers=auth_headers)
+
+    assert len(many) <= len(few) + 1
+
+def test_task_writes_stay_within_budget(client, auth_headers, test_tasks, assert_max_queries):
+    """Test the statement counts of single task writes"""
+    with assert_max_queries(6):
+        task = client.post('/api/tasks', json={'title': 'Counted', 'due_date': '2030-01-01T00:00:00'},
+                           headers=auth_headers).get_json()['task']
+    with assert_max_queries(7):
+        client.put(f"/api/tasks/{task['id']}", json={'due_date': '2031-01-01T00:00:00'}, headers=auth_headers)
+    with assert_max_queries(8):
+        client.delete(f"/api/tasks/{task['id']}", headers=auth_headers)
+
+def test_batch_query_count_independent_of_size(client, auth_headers, test_tasks, assert_max_queries):
+    """Test that a batch of 50 operations runs a fixed number of statements"""
+    task_ids = [task.id for task in test_tasks]
+    operations = [{'op': 'create', 'data': {'title': f'Batch {i}'}} for i in range(45)]
+    operations += [{'op': 'update', 'id': task_id, 'data': {'is_completed': True}} for task_id in task_ids[:2]]
+    operations += [{'op': 'delete', 'id': task_ids[2]}]
+
+    with assert_max_queries(10):
+        response = client.post('/api/tasks/batch', json={'operations': operations}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [result['status'] for result in response.get_json()['results']] == [201] * 45 + [200, 200, 200]
+
+def test_user_to_dict_does_not_load_tasks(db_session, test_tasks, assert_max_queries):
+    """Test that serializing a user no longer lazy-loads every task"""
+    user_id = test_tasks[0].user_id
+    db_session.expunge_all()
+    user = db_session.get(User, user_id)
+
+    with assert_max_queries(2) as statements:
+        user.to_dict()
+    assert not any('FROM tasks' in statement for statement in statements)
@@ -0,0 +1,65 @@
+import pytest
+
+from src.replicas import READ_ROUTING, snapshot_sqlite_replicas
+
+@pytest.fixture
+def replica_app(make_app, tmp_path):
+    """An app on a SQLite file with a second file standing in for its read replica"""
+    return make_app(DATABASE_REPLICA_URLS=f"sqlite:///{tmp_path / 'replica.db'}", DB_REPLICA_PIN_SECONDS=60)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The wall clock replica pins are measured against, moved by hand"""
+    now = [1000.0]
+    monkeypatch.setattr('src.replicas.time.time', lambda: now[0])
+    return now
+
+def test_reads_use_replica_until_user_writes(replica_app, sign_in, clock):
+    """Test that reads come from the replica, except for a user who just wrote, with no cookies involved"""
+    client = replica_app.test_client(use_cookies=False)
+    headers = sign_in(client, 'replicated')
+    client.post('/api/tasks', json={'title': 'Replicated task'}, headers=headers)
+    assert snapshot_sqlite_replicas(replica_app) == 1
+    clock[0] += 61
+
+    created = client.post('/api/tasks', json={'title': 'Not replicated yet'}, headers=headers)
+    assert 'Set-Cookie' not in created.headers
+    created = created.json['task']
+
+    assert len(client.get('/api/tasks', headers=headers).json['tasks']) == 2
+    assert client.get(f"/api/tasks/{created['id']}", headers=headers).status_code == 200
+
+    clock[0] += 61
+    assert [task['title'] for task in client.get('/api/tasks', headers=headers).json['tasks']] == ['Replicated task']
+    assert client.get(f"/api/tasks/{created['id']}", headers=headers).status_code == 404
+
+def test_writes_pin_only_their_user(replica_app, sign_in, clock):
+    """Test that reads without writes never pin and one user's writes leave other users on the replica"""
+    client = replica_app.test_client(use_cookies=False)
+    writer = sign_in(client, 'replicated')
+    reader = sign_in(client, 'bystander')
+    snapshot_sqlite_replicas(replica_app)
+    clock[0] += 61
+
+    replica_reads = READ_ROUTING.value(target='replica')
+    client.get('/api/tasks', headers=reader)
+    client.get('/api/tasks', headers=reader)
+    client.post('/api/tasks', json={'title': 'Written'}, headers=writer)
+    client.get('/api/tasks', headers=reader)
+    assert READ_ROUTING.value(target='replica') - replica_reads == 3
+
+    assert len(client.get('/api/tasks', headers=writer).json['tasks']) == 1
+    clock[0] += 61
+    assert client.get('/api/tasks', headers=writer).json['tasks'] == []
+
+def test_new_users_sign_in_before_the_replica_has_them(replica_app, sign_in):
+    """Test that a user can log in and read right after registering, while the replica lags"""
+    snapshot_sqlite_replicas(replica_app)
+    client = replica_app.test_client(use_cookies=False)
+
+    headers = sign_in(client, 'newcomer')
+    assert client.get('/api/tasks', headers=headers).status_code == 200
+
+    registered = client.post('/api/register', json={'username': 'eager', 'password': 'password123'}).json
+    token_headers = {'Authorization': f"Bearer {registered['access_token']}"}
+    assert client.get('/api/tasks', headers=token_headers).status_code == 200
@@ -0,0 +1,64 @@
+import pytest
+
+from src.database import db
+from src.models import Task
+from src.response_cache import CACHE_LOOKUPS
+
+@pytest.fixture
+def cached_app(make_app):
+    """An app with the in-memory response cache enabled"""
+    return make_app(RESPONSE_CACHE_BACKEND='memory')
+
+def test_repeated_list_queries_are_served_from_cache(cached_app, sign_in):
+    """Test that identical queries hit the cache regardless of argument order"""
+    client = cached_app.test_client()
+    headers = sign_in(client, 'cached')
+    client.post('/api/tasks', json={'title': 'Buy milk'}, headers=headers)
+    hits, misses = CACHE_LOOKUPS.value(result='hit'), CACHE_LOOKUPS.value(result='miss')
+
+    first = client.get('/api/tasks?completed=false&limit=10', headers=headers)
+    second = client.get('/api/tasks?limit=10&completed=false', headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.get_data() == second.get_data()
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert second.headers['Content-Type'] == 'application/json'
+    assert CACHE_LOOKUPS.value(result='miss') - misses == 1
+    assert CACHE_LOOKUPS.value(result='hit') - hits == 1
+
+def test_writes_invalidate_cached_lists(cached_app, sign_in):
+    """Test that creating, updating and deleting a task are visible on the next list"""
+    client = cached_app.test_client()
+    headers = sign_in(client, 'invalidated')
+    task = client.post('/api/tasks', json={'title': 'Buy milk'}, headers=headers).json['task']
+    assert [item['title'] for item in client.get('/api/tasks?search=milk', headers=headers).json['tasks']] == \
+        ['Buy milk']
+
+    client.put(f"/api/tasks/{task['id']}", json={'title': 'Buy oat milk'}, headers=headers)
+    assert [item['title'] for item in client.get('/api/tasks?search=milk', headers=headers).json['tasks']] == \
+        ['Buy oat milk']
+
+    client.delete(f"/api/tasks/{task['id']}", headers=headers)
+    assert client.get('/api/tasks?search=milk', headers=headers).json['tasks'] == []
+
+def test_users_do_not_share_cached_lists(cached_app, sign_in):
+    """Test that the same query from another user is not answered from the first user's entry"""
+    client = cached_app.test_client()
+    first, second = sign_in(client, 'first_cached'), sign_in(client, 'second_cached')
+    client.post('/api/tasks', json={'title': 'Private'}, headers=first)
+
+    assert len(client.get('/api/tasks', headers=first).json['tasks']) == 1
+    assert client.get('/api/tasks', headers=second).json['tasks'] == []
+
+def test_writes_outside_the_task_helpers_invalidate_cached_lists(cached_app, sign_in):
+    """Test that a task changed through the model helper still bumps the list version"""
+    client = cached_app.test_client()
+    headers = sign_in(client, 'bypassed')
+    task = client.post('/api/tasks', json={'title': 'Before'}, headers=headers).json['task']
+    assert [item['title'] for item in client.get('/api/tasks', headers=headers).json['tasks']] == ['Before']
+
+    with cached_app.app_context():
+        db.session.get(Task, task['id']).update(title='After')
+        db.session.commit()
+
+    assert [item['title'] for item in client.get('/api/tasks', headers=headers).json['tasks']] == ['After']
@@ -0,0 +1,156 @@
+import pytest
+from sqlalchemy import func, select, text, update
+
+from src.database import db
+from src.models import Task, TaskTombstone, User, UserShard, UserTaskState
+from src.sharding import PRIMARY_SHARD, move_users, plan_rebalance, shard_stats
+
+@pytest.fixture
+def sharded_app(make_app, tmp_path):
+    """An app on a SQLite primary with two SQLite shards for task data"""
+    return make_app(DATABASE_SHARD_URLS=f"east=sqlite:///{tmp_path / 'east.db'},west=sqlite:///{tmp_path / 'west.db'}",
+                    SHARD_MOVE_SETTLE_SECONDS=0)
+
+def signed_in_user(sign_in, app, username):
+    """Sign a user in, returning their id, which picks the shard, along with the auth headers"""
+    headers = sign_in(app.test_client(), username)
+    with app.app_context():
+        return db.session.execute(select(User.id).where(User.username == username)).scalar_one(), headers
+
+def count_tasks(engine, user_id):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(Task).where(Task.user_id == user_id)).scalar()
+
+def test_tasks_are_written_to_the_users_shard(sharded_app, sign_in):
+    """Test that each user's tasks land on the shard the ring assigns and nowhere else"""
+    client = sharded_app.test_client()
+    router = sharded_app.extensions['shards']
+    users = [signed_in_user(sign_in, sharded_app, f'sharded{number}') for number in range(6)]
+    for user_id, headers in users:
+        client.post('/api/tasks', json={'title': f'Task of {user_id}'}, headers=headers)
+        client.post('/api/tasks/batch', json={'operations': [{'op': 'create', 'data': {'title': 'Batched'}}]},
+                    headers=headers)
+
+    assert {router.home_shard(user_id) for user_id, _ in users} == {'east', 'west'}
+    with sharded_app.app_context():
+        for user_id, headers in users:
+            home = router.home_shard(user_id)
+            other = 'west' if home == 'east' else 'east'
+            assert count_tasks(router.engine(home), user_id) == 2
+            assert count_tasks(router.engine(other), user_id) == 0
+            assert count_tasks(db.engine, user_id) == 0
+            assert db.session.get(UserShard, user_id).shard == home
+
+            tasks = client.get('/api/tasks?search=Batched', headers=headers).json['tasks']
+            assert [task['title'] for task in tasks] == ['Batched']
+            assert client.get('/api/tasks/stats', headers=headers).json['stats']['total'] == 2
+
+    ids = [task['id'] for _, headers in users for task in client.get('/api/tasks', headers=headers).json['tasks']]
+    assert len(set(ids)) == len(ids) == 12
+
+def test_move_user_between_shards(sharded_app, sign_in):
+    """Test that a moved user keeps their tasks, ids and change feed on the new shard"""
+    client = sharded_app.test_client()
+    router = sharded_app.extensions['shards']
+    user_id, headers = signed_in_user(sign_in, sharded_app, 'mover')
+    created = [client.post('/api/tasks', json={'title': f'Task {number}', 'due_date': '2030-01-01T09:00:00'},
+                           headers=headers).json['task'] for number in range(3)]
+    client.delete(f"/api/tasks/{created[0]['id']}", headers=headers)
+    before = client.get('/api/tasks', headers=headers).json['tasks']
+    watermark = client.get('/api/tasks/changes', headers=headers).json['watermark']
+
+    source = router.home_shard(user_id)
+    target = 'west' if source == 'east' else 'east'
+    assert move_users(sharded_app, [(user_id, target)]) == {user_id: 2}
+
+    with sharded_app.app_context():
+        assert count_tasks(router.engine(source), user_id) == 0
+        assert count_tasks(router.engine(target), user_id) == 2
+    assert client.get('/api/tasks', headers=headers).json['tasks'] == before
+    assert client.get('/api/tasks/stats', headers=headers).json['stats']['total'] == 2
+    assert client.get(f"/api/tasks/changes?since={watermark}", headers=headers).json['tasks'] == []
+
+    updated = client.put(f"/api/tasks/{created[1]['id']}", json={'is_completed': True}, headers=headers)
+    assert updated.status_code == 200
+    assert plan_rebalance(sharded_app) == [(user_id, target, source)]
+
+def test_writes_are_refused_while_a_user_moves(sharded_app, sign_in):
+    """Test that a user marked as moving can read but not write"""
+    client = sharded_app.test_client()
+    user_id, headers = signed_in_user(sign_in, sharded_app, 'frozen')
+    client.post('/api/tasks', json={'title': 'Before the move'}, headers=headers)
+    with sharded_app.app_context():
+        db.session.get(UserShard, user_id).moving = True
+        db.session.commit()
+    sharded_app.extensions['shards'].forget(user_id)
+
+    assert client.get('/api/tasks', headers=headers).status_code == 200
+    response = client.post('/api/tasks', json={'title': 'During the move'}, headers=headers)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+def test_rebalance_moves_users_created_before_sharding(sharded_app, sign_in):
+    """Test that users whose tasks are in the primary are moved to their ring shard"""
+    client = sharded_app.test_client()
+    router = sharded_app.extensions['shards']
+    user_id, headers = signed_in_user(sign_in, sharded_app, 'legacy')
+    with sharded_app.app_context():
+        db.session.delete(db.session.get(UserShard, user_id))
+        db.session.commit()
+    router.forget(user_id)
+    task = client.post('/api/tasks', json={'title': 'Stored in the primary'}, headers=headers).json['task']
+
+    with sharded_app.app_context():
+        assert count_tasks(db.engine, user_id) == 1
+    assert plan_rebalance(sharded_app) == [(user_id, PRIMARY_SHARD, router.home_shard(user_id))]
+    assert move_users(sharded_app, [(user_id, router.home_shard(user_id))]) == {user_id: 1}
+
+    assert plan_rebalance(sharded_app) == []
+    with sharded_app.app_context():
+        assert count_tasks(db.engine, user_id) == 0
+    assert client.get(f"/api/tasks/{task['id']}", headers=headers).json['task']['title'] == 'Stored in the primary'
+    stats = shard_stats(sharded_app)
+    assert stats[PRIMARY_SHARD] == {'users': 0, 'tasks': 0}
+    assert stats[router.home_shard(user_id)] == {'users': 1, 'tasks': 1}
+
+def test_shard_cli_commands(sharded_app, sign_in):
+    """Test the move, rebalance and stats commands"""
+    client = sharded_app.test_client()
+    user_id, headers = signed_in_user(sign_in, sharded_app, 'commanded')
+    client.post('/api/tasks', json={'title': 'Moved by command'}, headers=headers)
+    home = sharded_app.extensions['shards'].home_shard(user_id)
+    runner = sharded_app.test_cli_runner()
+
+    result = runner.invoke(args=['move-user-shard', str(user_id), PRIMARY_SHARD, '--settle', '0'])
+    assert f"Moved 1 tasks of user {user_id} to primary." in result.output
+    assert 'primary: 1 users, 1 tasks' in runner.invoke(args=['shard-stats']).output
+
+    assert '1 users would move.' in runner.invoke(args=['rebalance-shards', '--dry-run']).output
+    assert 'Moved 1 tasks of 1 users.' in runner.invoke(args=['rebalance-shards', '--settle', '0']).output
+    assert f'{home}: 1 users, 1 tasks' in runner.invoke(args=['shard-stats']).output
+    assert 'Unknown shard: north' in runner.invoke(args=['move-user-shard', str(user_id), 'north']).output
+
+def test_maintenance_commands_reach_every_shard(sharded_app, sign_in):
+    """Test that stats, tombstone and search index maintenance run on the shards too"""
+    client = sharded_app.test_client()
+    router = sharded_app.extensions['shards']
+    user_id, headers = signed_in_user(sign_in, sharded_app, 'maintained')
+    kept = client.post('/api/tasks', json={'title': 'Kept task'}, headers=headers).json['task']
+    dropped = client.post('/api/tasks', json={'title': 'Dropped task'}, headers=headers).json['task']
+    client.delete(f"/api/tasks/{dropped['id']}", headers=headers)
+    engine = router.engine(router.home_shard(user_id))
+    with engine.begin() as connection:
+        connection.execute(update(UserTaskState).where(UserTaskState.user_id == user_id).values(task_count=7))
+        connection.execute(text("DELETE FROM tasks_fts"))
+    runner = sharded_app.test_cli_runner()
+
+    assert 'Rebuilt task stats for 1 users.' in runner.invoke(args=['rebuild-task-stats']).output
+    assert client.get('/api/tasks/stats', headers=headers).json['stats']['total'] == 1
+
+    assert 'Pruned 1 tombstones for 1 users.' in runner.invoke(args=['prune-tombstones', '--days', '-1']).output
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(TaskTombstone)).scalar() == 0
+
+    runner.invoke(args=['rebuild-search-index'])
+    tasks = client.get('/api/tasks?search=kept', headers=headers).json['tasks']
+    assert [task['id'] for task in tasks] == [kept['id']]
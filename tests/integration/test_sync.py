@@ -0,0 +1,78 @@
+from src.models import Task, TaskTombstone, UserTaskState
+
+def test_changes_snapshot_then_delta(client, auth_headers, test_tasks):
+    """Test a full snapshot followed by an incremental sync"""
+    response = client.get('/api/tasks/changes', headers=auth_headers)
+
+    assert response.status_code == 200
+    snapshot = response.get_json()
+    assert len(snapshot['tasks']) == 3
+    assert snapshot['deleted'] == []
+    assert snapshot['has_more'] is False
+
+    response = client.get(f"/api/tasks/changes?since={snapshot['watermark']}", headers=auth_headers)
+    assert response.get_json()['tasks'] == []
+
+    client.put(f'/api/tasks/{test_tasks[0].id}', json={'title': 'Edited'}, headers=auth_headers)
+    client.delete(f'/api/tasks/{test_tasks[1].id}', headers=auth_headers)
+    created = client.post('/api/tasks', json={'title': 'Fresh'}, headers=auth_headers).get_json()['task']
+
+    response = client.get(f"/api/tasks/changes?since={snapshot['watermark']}", headers=auth_headers)
+    delta = response.get_json()
+
+    assert [task['id'] for task in delta['tasks']] == [test_tasks[0].id, created['id']]
+    assert delta['tasks'][0]['title'] == 'Edited'
+    assert [tombstone['id'] for tombstone in delta['deleted']] == [test_tasks[1].id]
+
+    response = client.get(f"/api/tasks/changes?since={delta['watermark']}", headers=auth_headers)
+    caught_up = response.get_json()
+    assert caught_up['tasks'] == [] and caught_up['deleted'] == []
+
+def test_changes_paging(client, auth_headers, test_tasks):
+    """Test walking the change stream in small pages"""
+    seen = []
+    watermark = ''
+    while True:
+        response = client.get(f'/api/tasks/changes?limit=2&since={watermark}', headers=auth_headers)
+        data = response.get_json()
+        seen.extend(task['id'] for task in data['tasks'])
+        watermark = data['watermark']
+        if not data['has_more']:
+            break
+
+    assert sorted(seen) == sorted(task.id for task in test_tasks)
+
+def test_batch_assigns_one_sequence_per_operation(client, auth_headers, test_tasks):
+    """Test that batched writes get distinct change sequence numbers"""
+    base = UserTaskState.query.get(test_tasks[0].user_id).version
+    response = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'A'}},
+        {'op': 'update', 'id': test_tasks[0].id, 'data': {'title': 'B'}},
+        {'op': 'delete', 'id': test_tasks[1].id},
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+
+    user_id = test_tasks[0].user_id
+    created_id = response.get_json()['results'][0]['task']['id']
+    tombstone = TaskTombstone.query.filter_by(task_id=test_tasks[1].id).one()
+
+    assert UserTaskState.query.get(user_id).version == base + 3
+    assert Task.query.get(created_id).change_seq == base + 1
+    assert Task.query.get(test_tasks[0].id).change_seq == base + 2
+    assert tombstone.change_seq == base + 3
+
+def test_changes_invalid_watermark(client, auth_headers):
+    """Test rejecting malformed watermarks"""
+    response = client.get('/api/tasks/changes?since=garbage', headers=auth_headers)
+    assert response.status_code == 400
+
+def test_pruned_watermark_requires_resync(app, client, auth_headers, test_tasks, runner):
+    """Test that syncing from before pruned tombstones answers 410"""
+    old_watermark = client.get('/api/tasks/changes', headers=auth_headers).get_json()['watermark']
+    client.delete(f'/api/tasks/{test_tasks[0].id}', headers=auth_headers)
+
+    result = runner.invoke(args=['prune-tombstones', '--days', '-1'])
+    assert 'Pruned 1 tombstones' in result.output
+
+    response = client.get(f'/api/tasks/changes?since={old_watermark}', headers=auth_headers)
+    assert response.status_code == 410
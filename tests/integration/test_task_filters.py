@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, inspect, text
+from werkzeug.datastructures import MultiDict
+
+from src.database import db
+from src.models import Task
+from src.tasks import list_tasks
+
+@pytest.fixture
+def dated_tasks(db_session, test_user_with_password):
+    """Tasks with due dates in the past and future, one completed and one without a due date"""
+    now = datetime.utcnow()
+    specs = [
+        ('Pay rent', now - timedelta(days=3), False),
+        ('Call bank', now - timedelta(days=1), False),
+        ('Archive mail', now - timedelta(days=2), True),
+        ('Buy milk', now + timedelta(days=1), False),
+        ('Dentist', now + timedelta(days=10), False),
+        ('Someday', None, False),
+    ]
+    tasks = [Task(title=title, due_date=due_date, is_completed=completed, user_id=test_user_with_password.id)
+             for title, due_date, completed in specs]
+    db_session.add_all(tasks)
+    db_session.commit()
+    return tasks
+
+def titles(response):
+    assert response.status_code == 200, response.get_json()
+    return [task['title'] for task in response.get_json()['tasks']]
+
+def test_filter_by_due_date_range(client, auth_headers, dated_tasks):
+    """Test that due date ranges return matching tasks ordered by due date"""
+    due_after = (datetime.utcnow() - timedelta(days=2, hours=12)).isoformat()
+    due_before = (datetime.utcnow() + timedelta(days=2)).isoformat() + 'Z'
+
+    response = client.get(f'/api/tasks?due_after={due_after}&due_before={due_before}', headers=auth_headers)
+    assert titles(response) == ['Archive mail', 'Call bank', 'Buy milk']
+
+    response = client.get(f'/api/tasks?due_after={due_after}&sort=-due_date', headers=auth_headers)
+    assert titles(response) == ['Dentist', 'Buy milk', 'Call bank', 'Archive mail']
+
+    response = client.get('/api/tasks?due_before=yesterday', headers=auth_headers)
+    assert response.status_code == 400
+    assert 'due_before' in response.get_json()['error']
+
+def test_overdue_tasks(client, auth_headers, dated_tasks):
+    """Test that overdue lists only open tasks past their due date, and carry no ETag"""
+    response = client.get('/api/tasks?overdue=true', headers=auth_headers)
+
+    assert titles(response) == ['Pay rent', 'Call bank']
+    assert 'ETag' not in response.headers
+    assert client.get('/api/tasks?overdue=true&completed=true', headers=auth_headers).status_code == 400
+
+def test_offset_due_dates_are_stored_as_utc(client, auth_headers, dated_tasks):
+    """Test that a due date written with an offset is filtered by its UTC instant"""
+    # Two hours from now in UTC, written as a +02:00 wall clock four hours from now
+    due = datetime.utcnow() + timedelta(hours=2)
+    local = (due + timedelta(hours=2)).replace(microsecond=0).isoformat() + '+02:00'
+    response = client.post('/api/tasks', json={'title': 'Offset', 'due_date': local}, headers=auth_headers)
+    assert response.status_code == 201
+    task = response.get_json()['task']
+    assert task['due_date'] == due.replace(microsecond=0).isoformat()
+
+    due_before = (datetime.utcnow() + timedelta(hours=3)).isoformat() + 'Z'
+    response = client.get(f'/api/tasks?due_after={datetime.utcnow().isoformat()}&due_before={due_before}',
+                          headers=auth_headers)
+    assert titles(response) == ['Offset']
+
+    assert 'Offset' not in titles(client.get('/api/tasks?overdue=true', headers=auth_headers))
+
+    # An hour from now on a +02:00 clock is an hour ago in UTC, so the task is overdue
+    ahead = (datetime.utcnow() + timedelta(hours=1)).replace(microsecond=0).isoformat() + '+02:00'
+    response = client.put(f"/api/tasks/{task['id']}", json={'due_date': ahead}, headers=auth_headers)
+    assert response.status_code == 200
+    assert titles(client.get('/api/tasks?overdue=true', headers=auth_headers)) == ['Pay rent', 'Call bank', 'Offset']
+
+def test_sort_by_several_fields_with_cursor(client, auth_headers, dated_tasks):
+    """Test paging through a multi-key sort, with tasks without a due date last"""
+    seen, cursor = [], ''
+    while True:
+        page = client.get(f'/api/tasks?sort=due_date,title&limit=2{cursor}', headers=auth_headers).get_json()
+        seen.extend(task['title'] for task in page['tasks'])
+        if page['next_cursor'] is None:
+            break
+        cursor = f"&cursor={page['next_cursor']}"
+
+    assert seen == ['Pay rent', 'Archive mail', 'Call bank', 'Buy milk', 'Dentist', 'Someday']
+
+    response = client.get('/api/tasks?sort=-title&limit=3', headers=auth_headers)
+    assert titles(response) == ['Someday', 'Pay rent', 'Dentist']
+
+@pytest.mark.parametrize('sort, expected', [
+    ('due_date', ['Pay rent', 'Archive mail', 'Call bank', 'Buy milk', 'Dentist', 'Someday', 'Whenever']),
+    ('-due_date', ['Dentist', 'Buy milk', 'Call bank', 'Archive mail', 'Pay rent', 'Whenever', 'Someday']),
+])
+def test_sorting_by_due_date_keeps_undated_tasks(client, auth_headers, dated_tasks, sort, expected):
+    """Test that sorting by due date returns every task, those without one last in either direction"""
+    client.post('/api/tasks', json={'title': 'Whenever'}, headers=auth_headers)
+
+    assert titles(client.get(f'/api/tasks?sort={sort}', headers=auth_headers)) == expected
+
+    seen, cursor = [], ''
+    while True:
+        page = client.get(f'/api/tasks?sort={sort}&limit=2{cursor}', headers=auth_headers).get_json()
+        seen.extend(task['title'] for task in page['tasks'])
+        if page['next_cursor'] is None:
+            break
+        cursor = f"&cursor={page['next_cursor']}"
+    assert seen == expected
+
+def test_updated_since(client, auth_headers, dated_tasks):
+    """Test that updated_since returns tasks changed at or after the given time, oldest change first"""
+    since = datetime.utcnow().isoformat()
+    client.put(f'/api/tasks/{dated_tasks[4].id}', json={'is_completed': True}, headers=auth_headers)
+    client.put(f'/api/tasks/{dated_tasks[0].id}', json={'title': 'Pay rent now'}, headers=auth_headers)
+
+    response = client.get(f'/api/tasks?updated_since={since}', headers=auth_headers)
+    assert titles(response) == ['Dentist', 'Pay rent now']
+
+@pytest.mark.parametrize('query, message', [
+    ('sort=created_at&due_before=2030-01-01', 'requires sort=due_date'),
+    ('sort=title,-due_date', 'must all be ascending or all descending'),
+    ('sort=title&completed=true', 'not supported with filters on is_completed'),
+    ('due_after=2020-01-01&updated_since=2020-01-01', 'not both'),
+    ('sort=priority', 'Unknown sort field'),
+    ('search=rent&sort=title', 'ordered by relevance'),
+])
+def test_unindexed_combinations_are_rejected(client, auth_headers, query, message):
+    """Test that filters and sorts no index serves are refused instead of scanning"""
+    response = client.get(f'/api/tasks?{query}', headers=auth_headers)
+
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
+
+@pytest.mark.parametrize('args', [
+    {},
+    {'completed': 'false'},
+    {'sort': 'title'},
+    {'sort': '-due_date,-title'},
+    {'sort': 'due_date', 'cursor': 'WzAsIjIwMjAtMDEtMDFUMDA6MDA6MDAiLCJhIiwxXQ'},
+    {'sort': 'due_date', 'cursor': 'WzEsbnVsbCwiYSIsMV0'},
+    {'due_after': '2020-01-01', 'due_before': '2030-01-01'},
+    {'overdue': 'true'},
+    {'completed': 'true', 'sort': 'due_date'},
+    {'updated_since': '2020-01-01'},
+    {'sort': 'title', 'cursor': 'WyJhIiwxXQ'},
+])
+def test_list_queries_are_served_by_an_index(app, db_session, test_user_with_password, args):
+    """Test that SQLite seeks an index for every statement of a supported query, without scanning or sorting"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        list_tasks(db_session, test_user_with_password.id, MultiDict(args), 20, 100)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    statements = [(statement, parameters) for statement, parameters in statements if 'FROM tasks' in statement]
+    assert statements
+    for statement, parameters in statements:
+        plan = ' '.join(row[-1] for row in db_session.connection().exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {statement}', parameters
+        ))
+        assert 'USING INDEX ix_tasks_user_' in plan
+        assert 'TEMP B-TREE' not in plan and 'SCAN' not in plan
+
+def test_create_task_indexes_command(make_app):
+    """Test that databases created before the list indexes get them, and lose the replaced one"""
+    app = make_app()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP INDEX ix_tasks_user_title"))
+            connection.execute(text("CREATE INDEX ix_tasks_user_due_date ON tasks (user_id, due_date)"))
+
+    runner = app.test_cli_runner()
+    assert 'primary: created ix_tasks_user_title.' in runner.invoke(args=['create-task-indexes']).output
+    assert 'primary: created no indexes.' in runner.invoke(args=['create-task-indexes']).output
+
+    with app.app_context():
+        names = {index['name'] for index in inspect(db.engine).get_indexes('tasks')}
+    assert 'ix_tasks_user_title' in names and 'ix_tasks_user_due_date' not in names
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from src.models import TaskDueBucket, UserTaskState
+from src.stats import task_stats, rebuild_task_stats
+
+def iso(days):
+    return (datetime.utcnow() + timedelta(days=days)).isoformat()
+
+def test_stats_follow_task_writes(client, auth_headers, db_session):
+    """Test that the counters track create, update and delete"""
+    response = client.get('/api/tasks/stats', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['stats']['total'] == 0
+
+    overdue = client.post('/api/tasks', json={'title': 'Late', 'due_date': iso(-3)}, headers=auth_headers).get_json()['task']
+    client.post('/api/tasks', json={'title': 'Soon', 'due_date': iso(5)}, headers=auth_headers)
+    client.post('/api/tasks', json={'title': 'Someday'}, headers=auth_headers)
+    done = client.post('/api/tasks', json={'title': 'Done', 'is_completed': True, 'due_date': iso(-1)},
+                       headers=auth_headers).get_json()['task']
+
+    stats = client.get('/api/tasks/stats', headers=auth_headers).get_json()['stats']
+    assert stats == {'total': 4, 'completed': 1, 'pending': 3, 'overdue': 1,
+                     'due_today': 0, 'upcoming': 1, 'no_due_date': 1}
+
+    client.put(f"/api/tasks/{overdue['id']}", json={'is_completed': True}, headers=auth_headers)
+    client.delete(f"/api/tasks/{done['id']}", headers=auth_headers)
+
+    stats = client.get('/api/tasks/stats', headers=auth_headers).get_json()['stats']
+    assert stats['total'] == 3 and stats['completed'] == 1 and stats['overdue'] == 0
+
+def test_stats_follow_batches(client, auth_headers, test_tasks, db_session):
+    """Test that batch writes keep the counters in line with a full rebuild"""
+    user_id = test_tasks[0].user_id
+    rebuild_task_stats(db_session, user_id)
+    db_session.commit()
+
+    response = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'New', 'due_date': iso(-2)}},
+        {'op': 'update', 'id': test_tasks[0].id, 'data': {'is_completed': False, 'due_date': iso(-1)}},
+        {'op': 'delete', 'id': test_tasks[1].id},
+    ]}, headers=auth_headers)
+    assert response.get_json()['succeeded'] == 3
+
+    maintained = client.get('/api/tasks/stats', headers=auth_headers).get_json()['stats']
+    rebuild_task_stats(db_session, user_id)
+    assert task_stats(db_session, user_id) == maintained
+    assert maintained['total'] == 3 and maintained['overdue'] == 2
+
+def test_rebuild_command(runner, client, auth_headers, test_tasks, db_session):
+    """Test that the rebuild command restores counters that drifted from the tasks"""
+    db_session.execute(delete(UserTaskState))
+    db_session.execute(delete(TaskDueBucket))
+    db_session.commit()
+    assert client.get('/api/tasks/stats', headers=auth_headers).get_json()['stats']['total'] == 0
+
+    result = runner.invoke(args=['rebuild-task-stats'])
+    assert 'Rebuilt task stats' in result.output
+
+    stats = client.get('/api/tasks/stats', headers=auth_headers).get_json()['stats']
+    assert stats['total'] == 3
+    assert stats['completed'] == 2
+    assert stats['upcoming'] == 1
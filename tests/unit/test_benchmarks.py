@@ -0,0 +1,32 @@
+from src.app import create_app
+from benchmarks.bench_api import run_benchmark
+from benchmarks.report import compare_reports, percentile, summarize
+
+def test_percentile_nearest_rank():
+    """Test percentiles on a known distribution"""
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.95) == 0.0
+
+def test_compare_reports_flags_slower_median():
+    """Test that a slower median or new errors count as a regression"""
+    baseline = {'scenarios': {'list': summarize([0.002] * 10, 0, 0.02)}}
+    current = {'scenarios': {'list': summarize([0.003] * 10, 1, 0.03)}}
+
+    assert compare_reports(baseline, baseline, 0.2) == []
+    assert len(compare_reports(current, baseline, 0.2)) == 2
+    assert compare_reports(current, baseline, 1.0) == ['list: 0 errors -> 1 errors']
+
+def test_run_benchmark_smoke():
+    """Test a tiny run of every scenario against an in-memory database"""
+    app = create_app('testing')
+
+    report = run_benchmark(app, 'small', 'wsgi', iterations=3, auth_iterations=1, warmup=1)
+
+    assert list(report['scenarios']) == ['register', 'login', 'list', 'search', 'create', 'update', 'delete']
+    assert all(result['errors'] == 0 for result in report['scenarios'].values())
+    assert report['scenarios']['list']['requests'] == 3
+    peaks = [result['peak_rss_bytes'] for result in report['scenarios'].values()]
+    if report['peak_rss_bytes'] is not None:
+        assert peaks == sorted(peaks) and peaks[-1] <= report['peak_rss_bytes']
@@ -0,0 +1,125 @@
+import gzip
+import pytest
+from flask import Flask, Response, jsonify
+
+from src.config import TestingConfig
+from src import compression
+from src.compression import Compressor, CompressedCache, init_compression
+
+BIG = {'tasks': [{'description': 'x' * 200, 'id': i} for i in range(20)]}
+
+@pytest.fixture
+def make_app():
+    def factory(**overrides):
+        app = Flask(__name__)
+        app.config.from_object(TestingConfig)
+        app.config.update(overrides)
+        init_compression(app)
+
+        @app.route('/big')
+        def big():
+            response = jsonify(BIG)
+            response.set_etag('abc')
+            return response
+
+        @app.route('/small')
+        def small():
+            return jsonify({'ok': True})
+
+        @app.route('/stream')
+        def stream():
+            return Response((f"data: {i}\n\n" for i in range(3)), mimetype='text/event-stream')
+
+        return app
+    return factory
+
+def test_gzip_above_threshold(make_app):
+    """Test that large responses are gzipped and small ones left alone"""
+    client = make_app(COMPRESSION_ALGORITHMS='gzip').test_client()
+
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == '"abc-gzip"'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'"description"' in gzip.decompress(response.data)
+
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+    response = client.get('/big')
+    assert 'Content-Encoding' not in response.headers
+
+def test_negotiation_prefers_configured_order(make_app):
+    """Test that the first configured encoding the client accepts wins"""
+    client = make_app(COMPRESSION_ALGORITHMS='zstd,br,gzip').test_client()
+
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == ('br' if compression.brotli else 'gzip')
+
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip, br;q=0'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+@pytest.mark.skipif(compression.zstandard is None, reason="zstandard is not installed")
+def test_zstd_round_trip(make_app):
+    """Test zstd output decodes back to the JSON body"""
+    client = make_app().test_client()
+
+    response = client.get('/big', headers={'Accept-Encoding': 'zstd'})
+    assert response.headers['Content-Encoding'] == 'zstd'
+    assert b'"description"' in compression.zstandard.ZstdDecompressor().decompressobj().decompress(response.data)
+
+def test_streaming_responses_flush_per_chunk(make_app):
+    """Test that streamed responses are compressed chunk by chunk"""
+    client = make_app(COMPRESSION_ALGORITHMS='gzip').test_client()
+
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
+
+def test_internal_callers_get_fast_level(make_app):
+    """Test that callers from internal networks get the internal level or no compression"""
+    app = make_app(COMPRESSION_ALGORITHMS='gzip', COMPRESSION_INTERNAL_NETWORKS='10.0.0.0/8')
+    compressor = app.extensions['compressor']
+    with app.test_request_context('/big', headers={'Accept-Encoding': 'gzip'}, environ_base={'REMOTE_ADDR': '10.1.2.3'}):
+        assert compressor.select_encoder().level == 1
+    with app.test_request_context('/big', headers={'Accept-Encoding': 'gzip'}, environ_base={'REMOTE_ADDR': '8.8.8.8'}):
+        assert compressor.select_encoder().level == app.config['COMPRESSION_GZIP_LEVEL']
+
+    client = make_app(COMPRESSION_INTERNAL_NETWORKS='127.0.0.0/8', COMPRESSION_INTERNAL_LEVEL=0).test_client()
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+def test_compressed_bodies_are_cached(make_app, monkeypatch):
+    """Test that a body with an unchanged ETag is compressed only once"""
+    app = make_app(COMPRESSION_ALGORITHMS='gzip')
+    encoder = app.extensions['compressor'].encoders['gzip']
+    calls = []
+    original = encoder.compress
+    monkeypatch.setattr(encoder, 'compress', lambda data: calls.append(1) or original(data))
+
+    client = app.test_client()
+    first = client.get('/big', headers={'Accept-Encoding': 'gzip'}).data
+    second = client.get('/big', headers={'Accept-Encoding': 'gzip'}).data
+
+    assert first == second
+    assert len(calls) == 1
+
+def test_cache_evicts_by_size():
+    """Test that the cache stays within its byte budget"""
+    cache = CompressedCache(max_bytes=10)
+    cache.put('a', b'12345')
+    cache.put('b', b'12345')
+    cache.put('c', b'12345')
+
+    assert cache.get('a') is None
+    assert cache.get('c') == b'12345'
+    cache.put('huge', b'x' * 11)
+    assert cache.get('huge') is None
+
+def test_unknown_algorithm_rejected():
+    """Test that a typo in COMPRESSION_ALGORITHMS fails at startup"""
+    config = {name: getattr(TestingConfig, name) for name in dir(TestingConfig) if name.isupper()}
+    config['COMPRESSION_ALGORITHMS'] = 'gzip,lz4'
+    with pytest.raises(ValueError):
+        Compressor(config)
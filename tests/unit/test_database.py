@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import create_engine, text
+from src.config import Config, TestingConfig
+from src.database import (
+    db, build_engine_options, create_replica_engines, sqlite_pragmas, TimedQueuePool, POOL_WAIT_SECONDS
+)
+
+def settings(config_class, **overrides):
+    values = {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+    values.update(overrides)
+    return values
+
+def test_engine_options_for_file_database():
+    """Test pool options for a file based database"""
+    options = build_engine_options(settings(Config, SQLALCHEMY_DATABASE_URI='sqlite:///tasks.db'))
+
+    assert options['poolclass'] is TimedQueuePool
+    assert options['pool_size'] == Config.DB_POOL_SIZE
+    assert options['max_overflow'] == Config.DB_MAX_OVERFLOW
+    assert options['pool_pre_ping'] is True
+    assert 'connect_args' not in options
+
+def test_engine_options_for_memory_database():
+    """Test that in-memory SQLite keeps its single shared connection"""
+    assert build_engine_options(settings(TestingConfig)) == {}
+
+def test_engine_options_statement_timeout_and_overrides():
+    """Test the Postgres statement timeout and explicit overrides"""
+    options = build_engine_options(settings(
+        Config,
+        SQLALCHEMY_DATABASE_URI='postgresql://user:pw@localhost/tasks',
+        DB_STATEMENT_TIMEOUT_MS=2500,
+        SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 42}
+    ))
+
+    assert options['connect_args'] == {'options': '-c statement_timeout=2500'}
+    assert options['pool_size'] == 42
+
+def test_replica_engines():
+    """Test that each replica URL gets an engine with the primary's pool options and pragmas"""
+    replicas = create_replica_engines(settings(
+        Config, DATABASE_REPLICA_URLS='sqlite:///replica-a.db, sqlite:///replica-b.db', SQLITE_CACHE_SIZE=-1000
+    ))
+
+    assert [str(engine.url) for engine in replicas] == ['sqlite:///replica-a.db', 'sqlite:///replica-b.db']
+    assert isinstance(replicas[0].pool, TimedQueuePool)
+    assert replicas[0].pool.size() == Config.DB_POOL_SIZE
+    assert create_replica_engines(settings(Config)) == []
+
+def test_sqlite_pragmas_validation():
+    """Test that unknown pragma values are rejected"""
+    with pytest.raises(ValueError):
+        sqlite_pragmas(settings(Config, SQLITE_JOURNAL_MODE='WAL; DROP TABLE users'))
+
+def test_sqlite_pragmas_applied_on_connect(app):
+    """Test that connections are tuned by the connect hook"""
+    with app.app_context():
+        with db.engine.connect() as connection:
+            assert connection.execute(text("PRAGMA busy_timeout")).scalar() == Config.SQLITE_BUSY_TIMEOUT_MS
+            assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+
+def test_pool_checkout_wait_is_recorded(tmp_path):
+    """Test that pool checkouts feed the wait time histogram"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool)
+    before = POOL_WAIT_SECONDS.count()
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert POOL_WAIT_SECONDS.count() == before + 1
+    engine.dispose()
@@ -0,0 +1,73 @@
+import threading
+import pytest
+from src.events import EventBus, InProcessBackend, create_backend
+
+def test_publish_reaches_subscribers():
+    """Test that subscribers receive events for their channel only"""
+    bus = EventBus(InProcessBackend())
+
+    with bus.subscribe(1) as mine, bus.subscribe(2) as other:
+        bus.publish(1, 'task.created', 1, {'id': 10})
+
+        assert mine.get(timeout=1) == {'type': 'task.created', 'seq': 1, 'task': {'id': 10}}
+        assert other.get(timeout=0) is None
+
+def test_subscriber_wakes_on_publish_from_other_thread():
+    """Test that a waiting subscriber is woken by a publish"""
+    bus = EventBus(InProcessBackend())
+
+    with bus.subscribe(1) as subscription:
+        threading.Timer(0.05, bus.publish, args=(1, 'task.deleted', 4, {'id': 3})).start()
+        event = subscription.get(timeout=2)
+
+    assert event['seq'] == 4
+
+def test_history_replay_is_bounded_and_ordered():
+    """Test replaying buffered events in sequence order"""
+    bus = EventBus(InProcessBackend(history_size=3))
+    for seq in (2, 1, 3, 4):
+        bus.publish(1, 'task.updated', seq, {'id': seq})
+
+    assert [event['seq'] for event in bus.events_after(1, 0)] == [1, 3, 4]
+    assert [event['seq'] for event in bus.events_after(1, 3)] == [4]
+
+def test_history_is_kept_for_recent_channels_only(monkeypatch):
+    """Test that replay history is capped by channel count and dropped for idle channels"""
+    clock = [1000.0]
+    monkeypatch.setattr('src.events.time.monotonic', lambda: clock[0])
+    bus = EventBus(InProcessBackend(max_channels=2, history_ttl=60))
+    for user_id in (1, 2, 3):
+        bus.publish(user_id, 'task.created', 1, {'id': user_id})
+
+    assert bus.events_after(1, 0) == []
+    assert [event['task']['id'] for event in bus.events_after(3, 0)] == [3]
+
+    clock[0] += 30
+    bus.publish(3, 'task.updated', 2, {'id': 3})
+    clock[0] += 45
+    assert bus.events_after(2, 0) == []
+    assert [event['seq'] for event in bus.events_after(3, 0)] == [1, 2]
+
+    bus.publish(4, 'task.created', 1, {'id': 4})
+    assert list(bus.backend._history) == ['tasks:3', 'tasks:4']
+
+def test_unsubscribe_cleans_up():
+    """Test that closed subscriptions stop receiving events"""
+    backend = InProcessBackend()
+    subscription = backend.subscribe('tasks:1')
+    subscription.close()
+    backend.publish('tasks:1', {'seq': 1})
+
+    assert subscription.get(timeout=0) is None
+
+def test_unknown_backend_rejected():
+    """Test that a misconfigured backend name fails loudly"""
+    with pytest.raises(ValueError):
+        create_backend({'EVENT_BUS_BACKEND': 'carrier-pigeon', 'EVENT_BUS_HISTORY_SIZE': 10})
+
+def test_redis_backend_needs_the_redis_package(monkeypatch):
+    """Test that choosing the redis backend without the package fails at startup with a clear message"""
+    monkeypatch.setattr('src.events.redis', None)
+    with pytest.raises(ValueError, match='needs the redis package'):
+        create_backend({'EVENT_BUS_BACKEND': 'redis', 'EVENT_BUS_URL': 'redis://localhost:6379/0',
+                        'EVENT_BUS_HISTORY_SIZE': 10})
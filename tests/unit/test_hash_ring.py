@@ -0,0 +1,29 @@
+from collections import Counter
+
+import pytest
+
+from src.sharding import HashRing
+
+def test_ring_is_deterministic_and_spreads_keys():
+    """Test that keys always map to the same node and every node gets a fair share"""
+    ring = HashRing(['east', 'west', 'north'])
+    placements = Counter(ring.node_for(user_id) for user_id in range(3000))
+
+    assert [HashRing(['north', 'west', 'east']).node_for(user_id) for user_id in range(100)] == \
+        [ring.node_for(user_id) for user_id in range(100)]
+    assert set(placements) == {'east', 'west', 'north'}
+    assert min(placements.values()) > 600
+
+def test_adding_a_node_moves_only_its_share():
+    """Test that a new node takes keys from the others without reshuffling the rest"""
+    before = HashRing(['east', 'west', 'north'])
+    after = HashRing(['east', 'west', 'north', 'south'])
+    moved = [user_id for user_id in range(4000) if before.node_for(user_id) != after.node_for(user_id)]
+
+    assert all(after.node_for(user_id) == 'south' for user_id in moved)
+    assert 600 < len(moved) < 1500
+
+def test_ring_needs_a_node():
+    """Test that an empty ring is rejected"""
+    with pytest.raises(ValueError):
+        HashRing([])
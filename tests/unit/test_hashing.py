@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+from src.hashing import PasswordHasher, HashingBusyError
+from src.auth import authenticate_user
+from src.models import User
+
+def test_hasher_inline_roundtrip():
+    """Test hashing and verifying without a pool"""
+    hasher = PasswordHasher(workers=0)
+    pwhash = hasher.hash("secret123")
+
+    assert pwhash.startswith("scrypt:32768:8:1$")
+    assert hasher.verify(pwhash, "secret123") is True
+    assert hasher.verify(pwhash, "wrong") is False
+    assert hasher.needs_rehash(pwhash) is False
+
+def test_hasher_process_pool_roundtrip():
+    """Test hashing on the worker process pool"""
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1, max_pending=2)
+    try:
+        pwhash = hasher.hash("secret123")
+        assert hasher.verify(pwhash, "secret123") is True
+    finally:
+        hasher.shutdown()
+
+def test_hasher_rejects_when_saturated():
+    """Test the fast failure when no pool slot is free"""
+    hasher = PasswordHasher(workers=1, max_pending=0)
+
+    with pytest.raises(HashingBusyError):
+        hasher.hash("secret123")
+
+def test_needs_rehash_on_parameter_change():
+    """Test detecting hashes made with other KDF parameters"""
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", salt_length=16)
+
+    assert hasher.needs_rehash(generate_password_hash("pw", "pbkdf2:sha256:1000", 16)) is False
+    assert hasher.needs_rehash(generate_password_hash("pw", "pbkdf2:sha256:2000", 16)) is True
+    assert hasher.needs_rehash(generate_password_hash("pw", "pbkdf2:sha256:1000", 8)) is True
+
+def test_short_method_names_do_not_need_rehash():
+    """Test that hashes made with a method name werkzeug expands are not rehashed on every login"""
+    for method in ("scrypt", "pbkdf2:sha256"):
+        hasher = PasswordHasher(method=method)
+
+        assert hasher.needs_rehash(hasher.hash("pw")) is False
+        assert hasher.needs_rehash(generate_password_hash("pw", method, 16)) is False
+
+def test_timed_out_hash_keeps_its_slot_until_done():
+    """Test that a timed out KDF still counts against max_pending while it runs"""
+    hasher = PasswordHasher(method="pbkdf2:sha256:600000", workers=1, max_pending=1, timeout=0.01)
+    try:
+        with pytest.raises(HashingBusyError, match="timed out"):
+            hasher.hash("secret123")
+        with pytest.raises(HashingBusyError, match="saturated"):
+            hasher.hash("secret123")
+
+        deadline = time.monotonic() + 30
+        while not hasher._slots.acquire(blocking=False):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        hasher._slots.release()
+    finally:
+        hasher.shutdown()
+
+def test_login_upgrades_outdated_hash(db_session):
+    """Test that a successful login rehashes with the current parameters"""
+    user = User(username="legacy_hash", password_hash=generate_password_hash("password123", "pbkdf2:sha256:1000"))
+    db_session.add(user)
+    db_session.commit()
+
+    assert authenticate_user("legacy_hash", "password123") is not None
+    assert user.password_hash.startswith("scrypt:32768:8:1$")
+    assert user.check_password("password123") is True
+
+def test_login_returns_503_when_hashing_saturated(app, client, test_user_with_password):
+    """Test that a saturated hashing pool answers quickly with 503"""
+    original = app.extensions['password_hasher']
+    app.extensions['password_hasher'] = PasswordHasher(workers=1, max_pending=0)
+    try:
+        response = client.post('/api/login', json={
+            'username': test_user_with_password.username,
+            'password': 'password123'
+        })
+    finally:
+        app.extensions['password_hasher'] = original
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
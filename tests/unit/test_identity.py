@@ -0,0 +1,49 @@
+import pytest
+from src.identity import IdentityCache, get_identity_cache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_identity_cache_ttl():
+    """Test that cached identities expire after the TTL"""
+    clock = FakeClock()
+    cache = IdentityCache(maxsize=10, ttl=30, clock=clock)
+
+    cache.add(1)
+    assert 1 in cache
+
+    clock.now = 31
+    assert 1 not in cache
+    assert len(cache) == 0
+
+def test_identity_cache_lru_eviction():
+    """Test that the least recently used identity is evicted first"""
+    cache = IdentityCache(maxsize=2, ttl=60)
+
+    cache.add(1)
+    cache.add(2)
+    assert 1 in cache
+    cache.add(3)
+
+    assert 1 in cache
+    assert 2 not in cache
+    assert 3 in cache
+
+def test_identity_cache_invalidated_on_user_delete(app, client, auth_headers, test_user_with_password, db_session):
+    """Test that deleting a user drops it from the cache"""
+    response = client.get('/api/tasks', headers=auth_headers)
+    assert response.status_code == 200
+
+    cache = get_identity_cache()
+    assert test_user_with_password.id in cache
+
+    db_session.delete(test_user_with_password)
+    db_session.commit()
+
+    assert test_user_with_password.id not in cache
+    response = client.get('/api/tasks', headers=auth_headers)
+    assert response.status_code == 404
@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from src.config import ProductionConfig, TestingConfig
+from src.instrumentation import (
+    RequestTimings, QueryBudgetExceeded, SamplingProfiler, phase, query_budget, check_query_budget,
+    init_instrumentation
+)
+from src.metrics import MetricsRegistry, render_prometheus
+
+def test_render_prometheus():
+    """Test the text exposition format for counters and histograms"""
+    metrics = MetricsRegistry()
+    metrics.counter('jobs_total', 'Jobs run').inc(2, queue='de"fault')
+    metrics.histogram('job_seconds', 'Job time', buckets=(0.1, 1.0)).observe(0.5)
+
+    text = render_prometheus(metrics)
+
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{queue="de\\"fault"} 2' in text
+    assert 'job_seconds_bucket{le="0.1"} 0' in text
+    assert 'job_seconds_bucket{le="1.0"} 1' in text
+    assert 'job_seconds_bucket{le="+Inf"} 1' in text
+    assert 'job_seconds_count 1' in text
+
+def test_phase_outside_request_is_noop():
+    """Test that phases can wrap shared code that also runs without a request"""
+    with phase('to_dict'):
+        value = 1
+    assert value == 1
+
+def test_profiler_writes_folded_stacks_for_slow_requests(tmp_path):
+    """Test that slow requests leave a flamegraph-ready stack file"""
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config.update(PROFILER_ENABLED=True, PROFILER_SLOW_MS=20, PROFILER_INTERVAL_MS=1,
+                      PROFILER_OUTPUT_DIR=str(tmp_path))
+    init_instrumentation(app)
+
+    def slow_handler():
+        time.sleep(0.1)
+        return jsonify({})
+
+    app.add_url_rule('/slow', 'slow', slow_handler)
+    app.add_url_rule('/fast', 'fast', lambda: jsonify({}))
+
+    client = app.test_client()
+    client.get('/fast')
+    assert list(tmp_path.iterdir()) == []
+
+    response = client.get('/slow')
+    assert response.headers['Server-Timing'].startswith('total;dur=')
+
+    [profile] = tmp_path.iterdir()
+    assert '-slow-' in profile.name
+    lines = profile.read_text().splitlines()
+    assert any('slow_handler' in line for line in lines)
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0 and ';' in stack
+
+def test_profiler_starts_one_sampler_per_process():
+    """Test that concurrent first requests don't start duplicate sampler threads"""
+    profiler = SamplingProfiler('unused', threshold=1, interval=0.01)
+    barrier = threading.Barrier(8)
+
+    def first_request():
+        barrier.wait()
+        profiler._ensure_thread()
+
+    before = sum(thread.name == 'request-profiler' for thread in threading.enumerate())
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(thread.name == 'request-profiler' for thread in threading.enumerate()) - before == 1
+
+def test_metrics_require_the_configured_token():
+    """Test that /metrics answers 401 without the bearer token when METRICS_TOKEN is set"""
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config.update(METRICS_ENABLED=True, METRICS_TOKEN='scrape-secret')
+    init_instrumentation(app)
+    client = app.test_client()
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert '# TYPE' in response.get_data(as_text=True)
+
+@pytest.mark.skipif('METRICS_ENABLED' in os.environ, reason='METRICS_ENABLED is set in the environment')
+def test_metrics_are_off_by_default_in_production():
+    """Test that production only serves /metrics when METRICS_ENABLED is set"""
+    assert ProductionConfig.METRICS_ENABLED is False
+    assert TestingConfig.METRICS_ENABLED is True
+
+def budget_app():
+    app = Flask(__name__)
+
+    @app.route('/listing')
+    @query_budget(2)
+    def listing():
+        return jsonify({})
+    return app
+
+def timings_for(*statements):
+    timings = RequestTimings()
+    for statement in statements:
+        timings.sql_count += 1
+        timings.statements[statement] += 1
+    return timings
+
+def test_query_budget_raises_when_exceeded():
+    """Test that the raise mode fails a request over its route's budget"""
+    app = budget_app()
+    with app.test_request_context('/listing'):
+        check_query_budget(timings_for('SELECT 1', 'SELECT 2'), 'listing', 'raise', 5)
+        with pytest.raises(QueryBudgetExceeded, match='budget is 2'):
+            check_query_budget(timings_for('SELECT 1', 'SELECT 2', 'SELECT 3'), 'listing', 'raise', 5)
+
+def test_query_budget_logs_repeated_statements(caplog):
+    """Test that a statement repeated per row is reported as a likely N+1"""
+    app = budget_app()
+    with app.test_request_context('/other'), caplog.at_level(logging.WARNING):
+        check_query_budget(timings_for(*['SELECT * FROM tasks WHERE id = ?'] * 4), 'other', 'log', 3)
+    assert 'likely an N+1' in caplog.text
+
+def test_query_budget_skips_exempt_statements():
+    """Test that statements made outside the budget, like shard lookups, are not counted"""
+    app = budget_app()
+    with app.test_request_context('/listing'):
+        timings = timings_for('SELECT 1', 'SELECT 2', 'SELECT 3')
+        timings.budget_exempt = 1
+        check_query_budget(timings, 'listing', 'raise', 5)
@@ -0,0 +1,76 @@
+import json
+import pytest
+from datetime import datetime
+from src import json_provider
+from flask.json.provider import DefaultJSONProvider
+from src.json_provider import FastJSONProvider
+
+PAYLOAD = {
+    'when': datetime(2024, 12, 31, 23, 59, 59, 123456),
+    'title': 'Ünïcode',
+    'count': 3,
+    'nested': [{'b': None, 'a': True}],
+}
+
+def test_datetimes_encoded_as_iso(app):
+    """Test that datetimes use ISO 8601 like Task.to_dict"""
+    provider = FastJSONProvider(app)
+
+    assert json.loads(provider.dumps(PAYLOAD))['when'] == '2024-12-31T23:59:59.123456'
+
+def encodings(app, provider):
+    with app.test_request_context():
+        return [
+            provider.dumps(PAYLOAD),
+            provider.dumps(PAYLOAD, separators=(',', ':')),
+            provider.dumps(PAYLOAD, indent=2),
+            provider.dumps(PAYLOAD, indent=4),
+            json_provider.encode_json(PAYLOAD),
+            provider.response(PAYLOAD).get_data(),
+        ]
+
+@pytest.mark.parametrize('ensure_ascii', [False, True])
+@pytest.mark.parametrize('compact', [None, True, False])
+def test_stdlib_fallback_matches_fast_path(app, monkeypatch, compact, ensure_ascii):
+    """Test that output is byte for byte the same with and without orjson"""
+    provider = FastJSONProvider(app)
+    provider.compact = compact
+    provider.ensure_ascii = ensure_ascii
+    fast = encodings(app, provider)
+
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    fallback = encodings(app, provider)
+
+    assert fast == fallback
+    assert provider.loads(fallback[0]) == provider.loads(fast[0])
+
+def test_output_follows_default_provider(app):
+    """Test that dumps and response format like Flask's DefaultJSONProvider"""
+    provider = FastJSONProvider(app)
+    default = DefaultJSONProvider(app)
+    default.ensure_ascii = False
+    payload = {'b': [1, {}], 'a': 'Ünïcode'}
+
+    with app.test_request_context():
+        for compact, debug in [(None, False), (None, True), (True, True), (False, False)]:
+            app.debug = debug
+            provider.compact = default.compact = compact
+            assert provider.response(payload).get_data() == default.response(payload).get_data()
+        app.debug = False
+
+    assert provider.dumps(payload) == default.dumps(payload) == '{"a": "Ünïcode", "b": [1, {}]}'
+    assert provider.dumps(payload, indent=4) == default.dumps(payload, indent=4)
+    assert provider.dumps(payload, indent=None) == default.dumps(payload, indent=None)
+
+def test_unserializable_value_raises(app):
+    """Test that unknown types still fail loudly"""
+    with pytest.raises(TypeError):
+        FastJSONProvider(app).dumps({'value': object()})
+
+def test_task_list_matches_to_dict(client, auth_headers, test_tasks):
+    """Test that the row based list output matches Task.to_dict"""
+    response = client.get('/api/tasks', headers=auth_headers)
+
+    listed = {task['id']: task for task in response.get_json()['tasks']}
+    for task in test_tasks:
+        assert listed[task.id] == task.to_dict()
@@ -0,0 +1,27 @@
+from src.app import create_app
+from benchmarks.bench_api import issue_tokens
+from benchmarks.loadgen import MIXES, VirtualUser, run_step
+from benchmarks.seed import seed_database
+from benchmarks.transport import LocalServer
+
+def test_run_step_reports_each_endpoint():
+    """Test a short open-loop step of every mix against a local server"""
+    app = create_app('testing')
+    dataset = seed_database(app, 'small')
+
+    with LocalServer(app) as server:
+        for name, mix in MIXES.items():
+            # Testing tokens expire after a few seconds, shorter than running every mix
+            tokens = issue_tokens(app, dataset['users'])
+            users = [
+                VirtualUser(user_id, username, tokens[user_id], dataset['tasks'][user_id])
+                for user_id, username in dataset['users'][:3]
+            ]
+            # One request in flight at a time, the in-memory database has a single connection
+            step = run_step(server.host, server.port, users, dataset, mix, rate=40, duration=0.5,
+                            concurrency=1, seed=1)
+
+            assert step['offered_rps'] == 40
+            assert step['requests'] > 0
+            assert step['error_rate'] == 0.0, (name, step['endpoints'])
+            assert set(step['endpoints']) == set(mix)
@@ -0,0 +1,52 @@
+import pytest
+from src.models import Task
+from src.queries import parse_fields, parse_sort, plan_task_list, task_columns, task_row_to_dict, TASK_FIELD_NAMES
+
+def test_parse_fields_defaults_to_all():
+    """Test that no fieldset selects every field"""
+    assert parse_fields(None) == TASK_FIELD_NAMES
+    assert parse_fields('') == TASK_FIELD_NAMES
+
+def test_parse_fields_sparse():
+    """Test parsing, trimming and de-duplicating a sparse fieldset"""
+    assert parse_fields('id, title,id,is_completed') == ('id', 'title', 'is_completed')
+
+def test_parse_fields_rejects_unknown():
+    """Test rejecting fields that are not task columns"""
+    with pytest.raises(ValueError):
+        parse_fields('id,password_hash')
+    with pytest.raises(ValueError):
+        parse_fields(',')
+
+def test_required_columns_are_appended_and_dropped():
+    """Test that sort key columns are selected but not returned"""
+    columns = task_columns(('title',), required=(Task.created_at, Task.id))
+
+    assert [column.key for column in columns] == ['title', 'created_at', 'id']
+    assert task_row_to_dict(('Title', 'ts', 7), ('title',)) == {'title': 'Title'}
+
+def test_parse_sort():
+    """Test parsing sort fields with their direction"""
+    assert parse_sort(None, [('created_at', True)]) == [('created_at', True)]
+    assert parse_sort('-due_date, title', []) == [('due_date', True), ('title', False)]
+    with pytest.raises(ValueError):
+        parse_sort('title,title', [])
+    with pytest.raises(ValueError):
+        parse_sort('description', [])
+
+def test_plan_picks_the_index_matching_filters_and_sort():
+    """Test that the plan uses the index's remaining columns as tie breakers"""
+    name, keys = plan_task_list({'is_completed'}, 'due_date', [('due_date', False)])
+
+    assert name == 'ix_tasks_user_completed_due'
+    assert keys == [(Task.due_date, False), (Task.title, False), (Task.id, False)]
+    assert plan_task_list(set(), None, [('created_at', True)]) == (
+        'ix_tasks_user_created_id', [(Task.created_at, True), (Task.id, True)]
+    )
+
+def test_plan_rejects_queries_without_an_index():
+    """Test refusing sorts and filters that would need a scan"""
+    with pytest.raises(ValueError, match='not supported with filters on is_completed'):
+        plan_task_list({'is_completed'}, None, [('updated_at', False)])
+    with pytest.raises(ValueError, match='requires sort=updated_at'):
+        plan_task_list(set(), 'updated_at', [('title', False)])
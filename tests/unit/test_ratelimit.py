@@ -0,0 +1,168 @@
+import os
+import pytest
+import flask_jwt_extended.view_decorators
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity
+
+from src.config import TestingConfig
+from src.instrumentation import timed_jwt_required
+from src.ratelimit import (
+    Rule, parse_rules, MemoryStorage, SharedMemoryStorage, SQLiteStorage, init_rate_limiter
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_parse_rules():
+    """Test parsing of the RATELIMIT_RULES setting"""
+    rules = parse_rules('auth=10/60, read=600/60')
+
+    assert rules['auth'].capacity == 10
+    assert rules['read'].rate == 10.0
+    with pytest.raises(ValueError):
+        parse_rules('auth=ten')
+
+@pytest.mark.parametrize('factory', [
+    lambda clock, tmp_path: MemoryStorage(clock=clock),
+    lambda clock, tmp_path: SharedMemoryStorage(slots=64, clock=clock),
+    lambda clock, tmp_path: SQLiteStorage(str(tmp_path / 'buckets.db'), clock=clock),
+], ids=['memory', 'shared', 'sqlite'])
+def test_bucket_drains_and_refills(factory, tmp_path):
+    """Test that a bucket allows its capacity, then refills at its rate"""
+    clock = FakeClock()
+    storage = factory(clock, tmp_path)
+    rule = Rule(3, 3)
+
+    assert [storage.consume('key', rule)[0] for _ in range(4)] == [True, True, True, False]
+    assert storage.consume('other', rule)[0] is True
+
+    clock.now += 1
+    allowed, tokens = storage.consume('key', rule)
+    assert allowed is True and tokens == pytest.approx(0)
+
+    clock.now += 60
+    assert storage.consume('key', rule)[1] == pytest.approx(2)
+
+def test_shared_memory_is_shared_with_forked_workers():
+    """Test that a forked child drains the same buckets as its parent"""
+    storage = SharedMemoryStorage(slots=64)
+    rule = Rule(5, 3600)
+
+    pid = os.fork()
+    if pid == 0:
+        for _ in range(5):
+            storage.consume('login:ip:10.0.0.1', rule)
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert storage.consume('login:ip:10.0.0.1', rule)[0] is False
+
+def test_shared_memory_reuses_oldest_slot_when_full():
+    """Test that a full slot group evicts the least recently updated bucket"""
+    clock = FakeClock()
+    storage = SharedMemoryStorage(slots=2, probes=2, clock=clock)
+    rule = Rule(1, 3600)
+
+    for key in ('a', 'b', 'c'):
+        clock.now += 1
+        assert storage.consume(key, rule)[0] is True
+    assert storage.consume('c', rule)[0] is False
+    assert storage.consume('a', rule)[0] is True
+
+@pytest.fixture
+def limited_app():
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config.update(RATELIMIT_ENABLED=True, RATELIMIT_RULES='auth=2/60,read=3/60')
+    JWTManager(app)
+    init_rate_limiter(app)
+
+    app.add_url_rule('/api/login', 'login', lambda: jsonify({}), methods=['POST'])
+    app.add_url_rule('/api/tasks', 'get_tasks', lambda: jsonify({'tasks': []}))
+    app.add_url_rule('/api/tasks/stats', 'get_task_stats',
+                     timed_jwt_required()(lambda: jsonify({'user': get_jwt_identity()})))
+    app.add_url_rule('/health', 'health', lambda: jsonify({'status': 'healthy'}))
+    return app
+
+def test_requests_carry_ratelimit_headers(limited_app):
+    """Test the RateLimit-* headers and the 429 response"""
+    client = limited_app.test_client()
+
+    response = client.post('/api/login')
+    assert response.headers['RateLimit-Limit'] == '2'
+    assert response.headers['RateLimit-Remaining'] == '1'
+    assert response.headers['RateLimit-Policy'] == '2;w=60'
+
+    client.post('/api/login')
+    response = client.post('/api/login')
+    assert response.status_code == 429
+    assert response.get_json()['error'] == 'Rate limit exceeded'
+    assert int(response.headers['Retry-After']) >= 1
+
+    for _ in range(5):
+        assert client.get('/health').status_code == 200
+
+def test_authenticated_requests_keyed_on_identity(limited_app):
+    """Test that users behind the same IP get their own buckets"""
+    client = limited_app.test_client()
+    with limited_app.app_context():
+        alice = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+        bob = {'Authorization': f"Bearer {create_access_token(identity='2')}"}
+
+    assert [client.get('/api/tasks', headers=alice).status_code for _ in range(4)] == [200, 200, 200, 429]
+    assert client.get('/api/tasks', headers=bob).status_code == 200
+    assert client.get('/api/tasks').status_code == 200
+
+def test_logins_keyed_on_username_and_ip(limited_app):
+    """Test that users logging in from one address don't share a bucket"""
+    client = limited_app.test_client()
+
+    def login(username, address='10.0.0.1'):
+        return client.post('/api/login', json={'username': username, 'password': 'x'},
+                           environ_base={'REMOTE_ADDR': address}).status_code
+
+    assert [login('alice') for _ in range(3)] == [200, 200, 429]
+    assert login('bob') == 200
+    assert login('alice', address='10.0.0.2') == 200
+    assert [client.post('/api/login').status_code for _ in range(3)] == [200, 200, 429]
+
+def test_token_decoded_once_per_request(limited_app, monkeypatch):
+    """Test that the view reuses the token the rate limiter verified"""
+    decode = flask_jwt_extended.view_decorators._decode_jwt_from_request
+    calls = []
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(flask_jwt_extended.view_decorators, '_decode_jwt_from_request', counting_decode)
+    client = limited_app.test_client()
+    with limited_app.app_context():
+        headers = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+
+    response = client.get('/api/tasks/stats', headers=headers)
+    assert response.get_json() == {'user': '1'}
+    assert len(calls) == 1
+
+    assert client.get('/api/tasks/stats', headers={'Authorization': 'Bearer broken'}).status_code == 422
+    assert client.get('/api/tasks/stats').status_code == 401
+
+def test_client_address_from_trusted_proxies(make_app):
+    """Test that with TRUSTED_PROXIES the bucket follows X-Forwarded-For"""
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_RULES='auth=1/60', TRUSTED_PROXIES=1)
+    client = app.test_client()
+
+    def register(forwarded_for):
+        return client.post('/api/register', json={}, headers={'X-Forwarded-For': forwarded_for}).status_code
+
+    assert register('203.0.113.1') == 400
+    assert register('203.0.113.1') == 429
+    assert register('203.0.113.2') == 400
+
+    untrusting = make_app(RATELIMIT_ENABLED=True, RATELIMIT_RULES='auth=1/60', TRUSTED_PROXIES=0).test_client()
+    assert untrusting.post('/api/register', json={}, headers={'X-Forwarded-For': '203.0.113.3'}).status_code == 400
+    assert untrusting.post('/api/register', json={}, headers={'X-Forwarded-For': '203.0.113.4'}).status_code == 429
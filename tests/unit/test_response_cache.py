@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from src.response_cache import CACHE_EVICTIONS, MemoryResponseCache, create_cache_backend
+
+def test_memory_cache_evicts_least_recently_used_by_size():
+    """Test that the cache stays under its byte budget, dropping the least recently used bodies"""
+    cache = MemoryResponseCache(max_bytes=30)
+    cache.put(1, 1, 'a', b'x' * 10)
+    cache.put(2, 1, 'a', b'y' * 10)
+    cache.put(3, 1, 'a', b'z' * 10)
+    assert cache.get(1, 1, 'a') == b'x' * 10
+
+    cache.put(4, 1, 'a', b'w' * 10)
+
+    assert cache.get(2, 1, 'a') is None
+    assert cache.get(1, 1, 'a') == b'x' * 10
+    assert cache.get(4, 1, 'a') == b'w' * 10
+    cache.put(5, 1, 'a', b'v' * 31)
+    assert cache.get(5, 1, 'a') is None
+
+def test_memory_cache_drops_older_versions_of_a_user():
+    """Test that storing a newer list version drops the user's older entries right away"""
+    cache = MemoryResponseCache(max_bytes=1000)
+    cache.put(1, 1, 'completed=false', b'old open')
+    cache.put(1, 1, 'search=milk', b'old search')
+    cache.put(2, 1, 'completed=false', b'other user')
+    evictions = CACHE_EVICTIONS.value()
+
+    cache.put(1, 2, 'completed=false', b'new open')
+
+    assert CACHE_EVICTIONS.value() - evictions == 2
+    assert cache.get(1, 1, 'search=milk') is None
+    assert cache.get(1, 2, 'completed=false') == b'new open'
+    assert cache.get(2, 1, 'completed=false') == b'other user'
+    assert len(cache) == 2
+
+def test_memory_cache_ignores_bodies_of_older_versions():
+    """Test that a body built from a lagging replica doesn't replace newer entries"""
+    cache = MemoryResponseCache(max_bytes=1000)
+    cache.put(1, 3, 'q', b'current')
+    cache.put(1, 2, 'q', b'stale')
+    assert cache.get(1, 2, 'q') is None
+    assert cache.get(1, 3, 'q') == b'current'
+
+def test_memory_cache_entries_expire():
+    """Test that entries are dropped after the ttl even if the version never changed"""
+    cache = MemoryResponseCache(max_bytes=1000, ttl=0.05)
+    cache.put(1, 1, 'q', b'body')
+    assert cache.get(1, 1, 'q') == b'body'
+
+    time.sleep(0.1)
+
+    assert cache.get(1, 1, 'q') is None
+    assert len(cache) == 0
+
+def test_redis_cache_needs_the_redis_package(monkeypatch):
+    """Test that choosing the redis cache without the package fails at startup with a clear message"""
+    monkeypatch.setattr('src.response_cache.redis', None)
+    with pytest.raises(ValueError, match='needs the redis package'):
+        create_cache_backend({'RESPONSE_CACHE_BACKEND': 'redis', 'RESPONSE_CACHE_URL': 'redis://localhost:6379/1',
+                              'RESPONSE_CACHE_TTL': 300})
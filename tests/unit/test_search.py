@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import text
+from src.database import db
+from src.models import Task, User
+from src.search import (
+    SQLITE_SEARCH_DROP_DDL, _availability, apply_search, is_search_index_available,
+    rebuild_search_index, tokenize,
+)
+
+def search_titles(user_id, term):
+    query = Task.query.filter_by(user_id=user_id)
+    query, rank = apply_search(query, db.session, term, user_id)
+    return [task.title for task, _ in query.add_columns(rank).order_by(rank, Task.id).all()]
+
+def test_tokenize():
+    """Test splitting search terms into indexable words"""
+    assert tokenize("buy  milk!") == ["buy", "milk"]
+    assert tokenize("%%") == []
+    assert tokenize(None) == []
+
+def test_search_index_created(db_session):
+    """Test that the full-text index exists after create_all"""
+    assert is_search_index_available(db.session) is True
+
+def test_search_prefix_and_ranking(db_session, test_user_with_password):
+    """Test prefix matching and that title matches rank above description matches"""
+    db_session.add_all([
+        Task(title="Groceries", description="Buy milk and bread", user_id=test_user_with_password.id),
+        Task(title="Milkshake recipe", description="Blend it", user_id=test_user_with_password.id),
+        Task(title="Unrelated", description="Nothing here", user_id=test_user_with_password.id),
+    ])
+    db_session.commit()
+
+    assert search_titles(test_user_with_password.id, "milk") == ["Milkshake recipe", "Groceries"]
+
+def test_search_index_follows_updates_and_deletes(db_session, test_user_with_password):
+    """Test that the index is kept in sync with task writes"""
+    task = Task(title="Write report", description="Quarterly", user_id=test_user_with_password.id)
+    db_session.add(task)
+    db_session.commit()
+
+    assert search_titles(test_user_with_password.id, "report") == ["Write report"]
+
+    task.title = "Write summary"
+    db_session.commit()
+
+    assert search_titles(test_user_with_password.id, "report") == []
+    assert search_titles(test_user_with_password.id, "summ") == ["Write summary"]
+
+    db_session.delete(task)
+    db_session.commit()
+
+    assert search_titles(test_user_with_password.id, "summary") == []
+
+def test_search_is_scoped_to_the_user(db_session, test_user_with_password):
+    """Test that the index only returns the user's own tasks and ranks them by their own text"""
+    other = User(username="otheruser")
+    other.set_password("password123")
+    db_session.add(other)
+    db_session.commit()
+    db_session.add_all([
+        Task(title="Pay rent", description="Landlord", user_id=test_user_with_password.id),
+        Task(title="Call landlord", description="About the rent", user_id=test_user_with_password.id),
+        Task(title="Rent a car", description="", user_id=other.id),
+    ])
+    db_session.commit()
+
+    assert search_titles(test_user_with_password.id, "rent") == ["Pay rent", "Call landlord"]
+    assert search_titles(other.id, "rent") == ["Rent a car"]
+
+def test_rebuild_upgrades_an_index_without_user_ids(db_session, test_user_with_password):
+    """Test that an index from before per-user filtering is ignored until it is rebuilt"""
+    db_session.add(Task(title="Write report", user_id=test_user_with_password.id))
+    db_session.commit()
+    for statement in SQLITE_SEARCH_DROP_DDL:
+        db_session.execute(text(statement))
+    db_session.execute(text(
+        "CREATE VIRTUAL TABLE tasks_fts USING fts5(title, description, content='tasks', content_rowid='id')"
+    ))
+    db_session.commit()
+    _availability.clear()
+
+    assert is_search_index_available(db.session) is False
+    assert search_titles(test_user_with_password.id, "report") == ["Write report"]
+
+    rebuild_search_index(db.session)
+
+    assert is_search_index_available(db.session) is True
+    assert search_titles(test_user_with_password.id, "report") == ["Write report"]
@@ -0,0 +1,30 @@
+import pytest
+from src.config import ProductionConfig
+from src.database import db
+from src.app import create_app
+from src.server import gunicorn_options, reset_engines_after_fork, post_fork
+
+def production_settings():
+    return {key: getattr(ProductionConfig, key) for key in dir(ProductionConfig) if key.isupper()}
+
+def test_gunicorn_options_from_production_config():
+    """Test that the serving options come from ProductionConfig"""
+    options = gunicorn_options(production_settings())
+
+    assert options['worker_class'] == 'gthread'
+    assert options['workers'] == ProductionConfig.SERVER_WORKERS
+    assert options['threads'] == ProductionConfig.SERVER_THREADS
+    assert options['max_requests'] == ProductionConfig.SERVER_MAX_REQUESTS
+    assert options['post_fork'] is post_fork
+
+def test_reset_engines_after_fork():
+    """Test that the engine pool is replaced in a forked worker"""
+    # A separate app, so the shared in-memory test database keeps its pool
+    app = create_app('testing')
+    with app.app_context():
+        engine = db.engine
+        pool_before = engine.pool
+
+    reset_engines_after_fork(app)
+
+    assert engine.pool is not pool_before
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from src.models import Task, TaskDueBucket, TaskTombstone, User, UserTaskState
+from src.stats import task_stats
+from src.tasks import create_task_record, update_task_record
+
+def make_user(db_session):
+    user = User(username='statsuser', password_hash='unused')
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+def test_overdue_splits_today(db_session):
+    """Test that tasks due earlier today count as overdue and later ones as due today"""
+    user = make_user(db_session)
+    now = datetime(2030, 6, 15, 12, 0)
+    create_task_record(db_session, user.id, {'title': 'Morning', 'due_date': now - timedelta(hours=3)})
+    create_task_record(db_session, user.id, {'title': 'Evening', 'due_date': now + timedelta(hours=3)})
+    create_task_record(db_session, user.id, {'title': 'Yesterday', 'due_date': now - timedelta(days=1)})
+
+    stats = task_stats(db_session, user.id, now=now)
+    assert stats['overdue'] == 2
+    assert stats['due_today'] == 1
+    assert stats['upcoming'] == 0
+
+    stats = task_stats(db_session, user.id, now=now - timedelta(days=2))
+    assert stats['overdue'] == 0 and stats['upcoming'] == 3
+
+def test_moving_due_date_updates_buckets(db_session):
+    """Test that changing a due date moves the task between buckets"""
+    user = make_user(db_session)
+    now = datetime(2030, 6, 15, 12, 0)
+    task = create_task_record(db_session, user.id, {'title': 'Moved', 'due_date': now - timedelta(days=4)})
+    update_task_record(db_session, task, {'due_date': now + timedelta(days=4)})
+
+    stats = task_stats(db_session, user.id, now=now)
+    assert stats['overdue'] == 0 and stats['upcoming'] == 1
+
+    update_task_record(db_session, task, {'due_date': None})
+    assert task_stats(db_session, user.id, now=now)['no_due_date'] == 1
+
+def test_user_task_count_uses_counter(db_session):
+    """Test that User.to_dict reports the maintained task count"""
+    user = make_user(db_session)
+    create_task_record(db_session, user.id, {'title': 'One'})
+    create_task_record(db_session, user.id, {'title': 'Two'})
+    db_session.expire(user)
+
+    assert user.to_dict()['task_count'] == 2
+
+def test_counters_follow_writes_outside_the_task_helpers(db_session):
+    """Test that tasks added, changed and deleted through the ORM keep the counters and buckets"""
+    user = make_user(db_session)
+    now = datetime(2030, 6, 15, 12, 0)
+    late = Task(title='Late', due_date=now - timedelta(days=2), user_id=user.id)
+    db_session.add_all([late, Task(title='Someday', user_id=user.id)])
+    db_session.commit()
+
+    stats = task_stats(db_session, user.id, now=now)
+    assert stats['total'] == 2 and stats['overdue'] == 1 and stats['no_due_date'] == 1
+    db_session.expire(user)
+    assert user.to_dict()['task_count'] == 2
+
+    # Set while expired after the commit, the old values come from the database
+    late.update(is_completed=True)
+    db_session.commit()
+    stats = task_stats(db_session, user.id, now=now)
+    assert stats['completed'] == 1 and stats['overdue'] == 0
+
+    db_session.delete(late)
+    db_session.commit()
+    stats = task_stats(db_session, user.id, now=now)
+    assert stats['total'] == 1 and stats['completed'] == 0
+
+def test_deleting_a_user_leaves_no_task_bookkeeping(db_session):
+    """Test that tasks going away with their user don't leave tombstones or counters behind"""
+    user = make_user(db_session)
+    create_task_record(db_session, user.id, {'title': 'One'})
+    create_task_record(db_session, user.id, {'title': 'Two', 'due_date': datetime(2030, 6, 15)})
+    db_session.commit()
+    user_id = user.id
+
+    db_session.delete(user)
+    db_session.commit()
+
+    assert db_session.query(TaskTombstone).filter_by(user_id=user_id).count() == 0
+    assert db_session.query(UserTaskState).filter_by(user_id=user_id).count() == 0
+    assert db_session.query(TaskDueBucket).filter_by(user_id=user_id).count() == 0
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.app import create_app
+
+app = create_app(os.environ.get('FLASK_ENV', 'production'))